@@ -0,0 +1,149 @@
+import os
+import queue
+import threading
+from urllib.parse import quote
+
+
+AUDIO_EXTENSIONS = (".m4a", ".opus", ".mp3", ".aac", ".ogg", ".webm")
+
+
+def is_audio_file(filename):
+    return filename.lower().endswith(AUDIO_EXTENSIONS)
+
+
+class AudioLibrary:
+    """Audio renditions of the library's videos, derived by stream copy.
+
+    A video's audio track is copied (never re-encoded) into
+    download_path/.audio/<filename>.m4a, or <filename>.opus for Opus tracks
+    (e.g. "X.mp4.m4a", so X.mp4 and X.mkv never share a rendition), with the
+    index at the front of the file so players can start reading straight
+    away. Audio-only downloads already live in download_path and are used
+    as they are. Derivation runs on a single background worker.
+    """
+
+    AUDIO_DIR = ".audio"
+    # Source audio codec -> container its stream can be copied into
+    COPY_CONTAINERS = {"aac": ".m4a", "alac": ".m4a", "mp3": ".m4a", "opus": ".opus"}
+    RENDITION_EXTENSIONS = (".m4a", ".opus")
+
+    def __init__(self, downloader, folder):
+        self.downloader = downloader
+        self.folder = os.path.abspath(folder)
+        self.root = os.path.join(self.folder, self.AUDIO_DIR)
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        threading.Thread(target=self._worker, name="audio-deriver", daemon=True).start()
+
+    def stop(self):
+        self._queue.put(None)
+
+    def queue_depth(self):
+        """Files queued or being processed."""
+        return len(self._pending)
+
+    def rendition(self, filename):
+        """Return the name of the current derived audio file in the .audio folder, or None."""
+        filename = os.path.basename(filename)
+        try:
+            source_mtime = os.stat(os.path.join(self.folder, filename)).st_mtime
+        except OSError:
+            return None
+
+        for extension in self.RENDITION_EXTENSIONS:
+            name = f"{filename}{extension}"
+            try:
+                if os.stat(os.path.join(self.root, name)).st_mtime >= source_mtime:
+                    return name
+            except OSError:
+                continue
+        return None
+
+    def audio_url(self, filename):
+        """URL of the audio to play for a library file, or None if there is none yet."""
+        if is_audio_file(filename):
+            return None  # the file itself is audio; the regular media URL already serves it
+        name = self.rendition(filename)
+        return f"/audio/{quote(name)}" if name else None
+
+    def enqueue(self, filename):
+        """Queue a video for audio derivation unless it already has a current rendition."""
+        filename = os.path.basename(filename)
+        if is_audio_file(filename) or self.rendition(filename):
+            return False
+        with self._lock:
+            if filename in self._pending:
+                return False
+            self._pending.add(filename)
+        self._queue.put(filename)
+        return True
+
+    def discard(self, filename):
+        """Remove the audio renditions of a deleted library file."""
+        filename = os.path.basename(filename)
+        for extension in self.RENDITION_EXTENSIONS:
+            try:
+                os.remove(os.path.join(self.root, f"{filename}{extension}"))
+            except OSError:
+                pass
+
+    def prune(self):
+        """Remove renditions whose source video is gone, including ones named after the old stem-only scheme."""
+        for name in os.listdir(self.root):
+            source, extension = os.path.splitext(name)
+            if extension in self.RENDITION_EXTENSIONS and os.path.isfile(os.path.join(self.folder, source)):
+                continue
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                pass
+
+    def derive_all(self, filenames):
+        """Queue every video without a current audio rendition. Returns how many were queued."""
+        return sum(1 for filename in filenames if self.enqueue(filename))
+
+    def _worker(self):
+        try:
+            self.prune()
+        except OSError as e:
+            print(f"Audio prune failed: {e}")
+        while True:
+            filename = self._queue.get()
+            if filename is None:
+                return
+            try:
+                self.derive(filename)
+            except Exception as e:
+                print(f"Audio extraction failed for {filename}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(filename)
+
+    def derive(self, filename):
+        """Copy the audio track of one library video into the .audio folder."""
+        source_path = os.path.join(self.folder, filename)
+        audio = self.downloader.probe_streams(source_path)["audio"]
+        if audio is None:
+            print(f"No audio track in {filename}")
+            return None
+
+        extension = self.COPY_CONTAINERS.get(audio.get("codec_name"))
+        if extension is None:
+            print(f"Skipping {filename}: {audio.get('codec_name')} audio can't be stream-copied to m4a/opus")
+            return None
+
+        output_path = os.path.join(self.root, f"{os.path.basename(filename)}{extension}")
+        temp_path = f"{output_path}.tmp{extension}"
+        command = ["ffmpeg", "-i", source_path, "-map", "0:a:0", "-vn", "-c:a", "copy"]
+        if extension == ".m4a":
+            command += ["-movflags", "+faststart"]
+        command += ["-y", temp_path]
+
+        self.downloader._run_ffmpeg(command, priority="background")
+        os.replace(temp_path, output_path)
+        print(f"Audio extracted: {output_path}")
+        return output_path
@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import contextlib
+import tempfile
+import statistics
+import subprocess
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+WORDS = (
+    "love night river summer fire dream heart rain city blue light road home wild gold "
+    "moon ocean song dance time star shadow wind storm paper glass stone silver echo"
+).split()
+
+
+def measure(fn, iterations, warmup=1):
+    """Run fn warmup + iterations times and summarize the timed runs in milliseconds."""
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(warmup + i)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def measure_once(fn):
+    started = time.perf_counter()
+    fn()
+    return {"iterations": 1, "median_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+
+def make_library(folder, count, rng):
+    """Create count empty "Title - Artist.mp4" files. Returns their names."""
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for i in range(count):
+        title = " ".join(rng.sample(WORDS, 2)).title()
+        name = f"{title} {i} - Artist {i % 997}.mp4"
+        open(os.path.join(folder, name), "wb").close()
+        names.append(name)
+    return names
+
+
+def make_playlists(store, names, count, size, rng):
+    for i in range(count):
+        store.add_many(f"Playlist {i}", rng.sample(names, min(size, len(names))))
+
+
+def make_video(path, seconds, size="640x360", rate=25, frequency=440):
+    """Synthetic H.264/AAC test video from lavfi sources, one keyframe every 2 seconds."""
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=duration={seconds}:size={size}:rate={rate}",
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:duration={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", str(rate * 2), "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k", "-shortest", "-y", path
+    ], check=True)
+    return path
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_workspace(workspace):
+    """Config, templates and an empty library folder for the app to start from."""
+    library_folder = os.path.join(workspace, "library")
+    os.makedirs(library_folder, exist_ok=True)
+    with open(os.path.join(workspace, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "download_path": library_folder,
+            "hls_packaging": False,
+            "audio_extraction": False,
+        }, f)
+    try:
+        os.symlink(os.path.join(REPO_DIR, "html"), os.path.join(workspace, "html"))
+    except OSError:
+        shutil.copytree(os.path.join(REPO_DIR, "html"), os.path.join(workspace, "html"))
+    return library_folder
+
+
+def run_library_benchmarks(app_module, client, names, args, rng):
+    results = {}
+    results["library_scan"] = measure_once(app_module.library.refresh)
+    results["search_index_build"] = measure_once(app_module.search_index.sync)
+
+    queries = [rng.choice(WORDS) for _ in range(50)] + ["artist 42", "zzz-no-match"]
+    results["files_page"] = measure(lambda i: client.get("/files").raise_for_status(), args.iterations)
+    results["files_search"] = measure(
+        lambda i: client.get("/files", params={"query": queries[i % len(queries)]}).raise_for_status(), args.iterations
+    )
+    results["api_search"] = measure(
+        lambda i: client.get("/api/search", params={"q": queries[i % len(queries)]}).raise_for_status(), args.iterations
+    )
+
+    results["playlist_generation"] = measure_once(
+        lambda: make_playlists(app_module.playlists_store, names, args.playlists, args.playlist_size, rng)
+    )
+
+    probes = [rng.choice(names) for _ in range(100)]
+    results["playlists_containing"] = measure(
+        lambda i: app_module.get_playlists_containing(probes[i % len(probes)]), args.iterations
+    )
+
+    def add_remove(i):
+        body = {"playlist": f"Playlist {i % args.playlists}", "file": f"bench extra {i}.mp4"}
+        client.post("/playlist/add", json=body).raise_for_status()
+        client.post("/playlist/remove", json=body).raise_for_status()
+    results["playlist_add_remove"] = measure(add_remove, args.iterations)
+
+    results["media_queue"] = measure(lambda i: client.get("/api/media_queue").raise_for_status(), args.iterations)
+    results["media_queue_shuffle"] = measure(
+        lambda i: client.get("/api/media_queue", params={"mode": "shuffle"}).raise_for_status(), args.iterations
+    )
+    return results
+
+
+def run_media_benchmarks(downloader, media_folder, args):
+    os.makedirs(media_folder, exist_ok=True)
+    seconds = args.video_seconds
+    source = make_video(os.path.join(media_folder, "source.mp4"), seconds)
+    same = make_video(os.path.join(media_folder, "same.mp4"), seconds, frequency=660)
+    different = make_video(os.path.join(media_folder, "different.mp4"), seconds, size="480x270", rate=30)
+    output_folder = downloader.download_path
+
+    def remove(name):
+        path = os.path.join(output_folder, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    results = {}
+    start, end = seconds * 0.2, seconds * 0.7
+    for mode in downloader.CLIP_MODES:
+        def clip(i, mode=mode):
+            downloader.clip_existing_video(source, f"bench clip {mode} {i}", start, end, mode=mode)
+            remove(f"bench clip {mode} {i}.mp4")
+        results[f"clip_{mode}"] = measure(clip, args.media_iterations)
+
+    def combine(inputs, label):
+        def run(i):
+            if downloader.combine_videos(inputs, f"bench combine {label} {i}") is None:
+                raise RuntimeError(f"combine_videos failed for {label}")
+            remove(f"bench combine {label} {i}.mp4")
+        return run
+    results["combine_stream_copy"] = measure(combine([source, same], "copy"), args.media_iterations)
+    results["combine_normalize"] = measure(combine([source, different], "normalize"), args.media_iterations)
+
+    def split(parallel):
+        def run(i):
+            segments = downloader.split_video_into_segments(
+                source, f"bench split {i}", segment_duration=max(1, seconds // 3), parallel=parallel
+            )
+            for segment in segments:
+                remove(os.path.basename(segment["path"]))
+            if not all(segment["success"] for segment in segments):
+                raise RuntimeError("split_video_into_segments failed")
+        return run
+    results["split_single_pass"] = measure(split(False), args.media_iterations)
+    results["split_parallel"] = measure(split(True), args.media_iterations)
+    return results
+
+
+def compare(results, baseline):
+    """Median change against a baseline run, as new/old ratios."""
+    comparison = {}
+    for name, stats in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old and old.get("median_ms"):
+            comparison[name] = round(stats["median_ms"] / old["median_ms"], 3)
+    return comparison
+
+
+def run(args, workspace, rng):
+    library_folder = prepare_workspace(workspace)
+    names = make_library(library_folder, args.files, rng)
+
+    # The app reads config.json and keeps its databases relative to the working directory
+    os.chdir(workspace)
+    sys.path.insert(0, REPO_DIR)
+    import youtube2web
+    from fastapi.testclient import TestClient
+
+    # No lifespan: the background workers would only add noise to the timings
+    client = TestClient(youtube2web.app)
+    results = run_library_benchmarks(youtube2web, client, names, args, rng)
+
+    if args.skip_media:
+        print("Skipping media benchmarks")
+    elif shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        print("ffmpeg/ffprobe not found, skipping media benchmarks")
+    else:
+        results.update(run_media_benchmarks(youtube2web.downloader, os.path.join(workspace, "media"), args))
+    youtube2web.downloader.ffmpeg.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the library, playlist and media-processing hot paths")
+    parser.add_argument("--files", type=int, default=10000, help="Dummy MP4 names in the synthetic library")
+    parser.add_argument("--playlists", type=int, default=200)
+    parser.add_argument("--playlist-size", type=int, default=100, help="Songs per playlist")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed runs per library benchmark")
+    parser.add_argument("--media-iterations", type=int, default=3, help="Timed runs per ffmpeg benchmark")
+    parser.add_argument("--video-seconds", type=int, default=30, help="Length of the synthetic test videos")
+    parser.add_argument("--skip-media", action="store_true", help="Skip the clip/combine/split benchmarks")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier results file to compare medians against")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary workspace")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workspace = tempfile.mkdtemp(prefix="youtube_burgundy_bench_")
+    cwd = os.getcwd()
+    # The app logs with print(); keep stdout for the JSON report
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run(args, workspace, rng)
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"Workspace kept at {workspace}", file=sys.stderr)
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "parameters": vars(args),
+        },
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(results, json.load(f))
+        for name, ratio in report["comparison"].items():
+            print(f"{name:28} {ratio:6.2f}x baseline median", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
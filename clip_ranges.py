@@ -0,0 +1,92 @@
+import re
+
+
+# "1:02:03", "12:34" or "0:05", optionally wrapped in brackets
+TIMESTAMP_PATTERN = re.compile(r"[\[(]?\b((?:\d{1,2}:)?\d{1,2}:\d{2})\b[\])]?")
+CUE_FRAMES_PER_SECOND = 75
+
+
+def _seconds(timestamp):
+    seconds = 0
+    for part in timestamp.split(":"):
+        seconds = seconds * 60 + int(part)
+    return float(seconds)
+
+
+def _clean_title(text):
+    """Strip the separators people put between a timestamp and its title."""
+    return re.sub(r"^[\s\-–—:|.)\]]+|[\s\-–—:|(\[]+$", "", text).strip()
+
+
+def close_ranges(starts, duration=None):
+    """Turn [(name, start)] into [{"name", "start", "end"}], each ending where the next begins.
+
+    The last range ends at duration; without one it is dropped. Entries are
+    sorted by start and ones with no length are skipped.
+    """
+    starts = sorted(starts, key=lambda item: item[1])
+    ranges = []
+    for i, (name, start) in enumerate(starts):
+        end = starts[i + 1][1] if i + 1 < len(starts) else duration
+        if end is not None and end > start:
+            ranges.append({"name": name, "start": start, "end": end})
+    return ranges
+
+
+def from_chapters(info):
+    """Ranges from the chapters in a yt-dlp info dict."""
+    ranges = []
+    for i, chapter in enumerate(info.get("chapters") or []):
+        start, end = chapter.get("start_time"), chapter.get("end_time")
+        if start is None or end is None or end <= start:
+            continue
+        ranges.append({"name": chapter.get("title") or f"Chapter {i + 1}", "start": float(start), "end": float(end)})
+    return ranges
+
+
+def from_description(text, duration=None):
+    """Ranges from a track list of timestamps in a video description, one per line.
+
+    Handles "0:00 Intro", "12:34 - Song", "Song (1:02:03)" and numbered
+    lines like "3. 04:10 Song". Fewer than two timestamps isn't a track list.
+    """
+    starts = []
+    for line in (text or "").splitlines():
+        match = TIMESTAMP_PATTERN.search(line)
+        if match is None:
+            continue
+        title = _clean_title(line[:match.start()].lstrip("0123456789. ") + " " + line[match.end():])
+        starts.append((title or f"Track {len(starts) + 1}", _seconds(match.group(1))))
+    if len(starts) < 2:
+        return []
+    return close_ranges(starts, duration)
+
+
+def from_cue_sheet(text, duration=None):
+    """Ranges from a cue sheet: each TRACK starts at its INDEX 01 (MM:SS:FF, 75 frames per second).
+
+    Titles are "PERFORMER - TITLE" when a track has its own performer.
+    """
+    starts = []
+    track = None
+    for line in (text or "").splitlines():
+        parts = line.strip().split(None, 1)
+        if not parts:
+            continue
+        keyword, value = parts[0].upper(), (parts[1] if len(parts) > 1 else "")
+        if keyword == "TRACK":
+            track = {"title": None, "performer": None}
+        elif track is not None and keyword in ("TITLE", "PERFORMER"):
+            track[keyword.lower()] = value.strip().strip('"')
+        elif track is not None and keyword == "INDEX" and value.split()[:1] == ["01"]:
+            minutes, seconds, frames = (int(n) for n in value.split()[1].split(":"))
+            track["start"] = minutes * 60 + seconds + frames / CUE_FRAMES_PER_SECOND
+            starts.append(track)
+
+    named = []
+    for i, track in enumerate(starts):
+        name = track["title"] or f"Track {i + 1}"
+        if track["performer"]:
+            name = f"{track['performer']} - {name}"
+        named.append((name, track["start"]))
+    return close_ranges(named, duration)
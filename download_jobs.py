@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+
+from yt_dlp.utils import DownloadCancelled
+
+
+class DownloadJobQueue:
+    """Bounded pool of download workers around YoutubeSegmentDownloader.
+
+    Jobs are queued and run by a fixed number of worker threads, so only that
+    many yt-dlp downloads run at once. Job state is saved to a JSON file and
+    unfinished jobs are queued again on restart. A request for a URL+format
+    that is already queued or running returns the existing job.
+
+    on_complete(path, job) is called from the worker after each successful
+    download. reuse(job), when given, is asked first for an existing file
+    that can stand in for the download; it returns that path or None.
+    """
+
+    ACTIVE_STATES = ("queued", "running")
+    MAX_FINISHED_JOBS = 200  # finished jobs kept in the state file
+
+    def __init__(self, downloader, state_path="download_jobs.json", workers=2, on_complete=None, reuse=None):
+        self.downloader = downloader
+        self.state_path = state_path
+        self.workers = max(1, int(workers))
+        self.on_complete = on_complete
+        self.reuse = reuse
+        self._jobs = {}
+        self._active_keys = {}  # (link, format) -> job id while queued/running
+        self._cancel_events = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Restore saved jobs, clean up interrupted downloads and start the worker threads."""
+        self._load()
+        with self._lock:
+            resuming = [
+                self.downloader.staging_dir(job["link"], job["filename"], job["format"])
+                for job in self._jobs.values() if job["status"] in self.ACTIVE_STATES
+            ]
+        try:
+            removed = self.downloader.recover_downloads(resuming)
+            print(f"Download recovery: {len(resuming)} jobs to resume, {removed} stale partial downloads removed")
+        except Exception as e:
+            print(f"Download recovery failed: {e}")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"download-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Download queue started with {self.workers} workers")
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def submit(self, link, filename, format=None, kind="video"):
+        """Queue a video or audio download and return its job, reusing an identical in-flight job."""
+        if kind not in ("video", "audio"):
+            raise ValueError(f"Unknown download kind: {kind}")
+        format = format or (self.downloader.AUDIO_FORMAT if kind == "audio" else self.downloader.VIDEO_FORMAT)
+        key = (link, format)
+
+        with self._lock:
+            existing_id = self._active_keys.get(key)
+            if existing_id is not None:
+                return dict(self._jobs[existing_id])
+
+            now = time.time()
+            job = {
+                "id": uuid.uuid4().hex,
+                "link": link,
+                "filename": filename,
+                "format": format,
+                "kind": kind,
+                "status": "queued",
+                "progress": None,
+                "result": None,
+                "message": "",
+                "created": now,
+                "updated": now,
+            }
+            self._jobs[job["id"]] = job
+            self._active_keys[key] = job["id"]
+            self._cancel_events[job["id"]] = threading.Event()
+            self._save()
+
+        self._queue.put(job["id"])
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self._lock:
+            return [dict(job) for job in sorted(self._jobs.values(), key=lambda j: j["created"], reverse=True)]
+
+    def status_counts(self):
+        """Number of remembered jobs in each state."""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns False if it already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in self.ACTIVE_STATES:
+                return False
+
+            self._cancel_events[job_id].set()
+            if job["status"] == "queued":
+                self._finish(job, "cancelled", message="Cancelled before start")
+            return True
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] != "queued":
+                    continue
+                job["status"] = "running"
+                job["updated"] = time.time()
+                cancel_event = self._cancel_events[job_id]
+                self._save()
+
+            if job.get("kind") == "audio":
+                download = self.downloader.download_audio
+            else:
+                download = self.downloader.download_video
+
+            reused = None
+            error = ""
+            if self.reuse is not None:
+                try:
+                    reused = self.reuse(job)
+                except Exception as e:
+                    print(f"Could not reuse an existing download for {job['link']}: {e}")
+
+            if reused:
+                result = reused
+            else:
+                try:
+                    result = download(
+                        job["link"],
+                        job["filename"],
+                        progress_hook=self._progress_hook(job, cancel_event),
+                        format=job["format"]
+                    )
+                except Exception as e:
+                    result = None
+                    error = str(e)
+
+            with self._lock:
+                # A finished download is already in the library, so a cancel that arrives late is ignored
+                if result:
+                    message = "Already downloaded; linked the existing file" if reused else ""
+                    self._finish(job, "finished", result=os.path.basename(result), message=message)
+                elif cancel_event.is_set():
+                    self._finish(job, "cancelled", message="Cancelled")
+                else:
+                    self._finish(job, "failed", message=error or "Download failed.")
+
+            if result and self.on_complete is not None:
+                try:
+                    self.on_complete(result, dict(job))
+                except Exception as e:
+                    print(f"Download completion hook failed: {e}")
+
+    def _progress_hook(self, job, cancel_event):
+        """Build a yt-dlp progress hook that records progress and aborts on cancel."""
+        def hook(status):
+            if cancel_event.is_set():
+                raise DownloadCancelled("Cancelled")
+
+            downloaded = status.get("downloaded_bytes")
+            total = status.get("total_bytes") or status.get("total_bytes_estimate")
+            progress = {
+                "state": status.get("status"),
+                "downloaded_bytes": downloaded,
+                "total_bytes": total,
+                "percent": round(downloaded * 100 / total, 1) if downloaded and total else None,
+                "speed": status.get("speed"),
+                "eta": status.get("eta"),
+            }
+            with self._lock:
+                job["progress"] = progress
+                job["updated"] = time.time()
+
+        return hook
+
+    def _finish(self, job, status, result=None, message=""):
+        """Move a job to a final state. Caller holds the lock."""
+        job["status"] = status
+        job["result"] = result
+        job["message"] = message
+        job["updated"] = time.time()
+        self._active_keys.pop((job["link"], job["format"]), None)
+        self._cancel_events.pop(job["id"], None)
+        self._save()
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                jobs = json.load(f)
+        except Exception as e:
+            print(f"Download queue state read error: {e}")
+            return
+
+        with self._lock:
+            for job in jobs:
+                self._jobs[job["id"]] = job
+                if job["status"] in self.ACTIVE_STATES:
+                    # Interrupted by a restart; run it again
+                    job["status"] = "queued"
+                    job["progress"] = None
+                    self._active_keys[(job["link"], job["format"])] = job["id"]
+                    self._cancel_events[job["id"]] = threading.Event()
+                    self._queue.put(job["id"])
+            self._save()
+
+    def _save(self):
+        """Write job state to disk. Caller holds the lock."""
+        active = [job for job in self._jobs.values() if job["status"] in self.ACTIVE_STATES]
+        finished = sorted(
+            (job for job in self._jobs.values() if job["status"] not in self.ACTIVE_STATES),
+            key=lambda j: j["updated"]
+        )[-self.MAX_FINISHED_JOBS:]
+
+        self._jobs = {job["id"]: job for job in sorted(active + finished, key=lambda j: j["created"])}
+        temp_path = f"{self.state_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(list(self._jobs.values()), f, indent=4)
+            os.replace(temp_path, self.state_path)
+        except Exception as e:
+            print(f"Download queue state write error: {e}")
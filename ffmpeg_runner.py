@@ -0,0 +1,357 @@
+import os
+import time
+import uuid
+import heapq
+import asyncio
+import itertools
+import threading
+import concurrent.futures
+from collections import OrderedDict, deque
+
+import metrics
+
+
+# Lower runs first: clips someone is waiting on, then combine/split, then background packaging
+PRIORITIES = {"interactive": 0, "bulk": 1, "background": 2}
+
+
+class FFmpegError(RuntimeError):
+    """ffmpeg failed; the message is the tail of its stderr."""
+
+
+class FFmpegCancelled(FFmpegError):
+    pass
+
+
+class FFmpegTimeout(FFmpegError):
+    pass
+
+
+class FFmpegRunner:
+    """Runs ffmpeg commands as asyncio subprocesses on one background event loop.
+
+    At most `slots` commands run at once (half the CPUs by default, since
+    each encode is multithreaded itself); the rest wait in a priority queue
+    so interactive clips start before queued bulk and background jobs. Every
+    command runs with -progress pipe:1, which is parsed as it arrives, and
+    only the last STDERR_LINES lines of stderr are kept. Jobs can be
+    cancelled or given a timeout, and each one records its queue wait, run
+    time, CPU time and peak memory. Synchronous code calls run(); coroutines
+    can await run_async(). A command that runs several encoders at once
+    can take more than one slot.
+    """
+
+    STDERR_LINES = 40
+    HISTORY = 200
+    KILL_GRACE = 5  # seconds between terminate and kill
+
+    def __init__(self, slots=None, timeout=None):
+        self.slots = slots or max(1, (os.cpu_count() or 2) // 2)
+        self.timeout = timeout
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._free = self.slots
+        self._waiters = []  # heap of (priority, sequence, slots, future)
+        self._sequence = itertools.count()
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="ffmpeg-runner", daemon=True).start()
+            return self._loop
+
+    def stop(self):
+        """Cancel queued and running jobs and stop the event loop."""
+        with self._lock:
+            futures = list(self._futures.values())
+        for future in futures:
+            future.cancel()
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+    def run(self, command, priority="bulk", duration=None, timeout=None, label=None, on_progress=None, slots=1):
+        """Run an ffmpeg command and block until it finishes. Returns the finished job record.
+
+        duration (seconds of output expected) turns progress into a percentage.
+        on_progress is called from the runner's thread with the job's progress
+        dict after every update. slots is how many of the runner's slots the
+        command counts as (capped at the total). Raises FFmpegError (a
+        RuntimeError) on failure, FFmpegCancelled or FFmpegTimeout.
+        """
+        future = self.submit(command, priority, duration, timeout, label, on_progress, slots)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise FFmpegCancelled("ffmpeg job was cancelled") from None
+
+    async def run_async(self, command, priority="bulk", duration=None, timeout=None, label=None, on_progress=None, slots=1):
+        future = self.submit(command, priority, duration, timeout, label, on_progress, slots)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def submit(self, command, priority="bulk", duration=None, timeout=None, label=None, on_progress=None, slots=1):
+        """Queue a command and return a concurrent.futures.Future for its job record."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        slots = max(1, min(int(slots), self.slots))
+        job = {
+            "id": uuid.uuid4().hex,
+            "label": label or os.path.basename(command[-1]),
+            "priority": priority,
+            "slots": slots,
+            "status": "queued",
+            "message": "",
+            "queued": time.time(),
+            "started": None,
+            "finished": None,
+            "wait_seconds": None,
+            "run_seconds": None,
+            "cpu_seconds": None,
+            "peak_rss": None,
+            "returncode": None,
+            "progress": {},
+        }
+        loop = self._ensure_loop()
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._trim_history()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(job["id"], list(command), PRIORITIES[priority], slots, duration, timeout or self.timeout, on_progress),
+            loop
+        )
+        with self._lock:
+            self._futures[job["id"]] = future
+        future.add_done_callback(lambda _: self._forget(job["id"]))
+        return future
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns False if it is unknown or already done."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        return future.cancel() if future is not None else False
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return _copy(job) if job else None
+
+    def jobs(self):
+        """Every remembered job, newest first."""
+        with self._lock:
+            return [_copy(job) for job in reversed(self._jobs.values())]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {"slots": self.slots, "running": statuses.count("running"), "queued": statuses.count("queued")}
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+            job = self._jobs.get(job_id)
+            if job is not None and job["status"] in ("queued", "running"):
+                # Cancelled before the coroutine got to record it
+                self._finish(job, "cancelled", "Cancelled")
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs past HISTORY. Caller holds the lock."""
+        excess = len(self._jobs) - self.HISTORY
+        for job_id in [jid for jid, job in self._jobs.items() if job["finished"] is not None][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job, status, message="", returncode=None):
+        """Record the outcome of a job. Caller holds the lock."""
+        job["status"] = status
+        job["message"] = message
+        job["returncode"] = returncode
+        job["finished"] = time.time()
+        if job["started"] is not None:
+            job["run_seconds"] = round(job["finished"] - job["started"], 3)
+            metrics.FFMPEG_SECONDS.observe(job["finished"] - job["started"], priority=job["priority"], status=status)
+        if status == "finished" and job["progress"].get("speed"):
+            metrics.FFMPEG_SPEED.observe(job["progress"]["speed"], priority=job["priority"])
+
+    async def _acquire(self, priority, slots=1):
+        self._drop_cancelled_waiters()
+        if not self._waiters and self._free >= slots:
+            self._free -= slots
+            return
+        waiter = self._loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), slots, waiter))
+        self._hand_over()  # it may go ahead of a larger, lower-priority job that is waiting for slots
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(slots)  # the slots were handed over just as we were cancelled
+            else:
+                self._hand_over()  # a smaller job behind this one may fit now
+            raise
+
+    def _release(self, slots=1):
+        self._free += slots
+        self._hand_over()
+
+    def _drop_cancelled_waiters(self):
+        while self._waiters and self._waiters[0][3].done():
+            heapq.heappop(self._waiters)
+
+    def _hand_over(self):
+        """Give free slots to waiters in priority order; the first one that doesn't fit waits for more."""
+        self._drop_cancelled_waiters()
+        while self._waiters and self._waiters[0][2] <= self._free:
+            _, _, slots, waiter = heapq.heappop(self._waiters)
+            self._free -= slots
+            waiter.set_result(None)
+            self._drop_cancelled_waiters()
+
+    async def _run(self, job_id, command, priority, slots, duration, timeout, on_progress):
+        with self._lock:
+            job = self._jobs[job_id]
+        with metrics.span("ffmpeg", label=job["label"], priority=job["priority"]):
+            return await self._execute(job, command, priority, slots, duration, timeout, on_progress)
+
+    async def _execute(self, job, command, priority, slots, duration, timeout, on_progress):
+        await self._acquire(priority, slots)
+        process = None
+        try:
+            with self._lock:
+                job["status"] = "running"
+                job["started"] = time.time()
+                job["wait_seconds"] = round(job["started"] - job["queued"], 3)
+            metrics.FFMPEG_QUEUE_SECONDS.observe(job["wait_seconds"], priority=job["priority"])
+
+            process = await asyncio.create_subprocess_exec(
+                command[0], "-nostats", "-progress", "pipe:1", *command[1:],
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stderr_tail = deque(maxlen=self.STDERR_LINES)
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(
+                        self._read_progress(job, process, duration, on_progress),
+                        self._read_stderr(process.stderr, stderr_tail),
+                        process.wait()
+                    ),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                await self._terminate(process)
+                with self._lock:
+                    self._finish(job, "timeout", f"ffmpeg timed out after {timeout}s")
+                raise FFmpegTimeout(job["message"]) from None
+
+            if process.returncode != 0:
+                message = "\n".join(stderr_tail).strip() or f"ffmpeg exited with status {process.returncode}"
+                with self._lock:
+                    self._finish(job, "failed", message.splitlines()[-1], process.returncode)
+                raise FFmpegError(message)
+
+            with self._lock:
+                self._finish(job, "finished", returncode=0)
+                return _copy(job)
+        except asyncio.CancelledError:
+            if process is not None:
+                await self._terminate(process)
+            with self._lock:
+                self._finish(job, "cancelled", "Cancelled")
+            raise
+        finally:
+            self._release(slots)
+
+    async def _terminate(self, process):
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), self.KILL_GRACE)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def _read_progress(self, job, process, duration, on_progress):
+        """Parse -progress key=value blocks; each ends with a progress=continue|end line."""
+        block = {}
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                return
+            key, _, value = line.decode("utf-8", "replace").strip().partition("=")
+            if key != "progress":
+                block[key] = value
+                continue
+
+            progress = _parse_progress(block, duration)
+            progress["done"] = value == "end"
+            usage = _usage(process.pid)
+            with self._lock:
+                job["progress"] = progress
+                if usage is not None:
+                    job["cpu_seconds"], job["peak_rss"] = usage
+            block = {}
+            if on_progress is not None:
+                try:
+                    on_progress(dict(progress))
+                except Exception as e:
+                    print(f"ffmpeg progress callback failed: {e}")
+
+    async def _read_stderr(self, stream, tail):
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            tail.append(line.decode("utf-8", "replace").rstrip())
+
+
+def _parse_progress(block, duration=None):
+    progress = {}
+    out_time = _number(block.get("out_time_us") or block.get("out_time_ms"))
+    if out_time is not None:
+        # out_time_ms is in microseconds too (a long-standing ffmpeg quirk)
+        progress["out_time"] = round(out_time / 1_000_000, 3)
+    for key in ("frame", "fps", "total_size"):
+        value = _number(block.get(key))
+        if value is not None:
+            progress[key] = value
+    speed = _number((block.get("speed") or "").rstrip("x"))
+    if speed is not None:
+        progress["speed"] = speed
+    if duration and "out_time" in progress:
+        progress["percent"] = round(min(100.0, max(0.0, progress["out_time"] / duration * 100)), 1)
+    return progress
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def _usage(pid):
+    """(CPU seconds, peak RSS in bytes) of a running process from /proc, or None where that isn't available."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status", "r") as f:
+            peak = next((int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:")), None)
+        ticks = os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+    return round((int(fields[11]) + int(fields[12])) / ticks, 2), peak
+
+
+def _copy(job):
+    return {**job, "progress": dict(job["progress"])}
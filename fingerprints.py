@@ -0,0 +1,257 @@
+import os
+import json
+import queue
+import shutil
+import hashlib
+import threading
+import subprocess
+
+from sqlite_db import Transaction, ThreadConnections
+
+
+class LibraryFingerprints:
+    """Source IDs, content hashes and optional audio fingerprints for library files.
+
+    Each file's row records the video ID and format it was downloaded as
+    (when it came from a download job), a SHA-256 of its bytes computed in a
+    streaming pass, and optionally a Chromaprint audio fingerprint from
+    fpcalc. Hashes are tied to the file's size and mtime and are recomputed
+    by a background worker when either changes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            filename TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            source_id TEXT,
+            format TEXT,
+            sha256 TEXT,
+            audio_fingerprint TEXT,
+            duration REAL
+        );
+        CREATE INDEX IF NOT EXISTS fingerprints_source ON fingerprints (source_id, format);
+        CREATE INDEX IF NOT EXISTS fingerprints_sha256 ON fingerprints (sha256);
+    """
+    CHUNK_SIZE = 1024 * 1024
+    AUDIO_MATCH_THRESHOLD = 0.9  # share of matching fingerprint bits to call two tracks the same
+
+    def __init__(self, db_path, folder, audio_fingerprints=False):
+        self.db_path = db_path
+        self.folder = os.path.abspath(folder)
+        self.audio_fingerprints = audio_fingerprints and shutil.which("fpcalc") is not None
+        if audio_fingerprints and not self.audio_fingerprints:
+            print("fpcalc (Chromaprint) not found; audio fingerprints are disabled")
+        self._db = ThreadConnections(db_path)
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._db.get().executescript(self.SCHEMA)
+
+    def start(self, filenames=()):
+        """Start the hashing worker; it first checks filenames for missing or stale hashes."""
+        threading.Thread(target=self._worker, args=(list(filenames),), name="fingerprinter", daemon=True).start()
+
+    def stop(self):
+        self._queue.put(None)
+
+    def queue_depth(self):
+        """Files queued or being hashed."""
+        return len(self._pending)
+
+    def close(self):
+        self._db.close()
+
+    def record_source(self, filename, source_id, format=None):
+        """Remember which video (and format) a downloaded file came from."""
+        with Transaction(self._db.get()) as conn:
+            conn.execute(
+                "INSERT INTO fingerprints (filename, source_id, format) VALUES (?, ?, ?) "
+                "ON CONFLICT (filename) DO UPDATE SET source_id = excluded.source_id, format = excluded.format",
+                (filename, source_id, format)
+            )
+
+    def discard(self, filename):
+        with Transaction(self._db.get()) as conn:
+            conn.execute("DELETE FROM fingerprints WHERE filename = ?", (filename,))
+
+    def find_source(self, source_id, format=None):
+        """Return a library filename already downloaded from source_id in format, or None."""
+        rows = self._db.get().execute(
+            "SELECT filename FROM fingerprints WHERE source_id = ? AND format IS ? ORDER BY filename",
+            (source_id, format)
+        ).fetchall()
+        for (filename,) in rows:
+            if os.path.isfile(os.path.join(self.folder, filename)):
+                return filename
+        return None
+
+    def source_of(self, filename):
+        """Return the source_id a library file was downloaded from, or None."""
+        row = self._db.get().execute(
+            "SELECT source_id FROM fingerprints WHERE filename = ?", (filename,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def reuse(self, source_filename, filename):
+        """Make filename refer to the same bytes as source_filename: hard link, or copy if linking fails.
+
+        The new file keeps the source's extension. Returns the new path.
+        """
+        source_path = os.path.join(self.folder, source_filename)
+        target_path = os.path.join(self.folder, f"{filename}{os.path.splitext(source_filename)[1]}")
+        if os.path.abspath(target_path) == os.path.abspath(source_path) or os.path.exists(target_path):
+            return target_path
+        try:
+            os.link(source_path, target_path)
+        except OSError:
+            shutil.copy2(source_path, target_path)
+        return target_path
+
+    def enqueue(self, filename):
+        filename = os.path.basename(filename)
+        if self._is_current(filename):
+            return
+        with self._pending_lock:
+            if filename in self._pending:
+                return
+            self._pending.add(filename)
+        self._queue.put(filename)
+
+    def _is_current(self, filename):
+        try:
+            stat = os.stat(os.path.join(self.folder, filename))
+        except OSError:
+            return True  # gone; nothing to hash
+        row = self._db.get().execute(
+            "SELECT size, mtime, sha256, audio_fingerprint FROM fingerprints WHERE filename = ?", (filename,)
+        ).fetchone()
+        if row is None or row[2] is None or row[0] != stat.st_size or row[1] != stat.st_mtime:
+            return False
+        return row[3] is not None or not self.audio_fingerprints
+
+    def _worker(self, initial):
+        for filename in initial:
+            self.enqueue(filename)
+
+        while True:
+            filename = self._queue.get()
+            if filename is None:
+                return
+            try:
+                self.fingerprint(filename)
+            except Exception as e:
+                print(f"Fingerprinting failed for {filename}: {e}")
+            finally:
+                with self._pending_lock:
+                    self._pending.discard(filename)
+
+    def fingerprint(self, filename):
+        """Hash one file (and fingerprint its audio when enabled) and store the result."""
+        path = os.path.join(self.folder, filename)
+        stat = os.stat(path)
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(self.CHUNK_SIZE):
+                digest.update(chunk)
+
+        audio_fingerprint, duration = None, None
+        if self.audio_fingerprints:
+            audio_fingerprint, duration = self._audio_fingerprint(path)
+
+        with Transaction(self._db.get()) as conn:
+            conn.execute(
+                "INSERT INTO fingerprints (filename, size, mtime, sha256, audio_fingerprint, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (filename) DO UPDATE SET size = excluded.size, "
+                "mtime = excluded.mtime, sha256 = excluded.sha256, "
+                "audio_fingerprint = excluded.audio_fingerprint, duration = excluded.duration",
+                (filename, stat.st_size, stat.st_mtime, digest.hexdigest(), audio_fingerprint, duration)
+            )
+
+    def _audio_fingerprint(self, path):
+        """Raw Chromaprint fingerprint (comma-separated ints) and duration from fpcalc."""
+        result = subprocess.run(["fpcalc", "-raw", "-json", path], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, None
+        data = json.loads(result.stdout)
+        return ",".join(str(value) for value in data["fingerprint"]), data.get("duration")
+
+    def duplicates(self):
+        """Group duplicate files and total the space that removing the extra copies would free.
+
+        Exact duplicates share a SHA-256. Same-source groups are files
+        downloaded from the same video in the same format that have not been
+        hashed identical (e.g. re-downloads still being hashed). Audio groups
+        are files whose audio fingerprints match closely. Files that are
+        already hard links of each other free nothing.
+        """
+        conn = self._db.get()
+        rows = conn.execute(
+            "SELECT filename, sha256, source_id, format, audio_fingerprint, duration FROM fingerprints"
+        ).fetchall()
+        present = {}
+        for row in rows:
+            try:
+                present[row[0]] = (row, os.stat(os.path.join(self.folder, row[0])))
+            except OSError:
+                continue
+
+        groups = []
+        grouped = set()
+
+        def add_group(kind, key, filenames):
+            files = sorted(filenames)
+            inodes = {}
+            for name in files:
+                stat = present[name][1]
+                inodes[(stat.st_dev, stat.st_ino)] = stat.st_size
+            reclaimable = sum(inodes.values()) - max(inodes.values())
+            groups.append({"kind": kind, "key": key, "files": files, "reclaimable_bytes": reclaimable})
+            grouped.update(files)
+
+        by_hash = {}
+        for name, (row, _) in present.items():
+            if row[1]:
+                by_hash.setdefault(row[1], []).append(name)
+        for sha256, names in by_hash.items():
+            if len(names) > 1:
+                add_group("identical", sha256, names)
+
+        by_source = {}
+        for name, (row, _) in present.items():
+            if row[2] and name not in grouped:
+                by_source.setdefault((row[2], row[3]), []).append(name)
+        for (source_id, format), names in by_source.items():
+            if len(names) > 1:
+                add_group("same_source", f"{source_id}:{format}", names)
+
+        # Only compare tracks of similar length; fingerprints are compared bit by bit
+        candidates = sorted(
+            (row[5], name, [int(v) for v in row[4].split(",")])
+            for name, (row, _) in present.items()
+            if row[4] and row[5] and name not in grouped
+        )
+        matched = set()
+        for i, (duration, name, fingerprint) in enumerate(candidates):
+            if name in matched:
+                continue
+            names = [name]
+            for other_duration, other_name, other_fingerprint in candidates[i + 1:]:
+                if other_duration - duration > 2:
+                    break
+                if other_name not in matched and self._audio_similarity(fingerprint, other_fingerprint) >= self.AUDIO_MATCH_THRESHOLD:
+                    names.append(other_name)
+            if len(names) > 1:
+                matched.update(names)
+                add_group("same_audio", name, names)
+
+        groups.sort(key=lambda group: group["reclaimable_bytes"], reverse=True)
+        return {"groups": groups, "reclaimable_bytes": sum(group["reclaimable_bytes"] for group in groups)}
+
+    @staticmethod
+    def _audio_similarity(a, b):
+        length = min(len(a), len(b))
+        if length == 0:
+            return 0.0
+        differing = sum(bin((x ^ y) & 0xFFFFFFFF).count("1") for x, y in zip(a[:length], b[:length]))
+        return 1.0 - differing / (32.0 * length)
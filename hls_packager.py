@@ -0,0 +1,174 @@
+import os
+import json
+import queue
+import shutil
+import threading
+
+
+class HlsPackager:
+    """Background HLS packaging of library videos.
+
+    Each queued file is encoded once into a ladder of H.264/AAC renditions
+    with 6-second fMP4 segments and a master playlist, stored in
+    download_path/.hls/<filename>/. The package records the source size and
+    mtime and is rebuilt if the source changes. One worker runs at a time so
+    packaging never competes with itself for CPU.
+    """
+
+    HLS_DIR = ".hls"
+    SEGMENT_SECONDS = 6
+    # (height, video bitrate) rungs; only rungs at or below the source height are used
+    LADDER = [(720, 2500), (480, 1200), (360, 800), (240, 400), (144, 200)]
+    AUDIO_BITRATE = "96k"
+
+    def __init__(self, downloader, folder):
+        self.downloader = downloader
+        self.folder = os.path.abspath(folder)
+        self.root = os.path.join(self.folder, self.HLS_DIR)
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        self._thread = threading.Thread(target=self._worker, name="hls-packager", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put(None)
+
+    def queue_depth(self):
+        """Files queued or being processed."""
+        return len(self._pending)
+
+    def package_dir(self, filename):
+        # Keyed on the full filename so "X.mp4" and "X.webm" get separate packages
+        return os.path.join(self.root, os.path.basename(filename))
+
+    def master_url(self, filename):
+        """Return the master playlist path relative to the HLS root, or None if not packaged yet."""
+        if not self.is_current(filename):
+            return None
+        return f"{os.path.basename(self.package_dir(filename))}/master.m3u8"
+
+    def is_current(self, filename):
+        """True when a finished package exists for the source file as it is now."""
+        try:
+            with open(os.path.join(self.package_dir(filename), "source.json"), "r", encoding="utf-8") as f:
+                recorded = json.load(f)
+            stat = os.stat(os.path.join(self.folder, filename))
+        except (OSError, ValueError):
+            return False
+        return recorded.get("size") == stat.st_size and recorded.get("mtime") == stat.st_mtime
+
+    def status(self, filename):
+        if self.is_current(filename):
+            return "ready"
+        with self._lock:
+            return "pending" if filename in self._pending else "missing"
+
+    def discard(self, filename):
+        """Remove the package of a deleted library file."""
+        shutil.rmtree(self.package_dir(filename), ignore_errors=True)
+
+    def enqueue(self, filename):
+        """Queue a library file for packaging unless it is already packaged or queued."""
+        filename = os.path.basename(filename)
+        if self.is_current(filename):
+            return
+        with self._lock:
+            if filename in self._pending:
+                return
+            self._pending.add(filename)
+        self._queue.put(filename)
+
+    def prune(self):
+        """Remove packages whose source file is gone, and leftover work directories."""
+        for name in os.listdir(self.root):
+            if name.endswith(".tmp") or not os.path.isfile(os.path.join(self.folder, name)):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def _worker(self):
+        try:
+            self.prune()
+        except OSError as e:
+            print(f"HLS prune failed: {e}")
+        while True:
+            filename = self._queue.get()
+            if filename is None:
+                return
+            try:
+                self.package(filename)
+            except Exception as e:
+                print(f"HLS packaging failed for {filename}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(filename)
+
+    def package(self, filename):
+        """Encode the HLS ladder for one library file into its package directory."""
+        source_path = os.path.join(self.folder, filename)
+        stat = os.stat(source_path)
+        streams = self.downloader.probe_streams(source_path)
+        if streams["video"] is None:
+            print(f"Skipping HLS packaging for {filename}: no video stream")
+            return
+
+        source_height = int(streams["video"].get("height") or 0)
+        rungs = [rung for rung in self.LADDER if rung[0] <= source_height] or [self.LADDER[-1]]
+        has_audio = streams["audio"] is not None
+
+        final_dir = self.package_dir(filename)
+        work_dir = f"{final_dir}.tmp"
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+
+        split = f"[0:v]split={len(rungs)}" + "".join(f"[s{i}]" for i in range(len(rungs)))
+        scales = "".join(f";[s{i}]scale=-2:{height}[v{i}]" for i, (height, _) in enumerate(rungs))
+
+        command = ["ffmpeg", "-i", source_path, "-filter_complex", split + scales]
+        stream_map = []
+        for i, (height, bitrate) in enumerate(rungs):
+            command += ["-map", f"[v{i}]"]
+            if has_audio:
+                command += ["-map", "0:a:0"]
+            command += [
+                f"-b:v:{i}", f"{bitrate}k",
+                f"-maxrate:v:{i}", f"{int(bitrate * 1.07)}k",
+                f"-bufsize:v:{i}", f"{int(bitrate * 1.5)}k",
+            ]
+            stream_map.append(f"v:{i},a:{i}" if has_audio else f"v:{i}")
+
+        command += [
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-pix_fmt", "yuv420p",
+            # Keyframes on segment boundaries in every rendition so players can switch between them
+            "-sc_threshold", "0",
+            "-force_key_frames", f"expr:gte(t,n_forced*{self.SEGMENT_SECONDS})",
+        ]
+        if has_audio:
+            command += ["-c:a", "aac", "-b:a", self.AUDIO_BITRATE, "-ac", "2"]
+        command += [
+            "-f", "hls",
+            "-hls_time", str(self.SEGMENT_SECONDS),
+            "-hls_playlist_type", "vod",
+            "-hls_segment_type", "fmp4",
+            "-hls_flags", "independent_segments",
+            "-hls_segment_filename", os.path.join(work_dir, "v%v", "seg_%05d.m4s"),
+            "-master_pl_name", "master.m3u8",
+            "-var_stream_map", " ".join(stream_map),
+            "-y",
+            os.path.join(work_dir, "v%v", "index.m3u8")
+        ]
+
+        print(f"Packaging HLS for {filename} ({', '.join(f'{h}p' for h, _ in rungs)})")
+        self.downloader._run_ffmpeg(command, priority="background")
+
+        with open(os.path.join(work_dir, "source.json"), "w", encoding="utf-8") as f:
+            json.dump({"size": stat.st_size, "mtime": stat.st_mtime}, f)
+
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(work_dir, final_dir)
+        print(f"HLS package ready: {final_dir}")
@@ -0,0 +1,218 @@
+import os
+import threading
+
+import metrics
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+try:
+    from mutagen import File as MutagenFile
+except ImportError:
+    MutagenFile = None
+
+
+class _LibraryEventHandler(FileSystemEventHandler):
+    """Forward watchdog events for the download folder into the index."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.index.update(os.path.basename(event.src_path))
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.index.update(os.path.basename(event.src_path))
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.index.discard(os.path.basename(event.src_path))
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.index.discard(os.path.basename(event.src_path))
+            if os.path.dirname(os.path.abspath(event.dest_path)) == self.index.folder:
+                self.index.update(os.path.basename(event.dest_path))
+
+
+class LibraryIndex:
+    """In-memory view of the files in the download folder.
+
+    The folder is scanned once on start. After that the index is kept current
+    by watchdog events when watchdog is installed, or by polling the folder's
+    mtime otherwise. Endpoints read from memory instead of calling os.listdir.
+
+    Durations are read lazily from the file header with mutagen. When
+    mutagen is not installed or can't parse a file (e.g. Matroska),
+    probe_duration(path), if given, is asked instead.
+    """
+
+    POLL_INTERVAL = 2.0  # seconds between directory mtime checks without watchdog
+
+    def __init__(self, folder, probe_duration=None):
+        self.folder = os.path.abspath(folder)
+        self.probe_duration = probe_duration
+        self.version = 0
+        self._entries = {}
+        self._names = ()
+        self._lock = threading.Lock()
+        self._observer = None
+        self._poll_thread = None
+        self._stop_event = threading.Event()
+        self._folder_mtime = None
+
+    def start(self):
+        """Scan the folder and begin watching it for changes."""
+        self.refresh()
+
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_LibraryEventHandler(self), self.folder, recursive=False)
+            self._observer.daemon = True
+            self._observer.start()
+            print(f"Library index watching {self.folder} ({len(self._entries)} files)")
+        else:
+            self._poll_thread = threading.Thread(target=self._poll, daemon=True)
+            self._poll_thread.start()
+            print(f"Library index polling {self.folder} ({len(self._entries)} files)")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+    def refresh(self):
+        """Rescan the whole folder, keeping cached durations for unchanged files."""
+        try:
+            self._folder_mtime = os.stat(self.folder).st_mtime
+        except OSError:
+            self._folder_mtime = None
+
+        entries = {}
+        with metrics.LIBRARY_SCAN_SECONDS.time(), os.scandir(self.folder) as it:
+            for item in it:
+                try:
+                    if not item.is_file():
+                        continue
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries[item.name] = {"size": stat.st_size, "mtime": stat.st_mtime, "mtime_ns": stat.st_mtime_ns, "duration": None}
+
+        with self._lock:
+            for name, entry in entries.items():
+                previous = self._entries.get(name)
+                if previous and previous["size"] == entry["size"] and previous["mtime"] == entry["mtime"]:
+                    entry["duration"] = previous["duration"]
+
+            if entries.keys() != self._entries.keys() or any(
+                self._entries[name]["size"] != entry["size"] or self._entries[name]["mtime"] != entry["mtime"]
+                for name, entry in entries.items()
+            ):
+                self._entries = entries
+                self._names = tuple(entries)
+                self.version += 1
+
+    def update(self, name):
+        """Add or re-stat a single file after it was created or modified."""
+        path = os.path.join(self.folder, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.discard(name)
+            return
+
+        if not os.path.isfile(path):
+            return
+
+        with self._lock:
+            previous = self._entries.get(name)
+            if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+                return
+
+            self._entries[name] = {
+                "size": stat.st_size, "mtime": stat.st_mtime, "mtime_ns": stat.st_mtime_ns, "duration": None
+            }
+            if previous is None:
+                self._names = self._names + (name,)
+            self.version += 1
+
+    def discard(self, name):
+        """Drop a file that was deleted or moved out of the folder."""
+        with self._lock:
+            if self._entries.pop(name, None) is None:
+                return
+            self._names = tuple(n for n in self._names if n != name)
+            self.version += 1
+
+    def files(self):
+        """Return all filenames in scan order."""
+        return list(self._names)
+
+    def snapshot(self):
+        """Return the current filenames as an immutable tuple (shared, not copied)."""
+        return self._names
+
+    def search(self, query):
+        """Return filenames containing query, case-insensitively."""
+        if not query:
+            return self.files()
+        query = query.lower()
+        return [name for name in self._names if query in name.lower()]
+
+    def total_size(self):
+        """Bytes used by the files in the folder."""
+        return sum(entry["size"] for entry in list(self._entries.values()))
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._names)
+
+    def get(self, name, with_duration=True):
+        """Return a copy of the size/mtime/duration entry for a file, or None.
+
+        with_duration=False skips reading the duration from the file header.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+
+        if with_duration and entry["duration"] is None:
+            entry["duration"] = self._read_duration(name)
+        return dict(entry, filename=name)
+
+    def _read_duration(self, name):
+        """Read the container duration from the file header with mutagen, or probe_duration as a fallback."""
+        path = os.path.join(self.folder, name)
+        if MutagenFile is not None:
+            try:
+                media = MutagenFile(path)
+                if media is not None and media.info is not None:
+                    return round(media.info.length, 3)
+            except Exception as e:
+                print(f"Duration read error for {name}: {e}")
+        if self.probe_duration is not None:
+            try:
+                return round(self.probe_duration(path), 3)
+            except Exception as e:
+                print(f"Duration probe error for {name}: {e}")
+        return None
+
+    def _poll(self):
+        while not self._stop_event.wait(self.POLL_INTERVAL):
+            try:
+                mtime = os.stat(self.folder).st_mtime
+            except OSError:
+                continue
+            if mtime != self._folder_mtime:
+                self.refresh()
@@ -0,0 +1,234 @@
+import os
+import json
+import array
+import threading
+import subprocess
+
+from sqlite_db import Transaction, ThreadConnections
+
+
+class MediaInfo:
+    """ffprobe results cached in SQLite, keyed by path, size and mtime.
+
+    Stream facts (codecs, resolution, frame rate, duration, bitrate) are read
+    with one ffprobe call the first time a file is asked about. The keyframe
+    index needs a scan of every video packet header, so it is read on first
+    use and stored packed as (pts, frame number) doubles next to the rest.
+    Either is probed again only when the file's size or mtime changes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS media_info (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            info TEXT NOT NULL,
+            keyframes BLOB
+        );
+    """
+    VIDEO_KEYS = ("codec_name", "profile", "width", "height", "pix_fmt", "r_frame_rate", "time_base", "bit_rate")
+    AUDIO_KEYS = ("codec_name", "profile", "sample_rate", "channels", "channel_layout", "bit_rate")
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._db = ThreadConnections(db_path)
+        self._path_locks = {}
+        self._path_locks_lock = threading.Lock()
+        self._db.get().executescript(self.SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _path_lock(self, path):
+        """One lock per file so concurrent callers wait for a single probe instead of each running one."""
+        with self._path_locks_lock:
+            return self._path_locks.setdefault(path, threading.Lock())
+
+    def _row(self, path, stat, columns):
+        row = self._db.get().execute(
+            f"SELECT size, mtime_ns, {columns} FROM media_info WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+            return None
+        return row[2:]
+
+    def get(self, path):
+        """Return {"duration", "bitrate", "format", "video", "audio"} for a media file.
+
+        video and audio describe the first stream of each type, or are None.
+        Raises FileNotFoundError if the file is missing and RuntimeError if
+        ffprobe can't read it.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self._row(path, stat, "info")
+        if row is not None:
+            return json.loads(row[0])
+
+        with self._path_lock(path):
+            row = self._row(path, stat, "info")
+            if row is not None:
+                return json.loads(row[0])
+
+            info = self._probe(path)
+            with Transaction(self._db.get()) as conn:
+                conn.execute(
+                    "INSERT INTO media_info (path, size, mtime_ns, info, keyframes) VALUES (?, ?, ?, ?, NULL) "
+                    "ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                    "info = excluded.info, keyframes = NULL",
+                    (path, stat.st_size, stat.st_mtime_ns, json.dumps(info, separators=(",", ":")))
+                )
+            return info
+
+    def keyframes(self, path):
+        """Sorted (pts_time, frame number) of every keyframe in the first video stream.
+
+        The frame number counts video frames in presentation order, so the
+        difference between two entries is the number of frames between them.
+        """
+        path = os.path.abspath(path)
+        self.get(path)
+        stat = os.stat(path)
+        row = self._row(path, stat, "keyframes")
+        if row is None or row[0] is None:
+            with self._path_lock(path):
+                row = self._row(path, stat, "keyframes")
+                if row is None or row[0] is None:
+                    packed = self._probe_keyframes(path)
+                    with Transaction(self._db.get()) as conn:
+                        conn.execute(
+                            "UPDATE media_info SET keyframes = ? WHERE path = ? AND size = ? AND mtime_ns = ?",
+                            (packed.tobytes(), path, stat.st_size, stat.st_mtime_ns)
+                        )
+                    row = (packed.tobytes(),)
+
+        values = array.array("d")
+        values.frombytes(row[0])
+        return [(values[i], int(values[i + 1])) for i in range(0, len(values), 2)]
+
+    def rename(self, old_path, new_path):
+        """Carry a file's cached results over after it was moved (a rename keeps its size and mtime)."""
+        with Transaction(self._db.get()) as conn:
+            conn.execute("DELETE FROM media_info WHERE path = ?", (os.path.abspath(new_path),))
+            conn.execute(
+                "UPDATE media_info SET path = ? WHERE path = ?", (os.path.abspath(new_path), os.path.abspath(old_path))
+            )
+
+    def discard(self, path):
+        with Transaction(self._db.get()) as conn:
+            conn.execute("DELETE FROM media_info WHERE path = ?", (os.path.abspath(path),))
+
+    def prune(self):
+        """Drop entries for files that no longer exist. Returns how many were removed."""
+        paths = [row[0] for row in self._db.get().execute("SELECT path FROM media_info")]
+        missing = [(path,) for path in paths if not os.path.exists(path)]
+        if missing:
+            with Transaction(self._db.get()) as conn:
+                conn.executemany("DELETE FROM media_info WHERE path = ?", missing)
+        return len(missing)
+
+    def _run(self, command):
+        try:
+            return subprocess.run(command, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(e.stderr.strip() if e.stderr else str(e))
+
+    def _probe(self, path):
+        result = self._run([
+            "ffprobe", "-v", "error",
+            "-show_entries",
+            "format=format_name,duration,bit_rate:stream=codec_type,"
+            + ",".join(sorted(set(self.VIDEO_KEYS + self.AUDIO_KEYS))),
+            "-of", "json",
+            path
+        ])
+        data = json.loads(result.stdout)
+        fmt = data.get("format", {})
+        info = {
+            "format": fmt.get("format_name"),
+            "duration": _number(fmt.get("duration")),
+            "bitrate": _number(fmt.get("bit_rate"), int),
+            "video": None,
+            "audio": None,
+        }
+        for stream in data.get("streams", []):
+            codec_type = stream.get("codec_type")
+            if codec_type == "video" and info["video"] is None:
+                info["video"] = {key: stream.get(key) for key in self.VIDEO_KEYS}
+                info["video"]["fps"] = _frame_rate(stream.get("r_frame_rate"))
+            elif codec_type == "audio" and info["audio"] is None:
+                info["audio"] = {key: stream.get(key) for key in self.AUDIO_KEYS}
+        return info
+
+    def h264_parameter_sets(self, path):
+        """Fields of the first SPS and PPS in an H.264 file's headers, as {"sps": {...}, "pps": {...}}.
+
+        Read with ffmpeg's trace_headers bitstream filter from the stream's
+        extradata (nothing is decoded), so two files can be checked for
+        matching parameter sets. Not cached; it only reads one packet.
+        """
+        result = self._run([
+            "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+            "-map", "0:v:0", "-c", "copy", "-bsf:v", "trace_headers",
+            "-frames:v", "1", "-f", "null", "-"
+        ])
+        sections = {"Sequence Parameter Set": "sps", "Picture Parameter Set": "pps"}
+        parameter_sets = {}
+        current = None
+        for line in result.stderr.splitlines():
+            if not line.startswith("[trace_headers"):
+                continue
+            text = line.partition("] ")[2].strip()
+            if not text[:1].isdigit():
+                # A section header; only the first SPS and PPS are kept
+                current = sections.get(text)
+                if current in parameter_sets:
+                    current = None
+                elif current is not None:
+                    parameter_sets[current] = {}
+                continue
+            if current is not None:
+                fields = text.split()
+                if len(fields) >= 4 and fields[-2] == "=":
+                    parameter_sets[current][fields[1]] = int(fields[-1])
+        return parameter_sets if len(parameter_sets) == 2 else None
+
+    def _probe_keyframes(self, path):
+        """Scan the video packet headers (nothing is decoded) and pack the keyframe index."""
+        result = self._run([
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            path
+        ])
+        packets = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            try:
+                packets.append((float(pts_time), "K" in flags))
+            except ValueError:
+                continue
+        packets.sort()
+
+        packed = array.array("d")
+        for frame, (pts, is_key) in enumerate(packets):
+            if is_key:
+                packed.extend((pts, frame))
+        return packed
+
+
+def _number(value, kind=float):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _frame_rate(value):
+    """ffprobe's "30000/1001" style rate as a float, or None."""
+    numerator, _, denominator = (value or "").partition("/")
+    try:
+        return round(float(numerator) / float(denominator or 1), 3)
+    except (ValueError, ZeroDivisionError):
+        return None
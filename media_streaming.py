@@ -0,0 +1,95 @@
+import os
+import asyncio
+from email.utils import parsedate_to_datetime
+
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse that holds a stream slot for as long as the body is being sent.
+
+    Range (206, including multi-range), ETag and Last-Modified handling come
+    from Starlette's FileResponse. It only hands the file to the server
+    zero-copy on servers with the http.response.pathsend extension; uvicorn
+    doesn't have it, so there every byte is read and sent in chunk_size
+    pieces. nginx via media_base_url is still the better fit for big libraries.
+    """
+
+    chunk_size = 1024 * 1024  # fewer, larger reads for spinning disks
+
+    def __init__(self, *args, limiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.limiter is not None:
+                self.limiter.release()
+
+
+class ProcessStreamingResponse(StreamingResponse):
+    """StreamingResponse of a subprocess's output that kills the process when the response ends.
+
+    The body generator only cleans up once it has been started, so this also
+    covers a client that goes away before the first chunk is sent.
+    """
+
+    def __init__(self, content, process, **kwargs):
+        super().__init__(content, **kwargs)
+        self.process = process
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.process.returncode is None:
+                self.process.kill()
+
+
+class MediaStreamer:
+    """Serve library media with conditional requests and a cap on concurrent streams."""
+
+    def __init__(self, folder, max_streams=16, wait_timeout=10.0):
+        self.folder = os.path.abspath(folder)
+        self.wait_timeout = wait_timeout
+        self._slots = asyncio.Semaphore(max_streams)
+
+    def release(self):
+        self._slots.release()
+
+    async def respond(self, request, filename, folder=None):
+        """Serve filename from folder (default: the library folder)."""
+        path = os.path.abspath(os.path.join(folder or self.folder, os.path.basename(filename)))
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return Response(status_code=404)
+
+        response = MediaFileResponse(path, stat_result=stat_result, limiter=self)
+        if self._not_modified(request, response, stat_result):
+            return Response(status_code=304, headers={
+                "ETag": response.headers["etag"],
+                "Last-Modified": response.headers["last-modified"],
+            })
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            return Response("Too many active streams", status_code=503, headers={"Retry-After": "5"})
+        return response
+
+    def _not_modified(self, request, response, stat_result):
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or response.headers["etag"] in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
@@ -0,0 +1,88 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+
+YOUTUBE_ID_PATTERN = re.compile(r"(?:v=|youtu\.be/|shorts/|embed/|live/)([\w-]{11})")
+
+
+def video_cache_key(video_url):
+    """Return the YouTube video ID for a URL, or a hash of the URL for anything else."""
+    match = YOUTUBE_ID_PATTERN.search(video_url)
+    if match:
+        return match.group(1)
+    return "url-" + hashlib.sha1(video_url.encode("utf-8")).hexdigest()
+
+
+class MetadataCache:
+    """On-disk cache of yt-dlp info dicts, one JSON file per video ID.
+
+    Entries expire after ttl seconds. When more than max_entries are stored
+    the least recently used ones are removed; a file's mtime is bumped on
+    every hit so it doubles as the access time.
+    """
+
+    def __init__(self, folder, ttl=7 * 24 * 60 * 60, max_entries=500):
+        self.folder = folder
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def get(self, key, max_age=None):
+        """Return the cached info dict for key, or None if missing or older than max_age (default ttl)."""
+        max_age = self.ttl if max_age is None else max_age
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get("fetched", 0) > max_age:
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("info")
+
+    def put(self, key, info):
+        """Store an info dict (already passed through YoutubeDL.sanitize_info)."""
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched": time.time(), "info": info}, f)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Metadata cache write error for {key}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            try:
+                entries = [item for item in os.scandir(self.folder) if item.name.endswith(".json")]
+            except OSError:
+                return
+            if len(entries) <= self.max_entries:
+                return
+
+            entries.sort(key=lambda item: item.stat().st_mtime)
+            for item in entries[:len(entries) - self.max_entries]:
+                try:
+                    os.remove(item.path)
+                except OSError:
+                    pass
@@ -0,0 +1,224 @@
+import time
+import threading
+import contextlib
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("youtube-burgundy")
+except ImportError:
+    _tracer = None
+
+
+# Latency buckets in seconds, from a cached page render up to a long encode
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """A value that only goes up, per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{self._format_labels(key)} {_format(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            values = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[i] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe how long the with-block took, in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            values = {key: list(value) for key, value in self._values.items()}
+        lines = []
+        for key, value in sorted(values.items()):
+            for bound, count in zip(self.buckets, value):
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', _format(bound))])} {count}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', '+Inf')])} {value[-1]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_format(value[-2])}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {value[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value read when metrics are scraped.
+
+    callback returns a number, or {label values tuple: number} when the
+    gauge has labels.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), callback=None):
+        super().__init__(name, help, labels)
+        self.callback = callback
+
+    def _samples(self):
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Metric {self.name} could not be read: {e}")
+            return []
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{self._format_labels(tuple(str(v) for v in key))} {_format(number)}"
+            for key, number in sorted(value.items())
+            if number is not None
+        ]
+
+
+class Registry:
+    """The set of metrics rendered at /metrics."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, labels=(), callback=None):
+        return self.register(Gauge(name, help, labels, callback))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """An OpenTelemetry span around the with-block when opentelemetry is installed, otherwise nothing."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes={k: v for k, v in attributes.items() if v is not None}) as current:
+        yield current
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "youtube_burgundy_http_request_seconds",
+    "Time to produce a response (headers for streamed responses), by route",
+    ("method", "route", "status")
+)
+TEMPLATE_RENDER_SECONDS = REGISTRY.histogram(
+    "youtube_burgundy_template_render_seconds", "Time to render an HTML template", ("template",)
+)
+DOWNLOAD_PHASE_SECONDS = REGISTRY.histogram(
+    "youtube_burgundy_download_phase_seconds",
+    "Time spent in each phase of a download: extract, download or postprocess",
+    ("kind", "phase")
+)
+DOWNLOAD_PHASES = REGISTRY.counter(
+    "youtube_burgundy_download_phases_total", "Download phases run, by outcome", ("kind", "phase", "outcome")
+)
+DOWNLOAD_BYTES = REGISTRY.counter(
+    "youtube_burgundy_download_bytes_total", "Bytes fetched by yt-dlp", ("kind",)
+)
+FFMPEG_SECONDS = REGISTRY.histogram(
+    "youtube_burgundy_ffmpeg_seconds", "Wall time of ffmpeg jobs", ("priority", "status")
+)
+FFMPEG_QUEUE_SECONDS = REGISTRY.histogram(
+    "youtube_burgundy_ffmpeg_queue_seconds", "Time ffmpeg jobs waited for a slot", ("priority",)
+)
+FFMPEG_SPEED = REGISTRY.histogram(
+    "youtube_burgundy_ffmpeg_speed",
+    "Encode speed of finished ffmpeg jobs as a multiple of real time",
+    ("priority",),
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+LIBRARY_SCAN_SECONDS = REGISTRY.histogram(
+    "youtube_burgundy_library_scan_seconds", "Time to rescan the download folder"
+)
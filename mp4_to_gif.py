@@ -1,42 +1,170 @@
-import sys
 import os
+import time
+import uuid
+import argparse
+import threading
 import subprocess
-import tempfile
+from concurrent.futures import CancelledError, ProcessPoolExecutor
 
-def mp4_to_gif(mp4_path):
+
+def gif_filter(fps=15, width=960):
+    """Filtergraph that builds the palette and applies it in the same pass.
+
+    The frames are split in two: one copy feeds palettegen, the other waits
+    for the palette in paletteuse, so the input is only decoded once and no
+    palette file is written to disk.
+    """
+    return (
+        f"fps={fps},scale={width}:-1:flags=lanczos,split[a][b];"
+        "[a]palettegen[p];[b][p]paletteuse"
+    )
+
+
+def gif_command(mp4_path, gif_path, start=None, end=None, fps=15, width=960):
+    """ffmpeg command that writes a video (or the start-end part of it) to gif_path."""
+    command = ["ffmpeg", "-y"]
+    # Seeking before -i means only the requested range is ever decoded
+    if start:
+        command += ["-ss", f"{float(start):.3f}"]
+    command += ["-i", mp4_path]
+    if end is not None:
+        command += ["-t", f"{float(end) - float(start or 0):.3f}"]
+    return command + ["-lavfi", gif_filter(fps, width), "-an", gif_path]
+
+
+def temp_gif_path(gif_path):
+    """Unique temp name so concurrent conversions to the same GIF never clobber each other."""
+    return f"{gif_path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp.gif"
+
+
+def mp4_to_gif(mp4_path, gif_path=None, start=None, end=None, fps=15, width=960):
+    """Convert a video (or the start-end part of it) into a GIF. Returns the GIF path."""
     if not os.path.isfile(mp4_path):
         print("File not found.")
-        return
-
-    folder = os.path.dirname(mp4_path)
-    name = os.path.splitext(os.path.basename(mp4_path))[0]
-    gif_path = os.path.join(folder, f"{name}.gif")
-    palette_path = os.path.join(tempfile.gettempdir(), f"{name}_palette.png")
-
-    # Step 1: generate palette
-    palette_cmd = [
-        "ffmpeg", "-y",
-        "-i", mp4_path,
-        "-vf", "fps=15,scale=960:-1:flags=lanczos,palettegen",
-        palette_path
-    ]
-
-    # Step 2: create gif using palette
-    gif_cmd = [
-        "ffmpeg", "-y",
-        "-i", mp4_path,
-        "-i", palette_path,
-        "-lavfi", "fps=15,scale=960:-1:flags=lanczos[x];[x][1:v]paletteuse",
-        gif_path
-    ]
-
-    subprocess.run(palette_cmd, check=True)
-    subprocess.run(gif_cmd, check=True)
+        return None
+
+    if gif_path is None:
+        folder = os.path.dirname(mp4_path)
+        name = os.path.splitext(os.path.basename(mp4_path))[0]
+        gif_path = os.path.join(folder, f"{name}.gif")
+
+    temp_path = temp_gif_path(gif_path)
+    try:
+        subprocess.run(
+            gif_command(mp4_path, temp_path, start, end, fps, width),
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        os.replace(temp_path, gif_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
     print(f"High-quality GIF created at: {gif_path}")
+    return gif_path
+
+
+def convert_batch(paths, workers=None, **options):
+    """Convert several videos at once on a process pool. Returns {path: gif path or error}."""
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {path: executor.submit(mp4_to_gif, path, **options) for path in paths}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except subprocess.CalledProcessError as e:
+                results[path] = RuntimeError(e.stderr.decode("utf-8", "replace").strip() if e.stderr else str(e))
+            except Exception as e:
+                results[path] = e
+    return results
+
+
+class GifJobs:
+    """GIF conversions for the web app, run through the shared FFmpegRunner.
+
+    Conversions are queued at interactive priority, so they count against
+    the runner's slots and timeout and show up in its job list like every
+    other ffmpeg command the app runs. Jobs are kept in memory only; a GIF
+    is quick to redo and the finished file stays in output_folder either way.
+    """
+
+    def __init__(self, output_folder, runner):
+        self.output_folder = output_folder
+        self.runner = runner
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        os.makedirs(self.output_folder, exist_ok=True)
+
+    def submit(self, source_path, name, start=None, end=None, fps=15, width=960):
+        gif_path = os.path.join(self.output_folder, f"{name}.gif")
+        job = {
+            "id": uuid.uuid4().hex,
+            "source": os.path.basename(source_path),
+            "filename": os.path.basename(gif_path),
+            "status": "running",
+            "message": "",
+            "created": time.time(),
+        }
+        if not os.path.isfile(source_path):
+            job["status"] = "failed"
+            job["message"] = "Source video not found."
+        with self._lock:
+            self._jobs[job["id"]] = job
+        if job["status"] == "failed":
+            return dict(job)
+
+        temp_path = temp_gif_path(gif_path)
+        future = self.runner.submit(
+            gif_command(source_path, temp_path, start, end, fps, width),
+            priority="interactive",
+            duration=float(end) - float(start or 0) if end is not None else None,
+            label=job["filename"]
+        )
+        future.add_done_callback(lambda f: self._finish(job["id"], f, temp_path, gif_path))
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _finish(self, job_id, future, temp_path, gif_path):
+        message = ""
+        try:
+            future.result()
+            os.replace(temp_path, gif_path)
+        except CancelledError:
+            message = "Cancelled"
+        except Exception as e:
+            # FFmpegError carries ffmpeg's stderr; its last line usually names the error
+            lines = str(e).strip().splitlines()
+            message = lines[-1] if lines else "GIF creation failed."
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "failed" if message else "finished"
+            job["message"] = message
+
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python mp4_to_gif.py your_video.mp4")
+    parser = argparse.ArgumentParser(description="Convert videos to high-quality GIFs")
+    parser.add_argument("videos", nargs="+", help="Video files to convert")
+    parser.add_argument("--start", type=float, default=None, help="Start time in seconds")
+    parser.add_argument("--end", type=float, default=None, help="End time in seconds")
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--workers", type=int, default=None, help="Parallel conversions (default: half the CPUs)")
+    args = parser.parse_args()
+
+    options = {"start": args.start, "end": args.end, "fps": args.fps, "width": args.width}
+    if len(args.videos) == 1:
+        mp4_to_gif(args.videos[0], **options)
     else:
-        mp4_to_gif(sys.argv[1])
+        for path, result in convert_batch(args.videos, workers=args.workers, **options).items():
+            if isinstance(result, Exception):
+                print(f"Failed: {path}: {result}")
@@ -0,0 +1,161 @@
+import time
+import uuid
+import random
+import threading
+
+
+class SeededPermutation:
+    """A shuffled order of range(size) that is computed per index, never stored.
+
+    Indexes are scrambled with a small Feistel network over the next
+    even-bit power of two, walking the cycle until the result lands inside
+    range(size). The same seed always gives the same order, and both
+    directions (position -> item and item -> position) are O(1) on average.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, size, seed):
+        self.size = size
+        self.seed = seed
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self._half_bits = bits // 2
+        self._mask = (1 << self._half_bits) - 1
+        generator = random.Random(seed)
+        self._keys = [generator.getrandbits(32) for _ in range(self.ROUNDS)]
+
+    def __len__(self):
+        return self.size
+
+    def _round(self, value, key):
+        x = (value * 0x9E3779B1 + key) & 0xFFFFFFFF
+        x ^= x >> 15
+        x = (x * 0x85EBCA6B) & 0xFFFFFFFF
+        x ^= x >> 13
+        return x & self._mask
+
+    def _encrypt(self, value):
+        left, right = value >> self._half_bits, value & self._mask
+        for key in self._keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self._half_bits) | right
+
+    def _decrypt(self, value):
+        left, right = value >> self._half_bits, value & self._mask
+        for key in reversed(self._keys):
+            left, right = right ^ self._round(left, key), left
+        return (left << self._half_bits) | right
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def index(self, value):
+        """Position at which value appears in the shuffled order."""
+        if not 0 <= value < self.size:
+            raise ValueError(value)
+        index = self._decrypt(value)
+        while index >= self.size:
+            index = self._decrypt(index)
+        return index
+
+
+class PlayQueue:
+    """Playback order over a fixed snapshot of filenames, with a current position.
+
+    A shuffled queue started from a given track swaps that track with the
+    first one of the shuffled order, so it plays first and the rest of the
+    library still follows.
+    """
+
+    def __init__(self, items, shuffle=False, seed=None, position=0):
+        self.items = tuple(items)
+        self.shuffle = shuffle
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.order = SeededPermutation(len(self.items), self.seed) if shuffle else None
+        self.position = position
+        self.first = 0  # shuffled position swapped with position 0
+        self.touched = time.time()
+
+    def _swapped(self, position):
+        if position == 0:
+            return self.first
+        return 0 if position == self.first else position
+
+    def __len__(self):
+        return len(self.items)
+
+    def item(self, index):
+        return self.items[self.order[self._swapped(index)]] if self.order else self.items[index]
+
+    def window(self, offset, limit):
+        """Up to limit filenames starting at queue position offset."""
+        offset = max(0, offset)
+        return [self.item(i) for i in range(offset, min(len(self), offset + max(0, limit)))]
+
+    def position_of(self, filename):
+        """Queue position of filename, or None if it is not in the queue."""
+        try:
+            index = self.items.index(filename)
+        except ValueError:
+            return None
+        return self._swapped(self.order.index(index)) if self.order else index
+
+    def seek(self, position):
+        if not 0 <= position < len(self):
+            raise IndexError("Queue position out of range")
+        self.position = position
+
+
+class QueueManager:
+    """Playback queues for browser sessions, kept in memory and expired when idle."""
+
+    IDLE_TTL = 6 * 60 * 60
+    MAX_QUEUES = 500
+
+    def __init__(self):
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def create(self, items, shuffle=False, seed=None, start=None):
+        """Create a queue and return (queue_id, queue).
+
+        start is a filename to begin at: an in-order queue starts at its
+        position, a shuffled one moves it to the front of the shuffled order.
+        """
+        queue = PlayQueue(items, shuffle=shuffle, seed=seed)
+        if start is not None:
+            position = queue.position_of(start)
+            if position is not None and shuffle:
+                queue.first = position
+            elif position is not None:
+                queue.seek(position)
+
+        queue_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            self._queues[queue_id] = queue
+        return queue_id, queue
+
+    def get(self, queue_id):
+        with self._lock:
+            queue = self._queues.get(queue_id)
+            if queue is not None:
+                queue.touched = time.time()
+            return queue
+
+    def _expire(self):
+        """Drop idle queues, then the least recently used ones past MAX_QUEUES. Caller holds the lock."""
+        cutoff = time.time() - self.IDLE_TTL
+        for queue_id in [qid for qid, queue in self._queues.items() if queue.touched < cutoff]:
+            del self._queues[queue_id]
+
+        overflow = len(self._queues) - self.MAX_QUEUES + 1
+        if overflow > 0:
+            for queue_id in sorted(self._queues, key=lambda qid: self._queues[qid].touched)[:overflow]:
+                del self._queues[queue_id]
@@ -0,0 +1,110 @@
+import os
+import json
+import threading
+import time
+
+
+class PlaylistIndex:
+    """In-memory file -> playlists reverse index over the playlist JSON files.
+
+    Playlist files are parsed once and then only re-read when their mtime
+    changes. The playlist endpoints report their writes with record() and
+    forget(), so lookups never have to open every playlist on disk.
+    """
+
+    CHECK_INTERVAL = 5.0  # seconds between mtime sweeps for edits made outside the app
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._playlists = {}  # file stem -> {"name", "songs", "mtime"}
+        self._reverse = {}    # song filename -> set of file stems
+        self._lock = threading.RLock()
+        self._last_check = 0.0
+
+    def refresh(self):
+        """Reload playlist files whose mtime changed and drop deleted ones."""
+        seen = set()
+        with os.scandir(self.folder) as it:
+            for item in it:
+                if not item.name.endswith(".json"):
+                    continue
+                stem = item.name[:-5]
+                seen.add(stem)
+                try:
+                    mtime = item.stat().st_mtime
+                except OSError:
+                    continue
+
+                cached = self._playlists.get(stem)
+                if cached is not None and cached["mtime"] == mtime:
+                    continue
+
+                try:
+                    with open(item.path, "r", encoding="utf-8") as fd:
+                        data = json.load(fd)
+                except Exception as e:
+                    print("Playlist read error:", e)
+                    continue
+
+                self._store(stem, data.get("name", stem), data.get("songs", []), mtime)
+
+        with self._lock:
+            for stem in list(self._playlists):
+                if stem not in seen:
+                    self.forget(stem)
+            self._last_check = time.monotonic()
+
+    def record(self, stem, data):
+        """Update the index after the app wrote a playlist file."""
+        path = os.path.join(self.folder, f"{stem}.json")
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        self._store(stem, data.get("name", stem), data.get("songs", []), mtime)
+
+    def forget(self, stem):
+        """Remove a deleted playlist from the index."""
+        with self._lock:
+            playlist = self._playlists.pop(stem, None)
+            if playlist is None:
+                return
+            for song in playlist["songs"]:
+                self._unlink(song, stem)
+
+    def containing(self, filename):
+        """Return the names of the playlists that contain filename."""
+        self._maybe_refresh()
+        with self._lock:
+            stems = self._reverse.get(filename, ())
+            return [self._playlists[stem]["name"] for stem in stems]
+
+    def names(self):
+        """Return all playlist file stems."""
+        self._maybe_refresh()
+        with self._lock:
+            return list(self._playlists)
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._last_check >= self.CHECK_INTERVAL:
+            self.refresh()
+
+    def _store(self, stem, name, songs, mtime):
+        with self._lock:
+            previous = self._playlists.get(stem)
+            if previous is not None:
+                for song in previous["songs"]:
+                    self._unlink(song, stem)
+
+            songs = set(songs)
+            self._playlists[stem] = {"name": name, "songs": songs, "mtime": mtime}
+            for song in songs:
+                self._reverse.setdefault(song, set()).add(stem)
+
+    def _unlink(self, song, stem):
+        stems = self._reverse.get(song)
+        if stems is None:
+            return
+        stems.discard(stem)
+        if not stems:
+            del self._reverse[song]
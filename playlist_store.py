@@ -0,0 +1,326 @@
+import os
+import sys
+import json
+import argparse
+import threading
+from abc import ABC, abstractmethod
+
+from playlist_index import PlaylistIndex
+from sqlite_db import Transaction, ThreadConnections
+
+
+class PlaylistStore(ABC):
+    """Interface shared by the playlist storage backends.
+
+    Playlists are addressed by name. Songs are library filenames kept in the
+    order they were added.
+    """
+
+    @abstractmethod
+    def names(self):
+        """Return the names of all playlists."""
+
+    @abstractmethod
+    def exists(self, name):
+        """True if a playlist called name exists."""
+
+    @abstractmethod
+    def create(self, name):
+        """Create an empty playlist. Returns False if it already exists."""
+
+    @abstractmethod
+    def delete(self, name):
+        """Delete a playlist. Returns False if it does not exist."""
+
+    @abstractmethod
+    def songs(self, name):
+        """Return the ordered songs of a playlist, or None if it does not exist."""
+
+    def add(self, name, song):
+        """Append a song, creating the playlist if needed. Returns False if already present."""
+        return self.add_many(name, [song]) == 1
+
+    def remove(self, name, song):
+        """Remove a song. Returns False if it was not in the playlist."""
+        return self.remove_many(name, [song]) == 1
+
+    @abstractmethod
+    def add_many(self, name, songs):
+        """Append songs in one write. Returns how many were newly added."""
+
+    @abstractmethod
+    def remove_many(self, name, songs):
+        """Remove songs in one write. Returns how many were removed."""
+
+    @abstractmethod
+    def containing(self, song):
+        """Return the names of the playlists that contain song."""
+
+    def close(self):
+        pass
+
+    def import_json(self, folder):
+        """Copy every playlists/*.json file into this store. Returns the playlist count."""
+        count = 0
+        for f in sorted(os.listdir(folder)):
+            if not f.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(folder, f), "r", encoding="utf-8") as fd:
+                    data = json.load(fd)
+            except Exception as e:
+                print("Playlist read error:", e)
+                continue
+
+            name = f[:-5]
+            self.create(name)
+            self.add_many(name, data.get("songs", []))
+            count += 1
+        return count
+
+    def export_json(self, folder):
+        """Write every playlist out in the playlists/*.json format. Returns the playlist count."""
+        os.makedirs(folder, exist_ok=True)
+        names = self.names()
+        for name in names:
+            with open(os.path.join(folder, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump({"name": name, "songs": self.songs(name) or []}, f, indent=4)
+        return len(names)
+
+
+class JsonPlaylistStore(PlaylistStore):
+    """The original one-JSON-file-per-playlist layout.
+
+    Read-modify-write cycles are serialized with a lock so concurrent requests
+    can't drop each other's updates, and membership lookups go through a
+    PlaylistIndex instead of scanning every file.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index = PlaylistIndex(folder)
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self.index.refresh()
+
+    def _path(self, name):
+        return os.path.join(self.folder, f"{name}.json")
+
+    def _load(self, name):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, name, data):
+        path = self._path(name)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        os.replace(temp_path, path)
+        self.index.record(name, data)
+
+    def names(self):
+        return self.index.names()
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def create(self, name):
+        with self._lock:
+            if self.exists(name):
+                return False
+            self._save(name, {"name": name, "songs": []})
+            return True
+
+    def delete(self, name):
+        with self._lock:
+            if not self.exists(name):
+                return False
+            os.remove(self._path(name))
+            self.index.forget(name)
+            return True
+
+    def songs(self, name):
+        data = self._load(name)
+        return None if data is None else data.get("songs", [])
+
+    def add_many(self, name, songs):
+        with self._lock:
+            data = self._load(name) or {"name": name, "songs": []}
+            present = set(data["songs"])
+            added = 0
+            for song in songs:
+                if song not in present:
+                    data["songs"].append(song)
+                    present.add(song)
+                    added += 1
+            if added or not self.exists(name):
+                self._save(name, data)
+            return added
+
+    def remove_many(self, name, songs):
+        with self._lock:
+            data = self._load(name)
+            if data is None:
+                return 0
+            doomed = set(songs)
+            kept = [song for song in data.get("songs", []) if song not in doomed]
+            removed = len(data.get("songs", [])) - len(kept)
+            if removed:
+                data["songs"] = kept
+                self._save(name, data)
+            return removed
+
+    def containing(self, song):
+        return self.index.containing(song)
+
+
+class SqlitePlaylistStore(PlaylistStore):
+    """Playlists in an embedded SQLite database running in WAL mode.
+
+    Each add or remove touches a single indexed row instead of rewriting the
+    whole playlist, and WAL lets readers carry on while a write commits.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS playlists (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS playlist_songs (
+            playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+            song TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (playlist_id, song)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS playlist_songs_position ON playlist_songs (playlist_id, position);
+        CREATE INDEX IF NOT EXISTS playlist_songs_song ON playlist_songs (song);
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._db = ThreadConnections(db_path, pragmas=("foreign_keys=ON",))
+        self._db.get().executescript(self.SCHEMA)
+
+    def _write(self):
+        return Transaction(self._db.get())
+
+    def _playlist_id(self, conn, name):
+        row = conn.execute("SELECT id FROM playlists WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def names(self):
+        conn = self._db.get()
+        return [row[0] for row in conn.execute("SELECT name FROM playlists ORDER BY id")]
+
+    def exists(self, name):
+        conn = self._db.get()
+        return self._playlist_id(conn, name) is not None
+
+    def create(self, name):
+        with self._write() as conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO playlists (name) VALUES (?)", (name,))
+            return cursor.rowcount == 1
+
+    def delete(self, name):
+        with self._write() as conn:
+            cursor = conn.execute("DELETE FROM playlists WHERE name = ?", (name,))
+            return cursor.rowcount == 1
+
+    def songs(self, name):
+        conn = self._db.get()
+        playlist_id = self._playlist_id(conn, name)
+        if playlist_id is None:
+            return None
+        rows = conn.execute(
+            "SELECT song FROM playlist_songs WHERE playlist_id = ? ORDER BY position",
+            (playlist_id,)
+        )
+        return [row[0] for row in rows]
+
+    def add_many(self, name, songs):
+        with self._write() as conn:
+            conn.execute("INSERT OR IGNORE INTO playlists (name) VALUES (?)", (name,))
+            playlist_id = self._playlist_id(conn, name)
+            position = conn.execute(
+                "SELECT COALESCE(MAX(position), 0) FROM playlist_songs WHERE playlist_id = ?",
+                (playlist_id,)
+            ).fetchone()[0]
+
+            added = 0
+            for song in songs:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO playlist_songs (playlist_id, song, position) VALUES (?, ?, ?)",
+                    (playlist_id, song, position + 1)
+                )
+                if cursor.rowcount == 1:
+                    position += 1
+                    added += 1
+            return added
+
+    def remove_many(self, name, songs):
+        with self._write() as conn:
+            playlist_id = self._playlist_id(conn, name)
+            if playlist_id is None:
+                return 0
+            cursor = conn.executemany(
+                "DELETE FROM playlist_songs WHERE playlist_id = ? AND song = ?",
+                [(playlist_id, song) for song in songs]
+            )
+            return cursor.rowcount
+
+    def containing(self, song):
+        conn = self._db.get()
+        rows = conn.execute(
+            "SELECT p.name FROM playlist_songs s JOIN playlists p ON p.id = s.playlist_id "
+            "WHERE s.song = ? ORDER BY p.id",
+            (song,)
+        )
+        return [row[0] for row in rows]
+
+    def close(self):
+        self._db.close()
+
+
+def open_playlist_store(backend, folder):
+    """Open the configured playlist backend ("sqlite" or "json") rooted at folder.
+
+    A new SQLite database is seeded from the JSON files already in folder.
+    """
+    if backend == "json":
+        return JsonPlaylistStore(folder)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown playlist store: {backend}")
+
+    os.makedirs(folder, exist_ok=True)
+    db_path = os.path.join(folder, "playlists.db")
+    is_new = not os.path.exists(db_path)
+    store = SqlitePlaylistStore(db_path)
+    if is_new:
+        count = store.import_json(folder)
+        if count:
+            print(f"Imported {count} JSON playlists into {db_path}")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move playlists between the JSON files and the SQLite store.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("--folder", default="playlists", help="Folder holding the *.json playlists")
+    parser.add_argument("--db", default=None, help="SQLite database path (default: <folder>/playlists.db)")
+    args = parser.parse_args()
+
+    store = SqlitePlaylistStore(args.db or os.path.join(args.folder, "playlists.db"))
+    try:
+        if args.command == "import":
+            print(f"Imported {store.import_json(args.folder)} playlists")
+        else:
+            print(f"Exported {store.export_json(args.folder)} playlists")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import os
+import re
+import json
+import base64
+import sqlite3
+import threading
+
+from sqlite_db import Transaction, ThreadConnections
+
+
+class SearchIndex:
+    """SQLite search index over the library with ranked, cursor-paginated results.
+
+    Each file has a row with its title, uploader and tags (from the yt-dlp
+    info recorded when it was downloaded, or derived from the filename),
+    plus size, duration and the time it was added. When SQLite has FTS5 the
+    text columns are full-text indexed with prefix indexes and results are
+    ranked with bm25; otherwise matching falls back to LIKE.
+
+    The index follows the LibraryIndex: whenever the library version changes
+    the next query adds and removes rows to match it.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS media (
+            id INTEGER PRIMARY KEY,
+            filename TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL DEFAULT '',
+            uploader TEXT NOT NULL DEFAULT '',
+            tags TEXT NOT NULL DEFAULT '',
+            source_id TEXT,
+            size INTEGER NOT NULL DEFAULT 0,
+            duration REAL,
+            added REAL NOT NULL,
+            mtime_ns INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS media_added ON media (added, filename);
+        CREATE INDEX IF NOT EXISTS media_size ON media (size, filename);
+        CREATE INDEX IF NOT EXISTS media_duration ON media (duration, filename);
+    """
+    FTS_SCHEMA = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS media_fts USING fts5(
+            filename, title, uploader, tags,
+            content='media', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        );
+        CREATE TRIGGER IF NOT EXISTS media_fts_insert AFTER INSERT ON media BEGIN
+            INSERT INTO media_fts (rowid, filename, title, uploader, tags)
+            VALUES (new.id, new.filename, new.title, new.uploader, new.tags);
+        END;
+        CREATE TRIGGER IF NOT EXISTS media_fts_delete AFTER DELETE ON media BEGIN
+            INSERT INTO media_fts (media_fts, rowid, filename, title, uploader, tags)
+            VALUES ('delete', old.id, old.filename, old.title, old.uploader, old.tags);
+        END;
+        CREATE TRIGGER IF NOT EXISTS media_fts_update AFTER UPDATE ON media BEGIN
+            INSERT INTO media_fts (media_fts, rowid, filename, title, uploader, tags)
+            VALUES ('delete', old.id, old.filename, old.title, old.uploader, old.tags);
+            INSERT INTO media_fts (rowid, filename, title, uploader, tags)
+            VALUES (new.id, new.filename, new.title, new.uploader, new.tags);
+        END;
+    """
+
+    # sort key -> column expression; "relevance" is only used with a query
+    SORT_KEYS = {
+        "name": "m.filename",
+        "added": "m.added",
+        "duration": "COALESCE(m.duration, 0)",
+        "size": "m.size",
+    }
+    # bm25 weights for filename, title, uploader, tags
+    WEIGHTS = (5.0, 10.0, 2.0, 1.0)
+    MAX_LIMIT = 200
+    DURATION_BATCH = 200
+
+    def __init__(self, db_path, library):
+        self.db_path = db_path
+        self.library = library
+        self._db = ThreadConnections(db_path)
+        self._sync_lock = threading.Lock()
+        self._synced_version = None
+
+        conn = self._db.get()
+        conn.executescript(self.SCHEMA)
+        if "mtime_ns" not in {row[1] for row in conn.execute("PRAGMA table_info(media)")}:
+            # Indexes from before the column existed; the next sync refreshes every row
+            conn.execute("ALTER TABLE media ADD COLUMN mtime_ns INTEGER")
+        try:
+            conn.executescript(self.FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"SQLite FTS5 unavailable, search falls back to LIKE: {e}")
+            self.fts = False
+
+    def close(self):
+        self._db.close()
+
+    def record(self, filename, info=None):
+        """Add or refresh a file's row, taking title/uploader/tags from a yt-dlp info dict when given."""
+        entry = self.library.get(filename)
+        if entry is None:
+            return
+        with Transaction(self._db.get()) as conn:
+            self._upsert(conn, filename, entry, info)
+
+    def _upsert(self, conn, filename, entry, info=None):
+        fields = self._fields(filename, info)
+        row = conn.execute("SELECT id FROM media WHERE filename = ?", (filename,)).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO media (filename, title, uploader, tags, source_id, size, duration, added, mtime_ns) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (filename, fields["title"], fields["uploader"], fields["tags"], fields["source_id"],
+                 entry["size"], entry["duration"], entry["mtime"], entry["mtime_ns"])
+            )
+        elif info is not None:
+            conn.execute(
+                "UPDATE media SET title = ?, uploader = ?, tags = ?, source_id = ?, size = ?, duration = ?, "
+                "added = ?, mtime_ns = ? WHERE id = ?",
+                (fields["title"], fields["uploader"], fields["tags"], fields["source_id"],
+                 entry["size"], entry["duration"], entry["mtime"], entry["mtime_ns"], row[0])
+            )
+        else:
+            conn.execute(
+                "UPDATE media SET size = ?, duration = ?, added = ?, mtime_ns = ? WHERE id = ?",
+                (entry["size"], entry["duration"], entry["mtime"], entry["mtime_ns"], row[0])
+            )
+
+    def _fields(self, filename, info):
+        if info:
+            return {
+                "title": info.get("title") or "",
+                "uploader": info.get("uploader") or info.get("channel") or "",
+                "tags": " ".join(info.get("tags") or []),
+                "source_id": info.get("id"),
+            }
+        # Library files are usually named "Song - Artist.ext"
+        stem = os.path.splitext(filename)[0]
+        title, _, uploader = stem.partition(" - ")
+        return {"title": title, "uploader": uploader, "tags": "", "source_id": None}
+
+    def sync(self, blocking=True):
+        """Bring the rows in line with the library if it changed since the last sync.
+
+        With blocking=False a sync already running in another thread is not
+        waited for; the caller sees the rows indexed so far. Durations of new
+        files are read afterwards by a background thread.
+        """
+        if self._synced_version == self.library.version:
+            return
+        if not self._sync_lock.acquire(blocking=blocking):
+            return
+        try:
+            version = self.library.version
+            if self._synced_version == version:
+                return
+
+            conn = self._db.get()
+            indexed = {row[0]: row[1:] for row in conn.execute("SELECT filename, size, mtime_ns FROM media")}
+            files = set(self.library.files())
+            removed = [name for name in indexed if name not in files]
+
+            entries = []
+            for name in files:
+                entry = self.library.get(name, with_duration=False)
+                # A file replaced by one of the same size still gets a new mtime
+                if entry is not None and indexed.get(name) != (entry["size"], entry["mtime_ns"]):
+                    entries.append((name, entry))
+
+            if removed or entries:
+                with Transaction(conn):
+                    conn.executemany("DELETE FROM media WHERE filename = ?", [(name,) for name in removed])
+                    for name, entry in entries:
+                        self._upsert(conn, name, entry)
+
+            self._synced_version = version
+        finally:
+            self._sync_lock.release()
+
+        missing = [name for name, entry in entries if entry["duration"] is None]
+        if missing:
+            threading.Thread(target=self._load_durations, args=(missing,), name="search-durations", daemon=True).start()
+
+    def _load_durations(self, names):
+        """Read durations for rows synced without one, committing every DURATION_BATCH files."""
+        conn = self._db.get()
+        for i in range(0, len(names), self.DURATION_BATCH):
+            updates = []
+            for name in names[i:i + self.DURATION_BATCH]:
+                entry = self.library.get(name)
+                if entry is not None and entry["duration"] is not None:
+                    updates.append((entry["duration"], name, entry["size"], entry["mtime_ns"]))
+            if updates:
+                with Transaction(conn):
+                    conn.executemany("UPDATE media SET duration = ? WHERE filename = ? AND size = ? AND mtime_ns = ?", updates)
+
+    def search(self, query="", sort=None, order=None, cursor=None, limit=50):
+        """Return one page of results and the cursor for the next page (None on the last page)."""
+        self.sync(blocking=False)
+        limit = max(1, min(int(limit), self.MAX_LIMIT))
+        terms = re.findall(r"\w+", query.lower())
+
+        sort = sort or ("relevance" if terms else "added")
+        if sort == "relevance" and not (terms and self.fts):
+            sort = "name" if terms else "added"
+        if sort != "relevance" and sort not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        if order is None:
+            order = "asc" if sort in ("relevance", "name") else "desc"
+        if order not in ("asc", "desc"):
+            raise ValueError("Order must be asc or desc")
+
+        columns = "m.filename, m.title, m.uploader, m.tags, m.size, m.duration, m.added"
+        params = []
+        if terms and self.fts:
+            match = " ".join(f'"{term}"*' for term in terms)
+            weights = ", ".join(str(w) for w in self.WEIGHTS)
+            sort_expression = f"bm25(media_fts, {weights})" if sort == "relevance" else self.SORT_KEYS[sort]
+            inner = (
+                f"SELECT {columns}, {sort_expression} AS sort_value "
+                "FROM media_fts JOIN media m ON m.id = media_fts.rowid WHERE media_fts MATCH ?"
+            )
+            params.append(match)
+        else:
+            inner = f"SELECT {columns}, {self.SORT_KEYS[sort]} AS sort_value FROM media m"
+            if terms:
+                inner += " WHERE " + " AND ".join(
+                    "(m.filename || ' ' || m.title || ' ' || m.uploader || ' ' || m.tags) LIKE ?" for _ in terms
+                )
+                params.extend(f"%{term}%" for term in terms)
+
+        comparison = ">" if order == "asc" else "<"
+        sql = f"SELECT * FROM ({inner})"
+        if cursor:
+            sort_value, filename = self._decode_cursor(cursor)
+            sql += f" WHERE (sort_value, filename) {comparison} (?, ?)"
+            params.extend([sort_value, filename])
+        sql += f" ORDER BY sort_value {order.upper()}, filename {order.upper()} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._db.get().execute(sql, params).fetchall()
+        results = [
+            {
+                "filename": row[0],
+                "title": row[1],
+                "uploader": row[2],
+                "tags": row[3],
+                "size": row[4],
+                "duration": row[5],
+                "added": row[6],
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = self._encode_cursor(last[7], last[0])
+        return {"results": results, "next_cursor": next_cursor, "sort": sort, "order": order}
+
+    @staticmethod
+    def _encode_cursor(sort_value, filename):
+        raw = json.dumps([sort_value, filename]).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            sort_value, filename = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+        return sort_value, filename
@@ -1,10 +1,366 @@
-import demucs.separate
-import sys
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import argparse
+import threading
+import subprocess
+import importlib.util
+import multiprocessing
+
+
+DEFAULT_MODEL = "htdemucs"
+
+
+def demucs_available():
+    return importlib.util.find_spec("demucs") is not None
+
+
+class Separator:
+    """A demucs model loaded once and reused for every track.
+
+    ffmpeg decodes the track into a pipe that is read CHUNK_SECONDS at a
+    time; each chunk is separated (and split further into the model's own
+    segments by apply_model) and its stems are streamed to ffmpeg encoders
+    as they are produced, so only a couple of chunks are ever in memory no
+    matter how long the track is. The level normalization demucs expects is
+    computed in an earlier streaming pass. Neighbouring chunks overlap by
+    CHUNK_OVERLAP seconds and are crossfaded to hide the seams.
+    """
+
+    CHUNK_SECONDS = 300
+    CHUNK_OVERLAP = 2
+    MP3_BITRATE = "320k"
+
+    def __init__(self, model_name=DEFAULT_MODEL, threads=None, device="cpu"):
+        import torch
+        from demucs.pretrained import get_model
+
+        torch.set_num_threads(threads or os.cpu_count() or 1)
+        self.torch = torch
+        self.device = device
+        self.model = get_model(model_name)
+        self.model.to(device)
+        self.model.eval()
+        self.sources = list(self.model.sources)
+        print(f"Loaded demucs model {model_name} ({', '.join(self.sources)}) with {torch.get_num_threads()} threads")
+
+    def _decoder(self, input_path):
+        """ffmpeg process writing the first audio stream as interleaved float32 at the model's rate."""
+        return subprocess.Popen(
+            [
+                "ffmpeg", "-v", "error", "-i", input_path, "-map", "0:a:0",
+                "-f", "f32le", "-ac", str(self.model.audio_channels), "-ar", str(self.model.samplerate), "pipe:1"
+            ],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+    def _read(self, decoder, frames):
+        """Read up to frames samples from a decoder as a (channels, frames) tensor."""
+        import numpy
+
+        channels = self.model.audio_channels
+        data = decoder.stdout.read(frames * channels * 4)
+        samples = numpy.frombuffer(data[:len(data) // (4 * channels) * 4 * channels], dtype=numpy.float32)
+        return self.torch.from_numpy(samples.copy()).view(-1, channels).t()
+
+    def _reference_stats(self, input_path):
+        """Mean and standard deviation of the track's mono mix, read in one streaming pass."""
+        frames = self.CHUNK_SECONDS * self.model.samplerate
+        count, total, squares = 0, 0.0, 0.0
+        decoder = self._decoder(input_path)
+        try:
+            while True:
+                piece = self._read(decoder, frames)
+                if piece.shape[-1] == 0:
+                    break
+                reference = piece.mean(0).double()
+                count += reference.numel()
+                total += reference.sum().item()
+                squares += (reference * reference).sum().item()
+        finally:
+            decoder.kill()
+            decoder.stdout.close()
+            decoder.wait()
+
+        if count == 0:
+            raise RuntimeError(f"Could not decode any audio from {os.path.basename(input_path)}")
+        mean = total / count
+        std = max(squares / count - mean * mean, 0.0) ** 0.5
+        return mean, std or 1.0
+
+    def separate(self, input_path, output_dir):
+        """Write one MP3 per stem into output_dir. Returns {stem name: path}."""
+        from demucs.apply import apply_model
+
+        samplerate = self.model.samplerate
+        channels = self.model.audio_channels
+        mean, std = self._reference_stats(input_path)
+
+        os.makedirs(output_dir, exist_ok=True)
+        paths = {name: os.path.join(output_dir, f"{name}.mp3") for name in self.sources}
+        encoders = {
+            name: subprocess.Popen(
+                [
+                    "ffmpeg", "-f", "f32le", "-ar", str(samplerate), "-ac", str(channels), "-i", "pipe:0",
+                    "-b:a", self.MP3_BITRATE, "-y", path
+                ],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            for name, path in paths.items()
+        }
+
+        chunk = self.CHUNK_SECONDS * samplerate
+        overlap = self.CHUNK_OVERLAP * samplerate
+        fade_in = self.torch.linspace(0, 1, overlap)
+        decoder = self._decoder(input_path)
+        previous = None  # the input's last `overlap` samples before the current chunk
+        tail = None
+
+        try:
+            current = self._read(decoder, chunk)
+            while current.shape[-1]:
+                following = self._read(decoder, chunk)
+                is_last = following.shape[-1] == 0
+                piece = current if previous is None else self.torch.cat([previous, current], -1)
+                with self.torch.no_grad():
+                    out = apply_model(
+                        self.model, ((piece - mean) / std)[None],
+                        device=self.device, split=True, overlap=0.25, progress=False
+                    )[0]
+                out = out * std + mean
+
+                if tail is not None:
+                    head = out[..., :overlap]
+                    out[..., :overlap] = tail * (1 - fade_in) + head * fade_in
+                if not is_last:
+                    tail = out[..., -overlap:].clone()
+                    out = out[..., :-overlap]
+                    previous = current[..., -overlap:]
+
+                for index, name in enumerate(self.sources):
+                    samples = out[index].t().contiguous().cpu().numpy()
+                    encoders[name].stdin.write(samples.tobytes())
+                current = following
+        finally:
+            decoder.kill()
+            decoder.stdout.close()
+            decoder.wait()
+            for encoder in encoders.values():
+                encoder.stdin.close()
+            failed = [name for name, encoder in encoders.items() if encoder.wait() != 0]
+
+        if failed:
+            raise RuntimeError(f"ffmpeg failed to encode stems: {', '.join(failed)}")
+        return paths
+
+
+def _serve(model_name, threads, requests, results):
+    """Child process loop: load the model once, then separate every job sent to it."""
+    try:
+        separator = Separator(model_name, threads=threads)
+        load_error = None
+    except Exception as e:
+        separator = None
+        load_error = f"Could not load demucs model: {e}"
+
+    while True:
+        job = requests.get()
+        if job is None:
+            return
+        if separator is None:
+            results.put({"id": job["id"], "status": "failed", "message": load_error})
+            continue
+
+        results.put({"id": job["id"], "status": "running"})
+        work_dir = f"{job['output_dir']}.tmp"
+        try:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            started = time.time()
+            separator.separate(job["input_path"], work_dir)
+            with open(os.path.join(work_dir, "source.json"), "w", encoding="utf-8") as f:
+                json.dump({"size": job["size"], "mtime": job["mtime"], "stems": separator.sources}, f)
+            shutil.rmtree(job["output_dir"], ignore_errors=True)
+            os.replace(work_dir, job["output_dir"])
+            results.put({
+                "id": job["id"],
+                "status": "finished",
+                "message": f"Separated in {time.time() - started:.0f}s"
+            })
+        except Exception as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            results.put({"id": job["id"], "status": "failed", "message": str(e)})
+
+
+class SeparationService:
+    """Stem separation jobs for the web app, run by one long-lived worker process.
+
+    The worker is started on the first request and keeps the demucs model
+    loaded from then on, so only the first job pays for importing torch and
+    loading weights. Jobs run one after another in the worker, which uses
+    every core through torch's thread pool. Stems are cached per library
+    file in download_path/.stems/<filename>/ and reused until the file changes.
+    """
+
+    STEMS_DIR = ".stems"
+    WORKER_CHECK_INTERVAL = 2.0  # seconds between checks that the worker process is still alive
+
+    def __init__(self, folder, model_name=DEFAULT_MODEL, threads=None):
+        self.folder = os.path.abspath(folder)
+        self.root = os.path.join(self.folder, self.STEMS_DIR)
+        self.model_name = model_name
+        self.threads = threads
+        self._context = multiprocessing.get_context("spawn")  # never fork torch into the web server
+        self._requests = None
+        self._results = None
+        self._process = None
+        self._jobs = {}
+        self._active = {}  # filename -> job id while queued/running
+        self._lock = threading.Lock()
+
+    def available(self):
+        return demucs_available()
+
+    def stop(self):
+        with self._lock:
+            if self._process is not None:
+                self._requests.put(None)
+                self._results.put(None)
+                self._process = None
+
+    def stem_dir(self, filename):
+        # Keyed on the full filename so "X.mp3" and "X.mp4" get separate stems
+        return os.path.join(self.root, os.path.basename(filename))
+
+    def stems(self, filename):
+        """Stem names for the file if current stems are cached, otherwise None."""
+        try:
+            with open(os.path.join(self.stem_dir(filename), "source.json"), "r", encoding="utf-8") as f:
+                recorded = json.load(f)
+            stat = os.stat(os.path.join(self.folder, filename))
+        except (OSError, ValueError):
+            return None
+        if recorded.get("size") != stat.st_size or recorded.get("mtime") != stat.st_mtime:
+            return None
+        return recorded.get("stems", [])
+
+    def submit(self, filename):
+        """Queue separation for a library file and return its job, reusing an in-flight one."""
+        filename = os.path.basename(filename)
+        input_path = os.path.join(self.folder, filename)
+        stat = os.stat(input_path)
+
+        with self._lock:
+            self._reap_worker()
+            existing_id = self._active.get(filename)
+            if existing_id is not None:
+                return dict(self._jobs[existing_id])
+
+            self._ensure_worker()
+            job = {
+                "id": uuid.uuid4().hex,
+                "filename": filename,
+                "status": "queued",
+                "message": "",
+                "created": time.time(),
+                "updated": time.time(),
+            }
+            self._jobs[job["id"]] = job
+            self._active[filename] = job["id"]
+
+        os.makedirs(self.root, exist_ok=True)
+        self._requests.put({
+            "id": job["id"],
+            "input_path": input_path,
+            "output_dir": self.stem_dir(filename),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        })
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _ensure_worker(self):
+        """Start the worker process if it isn't running. Caller holds the lock."""
+        if self._process is not None and self._process.is_alive():
+            return
+        self._requests = self._context.Queue()
+        self._results = self._context.Queue()
+        self._process = self._context.Process(
+            target=_serve,
+            args=(self.model_name, self.threads, self._requests, self._results),
+            name="demucs-worker",
+            daemon=True
+        )
+        self._process.start()
+        threading.Thread(
+            target=self._collect, args=(self._process, self._results), name="demucs-results", daemon=True
+        ).start()
+
+    def _reap_worker(self):
+        """Fail the queued and running jobs of a worker process that died. Caller holds the lock."""
+        if self._process is None or self._process.is_alive():
+            return
+        message = f"Separation worker exited unexpectedly (exit code {self._process.exitcode})"
+        print(message)
+        for job_id in self._active.values():
+            job = self._jobs[job_id]
+            job["status"] = "failed"
+            job["message"] = message
+            job["updated"] = time.time()
+        self._active.clear()
+        self._process = None
+
+    def _collect(self, process, results):
+        while True:
+            try:
+                update = results.get(timeout=self.WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                # Nothing left from the worker; if it died (OOM, crash) its jobs will never finish
+                if not process.is_alive():
+                    with self._lock:
+                        if self._process is process:
+                            self._reap_worker()
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            if update is None:
+                return
+            with self._lock:
+                job = self._jobs.get(update["id"])
+                if job is None or job["status"] in ("finished", "failed"):
+                    continue
+                job["status"] = update["status"]
+                job["message"] = update.get("message", job["message"])
+                job["updated"] = time.time()
+                if job["status"] in ("finished", "failed"):
+                    self._active.pop(job["filename"], None)
+
+
+def run_demucs(filenames, model_name=DEFAULT_MODEL, output_folder="separated", threads=None):
+    """Separate several files with a single model load."""
+    separator = Separator(model_name, threads=threads)
+    for filename in filenames:
+        name = os.path.splitext(os.path.basename(filename))[0]
+        output_dir = os.path.join(output_folder, model_name, name)
+        print(f"Separating {filename}")
+        separator.separate(filename, output_dir)
+        print(f"Stems written to {output_dir}")
 
-def run_demucs():
-    filename = input("Enter the audio filename: ").strip()
-    sys.argv = ["demucs", "--mp3", "--mp3-bitrate", "320", filename]
-    demucs.separate.main()
 
 if __name__ == "__main__":
-    run_demucs()
+    parser = argparse.ArgumentParser(description="Split songs into stems with demucs")
+    parser.add_argument("files", nargs="*", help="Audio or video files (prompted for if omitted)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--out", default="separated", help="Output folder")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads (default: all cores)")
+    args = parser.parse_args()
+
+    files = args.files or [input("Enter the audio filename: ").strip()]
+    run_demucs(files, args.model, args.out, args.threads)
@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+
+
+class ThreadConnections:
+    """One autocommit connection per thread to a SQLite database in WAL mode.
+
+    Connections are opened on first use by each thread and all of them are
+    closed together by close(). Extra pragmas (e.g. "foreign_keys=ON") are
+    set on every new connection.
+    """
+
+    def __init__(self, db_path, pragmas=()):
+        self.db_path = db_path
+        self.pragmas = tuple(pragmas)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for pragma in self.pragmas:
+                conn.execute(f"PRAGMA {pragma}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class Transaction:
+    """Run a block inside BEGIN IMMEDIATE ... COMMIT on an autocommit connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,89 @@
+import clip_ranges
+
+
+def test_close_ranges_ends_each_range_at_the_next_start():
+    ranges = clip_ranges.close_ranges([("b", 30.0), ("a", 0.0), ("c", 75.0)], duration=100.0)
+    assert ranges == [
+        {"name": "a", "start": 0.0, "end": 30.0},
+        {"name": "b", "start": 30.0, "end": 75.0},
+        {"name": "c", "start": 75.0, "end": 100.0},
+    ]
+
+
+def test_close_ranges_drops_the_last_range_without_a_duration():
+    assert clip_ranges.close_ranges([("a", 0.0), ("b", 30.0)]) == [{"name": "a", "start": 0.0, "end": 30.0}]
+
+
+def test_close_ranges_skips_empty_ranges():
+    ranges = clip_ranges.close_ranges([("a", 10.0), ("b", 10.0), ("c", 20.0)], duration=20.0)
+    assert ranges == [{"name": "b", "start": 10.0, "end": 20.0}]
+
+
+def test_from_chapters():
+    info = {"chapters": [
+        {"title": "Intro", "start_time": 0, "end_time": 12.5},
+        {"title": "", "start_time": 12.5, "end_time": 60},
+        {"title": "Broken", "start_time": 60, "end_time": 60},
+    ]}
+    assert clip_ranges.from_chapters(info) == [
+        {"name": "Intro", "start": 0.0, "end": 12.5},
+        {"name": "Chapter 2", "start": 12.5, "end": 60.0},
+    ]
+
+
+def test_from_chapters_without_chapters():
+    assert clip_ranges.from_chapters({"chapters": None}) == []
+
+
+def test_from_description_formats():
+    description = "\n".join([
+        "Thanks for watching!",
+        "0:00 Intro",
+        "12:34 - Mr. Brightside",
+        "Song Title (1:02:03)",
+        "3. 1:10:00 Numbered Song",
+        "[1:20:00] Bracketed",
+    ])
+    assert clip_ranges.from_description(description, duration=5400.0) == [
+        {"name": "Intro", "start": 0.0, "end": 754.0},
+        {"name": "Mr. Brightside", "start": 754.0, "end": 3723.0},
+        {"name": "Song Title", "start": 3723.0, "end": 4200.0},
+        {"name": "Numbered Song", "start": 4200.0, "end": 4800.0},
+        {"name": "Bracketed", "start": 4800.0, "end": 5400.0},
+    ]
+
+
+def test_from_description_names_untitled_tracks():
+    ranges = clip_ranges.from_description("0:00\n0:30 Second", duration=60.0)
+    assert [r["name"] for r in ranges] == ["Track 1", "Second"]
+
+
+def test_from_description_needs_two_timestamps():
+    assert clip_ranges.from_description("Skip to 1:23 for the good part", duration=300.0) == []
+    assert clip_ranges.from_description(None) == []
+
+
+def test_from_cue_sheet_reads_index_01_frames():
+    cue = "\n".join([
+        'PERFORMER "Band"',
+        'FILE "concert.wav" WAVE',
+        "  TRACK 01 AUDIO",
+        '    TITLE "Intro"',
+        "    INDEX 01 00:00:00",
+        "  TRACK 02 AUDIO",
+        '    TITLE "Song"',
+        '    PERFORMER "Guest"',
+        "    INDEX 00 00:10:00",
+        "    INDEX 01 00:10:37",
+        "  TRACK 03 AUDIO",
+        "    INDEX 01 01:02:74",
+    ])
+    ranges = clip_ranges.from_cue_sheet(cue, duration=120.0)
+    assert [r["name"] for r in ranges] == ["Intro", "Guest - Song", "Track 3"]
+    assert ranges[0]["end"] == ranges[1]["start"] == 10 + 37 / 75
+    assert ranges[2]["start"] == 62 + 74 / 75
+    assert ranges[2]["end"] == 120.0
+
+
+def test_from_cue_sheet_without_tracks():
+    assert clip_ranges.from_cue_sheet('TITLE "Album"\nFILE "a.wav" WAVE') == []
@@ -0,0 +1,191 @@
+import os
+import json
+import math
+import queue
+import shutil
+import hashlib
+import threading
+
+
+class ThumbnailCache:
+    """Poster frames and scrubbing sprite sheets for library videos.
+
+    Each file gets a directory under download_path/.thumbs named after a
+    hash of (filename, size, mtime), holding poster.jpg, sprite.jpg and a
+    sprite.vtt index that maps time ranges to tiles of the sprite. Because
+    the name changes whenever the file does, everything in the cache can be
+    served as immutable. Extraction runs on one background worker and only
+    decodes keyframes, so it is cheap next to playback or HLS packaging.
+    """
+
+    THUMBS_DIR = ".thumbs"
+    POSTER_WIDTH = 320
+    TILE_WIDTH = 160
+    TILE_HEIGHT = 90
+    TILE_COLUMNS = 10
+    MAX_TILES = 100
+    MIN_INTERVAL = 2.0  # seconds between sprite frames for short videos
+
+    def __init__(self, downloader, folder):
+        self.downloader = downloader
+        self.folder = os.path.abspath(folder)
+        self.root = os.path.join(self.folder, self.THUMBS_DIR)
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            self._ready = {name for name in os.listdir(self.root) if not name.endswith(".tmp")}
+        threading.Thread(target=self._worker, name="thumbnailer", daemon=True).start()
+        self._queue.put(("prune", None))
+
+    def stop(self):
+        self._queue.put(None)
+
+    def queue_depth(self):
+        """Files queued or being processed."""
+        return len(self._pending)
+
+    def key(self, filename, stat_result=None):
+        """Cache key for the file as it is now, or None if it does not exist."""
+        if stat_result is None:
+            try:
+                stat_result = os.stat(os.path.join(self.folder, filename))
+            except OSError:
+                return None
+        source = f"{os.path.basename(filename)}|{stat_result.st_size}|{stat_result.st_mtime_ns}"
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()[:20]
+
+    def urls(self, filename):
+        """Poster and sprite URLs for a file, or None until they have been extracted."""
+        key = self.key(filename)
+        with self._lock:
+            if key is None or key not in self._ready:
+                return None
+        return {
+            "poster_url": f"/thumbs/{key}/poster.jpg",
+            "sprite_url": f"/thumbs/{key}/sprite.jpg",
+            "sprite_vtt_url": f"/thumbs/{key}/sprite.vtt",
+        }
+
+    def enqueue(self, filename):
+        """Queue a file for extraction unless it is already cached or queued."""
+        filename = os.path.basename(filename)
+        if self.urls(filename) is not None:
+            return False
+        with self._lock:
+            if filename in self._pending:
+                return False
+            self._pending.add(filename)
+        self._queue.put(("extract", filename))
+        return True
+
+    def discard(self, filename, stat_result):
+        """Remove the cache entry of a deleted file, given its stat from before the delete."""
+        key = self.key(filename, stat_result)
+        with self._lock:
+            self._ready.discard(key)
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            action, filename = task
+            try:
+                if action == "prune":
+                    self.prune()
+                else:
+                    self.extract(filename)
+            except Exception as e:
+                print(f"Thumbnail extraction failed for {filename}: {e}")
+            finally:
+                if filename is not None:
+                    with self._lock:
+                        self._pending.discard(filename)
+
+    def extract(self, filename):
+        """Write the poster, sprite sheet and WebVTT index for one library file."""
+        source_path = os.path.join(self.folder, filename)
+        stat_result = os.stat(source_path)
+        key = self.key(filename, stat_result)
+        if self.downloader.probe_streams(source_path)["video"] is None:
+            return None
+
+        duration = self.downloader.probe_duration(source_path)
+        interval = max(self.MIN_INTERVAL, duration / self.MAX_TILES)
+        tiles = max(1, math.ceil(duration / interval))
+        rows = math.ceil(tiles / self.TILE_COLUMNS)
+
+        final_dir = os.path.join(self.root, key)
+        work_dir = f"{final_dir}.tmp"
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+
+        poster_time = min(duration * 0.1, 10.0)
+        tile = (
+            f"scale={self.TILE_WIDTH}:{self.TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+            f"pad={self.TILE_WIDTH}:{self.TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2"
+        )
+        self.downloader._run_ffmpeg([
+            "ffmpeg", "-ss", f"{poster_time:.3f}", "-i", source_path,
+            "-frames:v", "1", "-vf", f"scale={self.POSTER_WIDTH}:-2",
+            "-q:v", "4", "-y", os.path.join(work_dir, "poster.jpg")
+        ], priority="background")
+        # Keyframes only: the sprite is for orientation while scrubbing, not frame accuracy
+        self.downloader._run_ffmpeg([
+            "ffmpeg", "-skip_frame", "nokey", "-i", source_path,
+            "-vf", f"fps=1/{interval:.3f},{tile},tile={self.TILE_COLUMNS}x{rows}",
+            "-frames:v", "1", "-q:v", "5", "-an", "-y", os.path.join(work_dir, "sprite.jpg")
+        ], priority="background")
+        self._write_vtt(os.path.join(work_dir, "sprite.vtt"), duration, interval, tiles)
+
+        with open(os.path.join(work_dir, "source.json"), "w", encoding="utf-8") as f:
+            json.dump({"filename": filename, "size": stat_result.st_size, "mtime": stat_result.st_mtime}, f)
+
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(work_dir, final_dir)
+        with self._lock:
+            self._ready.add(key)
+        print(f"Thumbnails ready: {filename}")
+        return final_dir
+
+    def _write_vtt(self, path, duration, interval, tiles):
+        lines = ["WEBVTT", ""]
+        for i in range(tiles):
+            start = i * interval
+            end = min((i + 1) * interval, duration)
+            x = (i % self.TILE_COLUMNS) * self.TILE_WIDTH
+            y = (i // self.TILE_COLUMNS) * self.TILE_HEIGHT
+            lines.append(f"{self._vtt_time(start)} --> {self._vtt_time(end)}")
+            lines.append(f"sprite.jpg#xywh={x},{y},{self.TILE_WIDTH},{self.TILE_HEIGHT}")
+            lines.append("")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+
+    @staticmethod
+    def _vtt_time(seconds):
+        hours, remainder = divmod(seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+    def prune(self):
+        """Remove cache entries for files that were deleted or have changed since."""
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+            if name.endswith(".tmp"):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            try:
+                with open(os.path.join(entry_dir, "source.json"), "r", encoding="utf-8") as f:
+                    filename = json.load(f)["filename"]
+            except (OSError, ValueError, KeyError):
+                filename = None
+            if filename is None or self.key(filename) != name:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                with self._lock:
+                    self._ready.discard(name)
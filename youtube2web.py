@@ -1,9 +1,24 @@
-from fastapi import BackgroundTasks, FastAPI, Form, Request
+from fastapi import BackgroundTasks, FastAPI, File, Form, Request, UploadFile
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import FileResponse, JSONResponse
-
-from youtube_downloader import YoutubeSegmentDownloader
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
+
+from youtube_downloader import YoutubeSegmentDownloader, parse_links, parse_timestamp, sanitize_filename
+from library_index import LibraryIndex
+from playlist_store import open_playlist_store
+from download_jobs import DownloadJobQueue
+from media_streaming import MediaStreamer, ProcessStreamingResponse
+from hls_packager import HlsPackager
+from audio_library import AUDIO_EXTENSIONS, AudioLibrary, is_audio_file
+from thumbnail_cache import ThumbnailCache
+from mp4_to_gif import GifJobs
+from separator import SeparationService
+from search_index import SearchIndex
+from metadata_cache import video_cache_key
+from play_queue import QueueManager
+from fingerprints import LibraryFingerprints
+import clip_ranges
+import metrics
 import os
 import json
 import random
@@ -11,8 +26,61 @@ import asyncio
 import shutil
 import tempfile
 import re
+import threading
+import time
+from urllib.parse import quote, urlparse
+
+
+class RequestMetricsMiddleware:
+    """Times each HTTP request up to the start of its response, labelled with the matched route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state = {"status": 500, "observed": False}
+
+        def observe():
+            if state["observed"]:
+                return
+            state["observed"] = True
+            route = scope.get("route")
+            metrics.HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=state["status"]
+            )
+
+        async def send_and_observe(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                observe()
+            await send(message)
+
+        with metrics.span(f"{scope['method']} {scope['path']}"):
+            try:
+                await self.app(scope, receive, send_and_observe)
+            finally:
+                observe()
+
+
+class TimedTemplates(Jinja2Templates):
+    """Jinja2Templates that records how long each page takes to render."""
+
+    def TemplateResponse(self, *args, **kwargs):
+        name = kwargs.get("name") or next(arg for arg in args if isinstance(arg, str))
+        with metrics.TEMPLATE_RENDER_SECONDS.time(template=name), metrics.span("render", template=name):
+            return super().TemplateResponse(*args, **kwargs)
+
 
 app = FastAPI()
+app.add_middleware(RequestMetricsMiddleware)
 
 # Initialize downloader
 downloader = YoutubeSegmentDownloader()
@@ -20,6 +88,7 @@ downloader = YoutubeSegmentDownloader()
 # Set paths
 DOWNLOAD_FOLDER = downloader.get_download_path()
 PLAYLIST_FOLDER = "playlists"
+PLAYLIST_STORE = downloader.config.get("playlist_store", "sqlite")  # "sqlite" or "json"
 
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 os.makedirs(PLAYLIST_FOLDER, exist_ok=True)
@@ -27,31 +96,176 @@ os.makedirs(PLAYLIST_FOLDER, exist_ok=True)
 # Make sure the downloader also uses this folder
 downloader.download_path = DOWNLOAD_FOLDER
 
-# Templates folder
-templates = Jinja2Templates(directory="html")
+# In-memory index of DOWNLOAD_FOLDER so requests don't rescan the disk; ffprobe fills in durations mutagen can't read
+library = LibraryIndex(DOWNLOAD_FOLDER, probe_duration=downloader.probe_duration)
+
+# Ranked, paginated search over the library (SQLite FTS5)
+search_index = SearchIndex(downloader.config.get("search_index_path", "search_index.db"), library)
+
+# Source IDs and content hashes for duplicate detection and download reuse
+fingerprints = LibraryFingerprints(
+    downloader.config.get("fingerprint_db_path", "fingerprints.db"),
+    DOWNLOAD_FOLDER,
+    audio_fingerprints=downloader.config.get("audio_fingerprints", False)
+)
+
+# Playlist storage backend; a new SQLite store imports the existing JSON playlists
+playlists_store = open_playlist_store(PLAYLIST_STORE, PLAYLIST_FOLDER)
+
+# Background HLS ladder packaging for new downloads and clips
+HLS_PACKAGING = downloader.config.get("hls_packaging", True)
+hls_packager = HlsPackager(downloader, DOWNLOAD_FOLDER)
+
+# Stream-copied audio renditions for audio-only playback
+AUDIO_EXTRACTION = downloader.config.get("audio_extraction", True)
+audio_library = AudioLibrary(downloader, DOWNLOAD_FOLDER)
+
+# Poster frames and scrubbing sprites, keyed by (name, size, mtime)
+thumbnail_cache = ThumbnailCache(downloader, DOWNLOAD_FOLDER)
+
+# demucs stem separation in a warm worker process, started on first use
+separation = SeparationService(
+    DOWNLOAD_FOLDER,
+    model_name=downloader.config.get("separation_model", "htdemucs"),
+    threads=downloader.config.get("separation_threads")
+)
+
+# GIF conversions go through the shared ffmpeg runner; GIFs are kept out of the media library
+gif_jobs = GifJobs(os.path.join(DOWNLOAD_FOLDER, ".gifs"), downloader.ffmpeg)
+
+
+def on_new_media(path, job=None):
+    """Register a file that was just written into DOWNLOAD_FOLDER (by a download job, if given)."""
+    filename = os.path.basename(path)
+    library.update(filename)
+    info = downloader.metadata_cache.get(video_cache_key(job["link"])) if job else None
+    search_index.record(filename, info)
+    if job:
+        fingerprints.record_source(filename, video_cache_key(job["link"]), job["format"])
+    fingerprints.enqueue(filename)
+    if is_audio_file(filename):
+        return
+    thumbnail_cache.enqueue(filename)
+    if HLS_PACKAGING:
+        hls_packager.enqueue(filename)
+    if AUDIO_EXTRACTION:
+        audio_library.enqueue(filename)
+
+
+def reuse_download(job):
+    """Link an existing copy of the same video and format instead of downloading it again."""
+    existing = fingerprints.find_source(video_cache_key(job["link"]), job["format"])
+    if existing is None:
+        return None
+    print(f"{job['link']} is already in the library as {existing}")
+    return fingerprints.reuse(existing, job["filename"])
+
+
+# Bounded worker pool for /api/download; finished files are added to the library index
+download_queue = DownloadJobQueue(
+    downloader,
+    workers=downloader.config.get("download_workers", 2),
+    on_complete=on_new_media,
+    reuse=reuse_download
+)
+
+# Native media serving; MEDIA_BASE_URL can point back at nginx (e.g. "http://10.0.0.1:8080/video/")
+media_streamer = MediaStreamer(DOWNLOAD_FOLDER, max_streams=downloader.config.get("media_stream_limit", 16))
+MEDIA_BASE_URL = downloader.config.get("media_base_url", "/media/")
+
+# Per-session playback queues for Play All / Shuffle
+play_queues = QueueManager()
+QUEUE_WINDOW = 20
 
-def get_playlists_containing(filename: str):
-    matches = []
+# Templates folder
+templates = TimedTemplates(directory="html")
+
+
+def queue_depths():
+    return {
+        ("downloads",): download_queue.status_counts().get("queued", 0),
+        ("ffmpeg",): downloader.ffmpeg.stats()["queued"],
+        ("hls",): hls_packager.queue_depth(),
+        ("audio",): audio_library.queue_depth(),
+        ("thumbnails",): thumbnail_cache.queue_depth(),
+        ("fingerprints",): fingerprints.queue_depth(),
+    }
+
+
+def disk_bytes():
+    usage = shutil.disk_usage(DOWNLOAD_FOLDER)
+    return {("library",): library.total_size(), ("free",): usage.free, ("total",): usage.total}
+
+
+metrics.REGISTRY.gauge("youtube_burgundy_queue_depth", "Items waiting in each work queue", ("queue",), queue_depths)
+metrics.REGISTRY.gauge(
+    "youtube_burgundy_jobs_running", "Downloads and ffmpeg commands running now", ("pool",),
+    lambda: {("downloads",): download_queue.status_counts().get("running", 0), ("ffmpeg",): downloader.ffmpeg.stats()["running"]}
+)
+metrics.REGISTRY.gauge("youtube_burgundy_library_files", "Files in the download folder", callback=lambda: len(library))
+metrics.REGISTRY.gauge(
+    "youtube_burgundy_disk_bytes", "Bytes used by library files, and free/total on the download folder's disk",
+    ("kind",), disk_bytes
+)
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus metrics: request latency, download phases, ffmpeg speed, queue depths and disk usage."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.REGISTRY.CONTENT_TYPE)
+
+
+@app.on_event("startup")
+def start_library_index():
+    library.start()
+    threading.Thread(target=search_index.sync, name="search-sync", daemon=True).start()
+    threading.Thread(target=downloader.media_info.prune, name="media-info-prune", daemon=True).start()
+    fingerprints.start(library.files())
+    download_queue.start()
+    hls_packager.start()
+    audio_library.start()
+    thumbnail_cache.start()
+    gif_jobs.start()
+
+
+@app.on_event("shutdown")
+def stop_library_index():
+    library.stop()
+    download_queue.stop()
+    hls_packager.stop()
+    audio_library.stop()
+    thumbnail_cache.stop()
+    separation.stop()
+    playlists_store.close()
+    search_index.close()
+    fingerprints.stop()
+    fingerprints.close()
+    downloader.ffmpeg.stop()
+    downloader.media_info.close()
+
+
+def probe_media(path: str):
+    """Cached ffprobe facts for a library file, or None if it can't be read."""
+    try:
+        return downloader.media_info.get(path)
+    except (OSError, RuntimeError) as e:
+        print(f"Could not probe {os.path.basename(path)}: {e}")
+        return None
 
-    for f in os.listdir(PLAYLIST_FOLDER):
-        if not f.endswith(".json"):
-            continue
 
-        path = os.path.join(PLAYLIST_FOLDER, f)
-        try:
-            with open(path, "r") as fd:
-                data = json.load(fd)
+def hls_url(filename: str):
+    """URL of the file's HLS master playlist, or None until it has been packaged."""
+    master = hls_packager.master_url(filename)
+    return f"/hls/{quote(master)}" if master else None
 
-            songs = data.get("songs", [])
-            name = data.get("name", f[:-5])
 
-            if filename in songs:
-                matches.append(name)
+def library_etag():
+    """Weak ETag that changes whenever the library index changes."""
+    return f'W/"library-{library.version}"'
 
-        except Exception as e:
-            print("Playlist read error:", e)
 
-    return matches
+def get_playlists_containing(filename: str):
+    return playlists_store.containing(filename)
 
 
 def sanitize_clip_name(name: str):
@@ -70,7 +284,7 @@ def index_page(request: Request):
 @app.get("/download", response_class=HTMLResponse)
 def download_page(request: Request, message: str = ""):
     """Render download page with optional message."""
-    playlists = [f[:-5] for f in os.listdir(PLAYLIST_FOLDER) if f.endswith(".json")]
+    playlists = playlists_store.names()
     return templates.TemplateResponse("download.html", {
         "request": request,
         "message": message,
@@ -79,18 +293,117 @@ def download_page(request: Request, message: str = ""):
 
 
 @app.post("/api/download")
-async def download_video_api(link: str = Form(...), filename: str = Form(...)):
+async def download_video_api(link: str = Form(...), filename: str = Form(...), kind: str = Form("video")):
+    """Queue a video or audio-only download and return its job ID without waiting for it to finish."""
+    if kind not in ("video", "audio"):
+        return JSONResponse({"success": False, "message": "Download kind must be video or audio."}, status_code=400)
+
     try:
-        # Run blocking download in a separate thread
-        downloaded_file = await asyncio.to_thread(downloader.download_video, link, filename)
+        job = download_queue.submit(link, filename, kind=kind)
+        return JSONResponse({"success": True, "job_id": job["id"], "job": job})
+    except Exception as e:
+        return JSONResponse({"success": False, "message": str(e)})
+
+
+def is_downloaded(name: str):
+    """True if the library already has name as a video or as an audio-only download."""
+    return any(f"{name}{extension}" in library for extension in (".mp4",) + AUDIO_EXTENSIONS)
+
+
+def is_web_url(value: str):
+    return urlparse(value).scheme in ("http", "https")
+
 
-        if downloaded_file:
-            return JSONResponse({"success": True, "filename": os.path.basename(downloaded_file)})
-        else:
-            return JSONResponse({"success": False, "message": "Download failed."})
+@app.post("/api/download_batch")
+async def download_batch_api(
+    source: str = Form(""),
+    links: str = Form(""),
+    links_file: UploadFile = File(None)
+):
+    """Resolve a playlist/channel URL, or a list of links, once and queue a download job per video.
+
+    source is a single URL. links is a pasted links list and links_file an
+    uploaded one, one URL per line optionally followed by " | file name".
+    Videos already in the library are skipped, so re-submitting a playlist
+    only fetches what is new.
+    """
+    text = links
+    if links_file is not None:
+        text += "\n" + (await links_file.read()).decode("utf-8", "replace")
+    requested = parse_links(text)
+    if source.strip():
+        requested.insert(0, (source.strip(), ""))
+
+    if not requested:
+        return JSONResponse({"success": False, "message": "Enter a URL or a list of links"}, status_code=400)
+    invalid = [url for url, _ in requested if not is_web_url(url)]
+    if invalid:
+        return JSONResponse({"success": False, "message": f"Not a web URL: {invalid[0]}"}, status_code=400)
+
+    try:
+        entries = await asyncio.to_thread(downloader.resolve_links, requested)
     except Exception as e:
         return JSONResponse({"success": False, "message": str(e)})
 
+    jobs = []
+    skipped = []
+    for entry in entries:
+        if not entry["filename"] or is_downloaded(entry["filename"]):
+            skipped.append(entry)
+            continue
+        jobs.append(download_queue.submit(entry["url"], entry["filename"]))
+
+    return JSONResponse({
+        "success": True,
+        "message": f"Queued {len(jobs)} downloads, skipped {len(skipped)} already in the library",
+        "jobs": jobs,
+        "skipped": skipped
+    })
+
+
+@app.get("/api/download/jobs")
+def list_download_jobs():
+    return JSONResponse({"success": True, "jobs": download_queue.list()})
+
+
+@app.get("/api/download/jobs/{job_id}")
+def get_download_job(job_id: str):
+    job = download_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"success": False, "message": "Job not found"}, status_code=404)
+    return JSONResponse({"success": True, "job": job})
+
+
+@app.post("/api/download/jobs/{job_id}/cancel")
+def cancel_download_job(job_id: str):
+    if download_queue.get(job_id) is None:
+        return JSONResponse({"success": False, "message": "Job not found"}, status_code=404)
+    if not download_queue.cancel(job_id):
+        return JSONResponse({"success": False, "message": "Job already finished"}, status_code=409)
+    return JSONResponse({"success": True, "message": "Cancelling download"})
+
+
+@app.get("/api/download/jobs/{job_id}/events")
+async def download_job_events(job_id: str):
+    """Stream job updates as server-sent events until the job finishes."""
+    if download_queue.get(job_id) is None:
+        return JSONResponse({"success": False, "message": "Job not found"}, status_code=404)
+
+    async def event_stream():
+        last_update = None
+        while True:
+            job = download_queue.get(job_id)
+            if job is None:
+                return
+            if job["updated"] != last_update:
+                last_update = job["updated"]
+                yield f"data: {json.dumps(job)}\n\n"
+            if job["status"] not in download_queue.ACTIVE_STATES:
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 
 def cleanup_temp_download(temp_dir: str):
     """Remove a temporary download directory after the response is sent."""
@@ -100,11 +413,86 @@ def cleanup_temp_download(temp_dir: str):
         print(f"Temporary download cleanup failed: {e}")
 
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def attachment_headers(filename: str):
+    """Content-Disposition for a download, the way FileResponse writes it."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted}"}
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+async def stream_to_device(link: str, filename: str):
+    """Remux a video straight into the response as fragmented MP4.
+
+    Bytes are read from ffmpeg only as fast as the client takes them, so a
+    slow phone pauses ffmpeg (and its fetch) instead of filling memory or
+    disk. Returns None if the video can't be streamed or ffmpeg fails before
+    producing output, so the caller can fall back to a temp-file download.
+    """
+    try:
+        command = await asyncio.to_thread(downloader.stream_command, link)
+    except Exception as e:
+        print(f"Could not prepare a stream for {link}: {e}")
+        return None
+    if command is None:
+        return None
+
+    process = None
+    stderr = None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stderr = asyncio.ensure_future(process.stderr.read())
+        first_chunk = await process.stdout.read(STREAM_CHUNK_SIZE)
+        if not first_chunk:
+            await process.wait()
+            print(f"Streaming {link} failed: {(await stderr).decode('utf-8', 'replace').strip()}")
+            return None
+
+        async def body():
+            sent = 0
+            try:
+                chunk = first_chunk
+                while chunk:
+                    yield chunk
+                    sent += len(chunk)
+                    chunk = await process.stdout.read(STREAM_CHUNK_SIZE)
+                await process.wait()
+                if process.returncode != 0:
+                    print(f"Streaming {link} stopped early: {(await stderr).decode('utf-8', 'replace').strip()}")
+            finally:
+                # The client went away or the stream ended; don't leave ffmpeg fetching
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                stderr.cancel()
+                metrics.DOWNLOAD_BYTES.inc(sent, kind="stream")
+
+        return ProcessStreamingResponse(
+            body(), process, media_type="video/mp4", headers=attachment_headers(filename)
+        )
+    except BaseException:
+        # Includes the request being cancelled while waiting for the first chunk
+        if process is not None and process.returncode is None:
+            process.kill()
+        if stderr is not None:
+            stderr.cancel()
+        raise
+
+
 @app.post("/api/download_to_device")
 async def download_video_to_device(
     background_tasks: BackgroundTasks,
     link: str = Form(...),
-    filename: str = Form(...)
+    filename: str = Form(...),
+    stream: bool = Form(True)
 ):
     safe_filename = os.path.basename(filename).strip()
     if not safe_filename:
@@ -113,6 +501,12 @@ async def download_video_to_device(
     if not safe_filename.lower().endswith(".mp4"):
         safe_filename = f"{safe_filename}.mp4"
 
+    if stream:
+        response = await stream_to_device(link, safe_filename)
+        if response is not None:
+            return response
+        print(f"Streaming unavailable for {link}, downloading to a temporary file instead")
+
     temp_dir = tempfile.mkdtemp(prefix="youtube_burgundy_", dir=tempfile.gettempdir())
     temp_output_path = os.path.join(temp_dir, safe_filename)
 
@@ -151,68 +545,323 @@ async def delete_file(request: Request):
         return JSONResponse({"success": False, "message": "File does not exist"})
 
     try:
+        stat_result = os.stat(file_path)
         os.remove(file_path)
+        library.discard(filename)
+        fingerprints.discard(filename)
+        audio_library.discard(filename)
+        hls_packager.discard(filename)
+        thumbnail_cache.discard(filename, stat_result)
+        downloader.media_info.discard(file_path)
         return JSONResponse({"success": True, "message": f"{filename} deleted"})
     except Exception as e:
         return JSONResponse({"success": False, "message": str(e)})
 
 
 @app.get("/files", response_class=HTMLResponse)
-def files_page(request: Request, query: str = ""):
-    """Render files page with search + playback functionality."""
-    all_files = os.listdir(DOWNLOAD_FOLDER)
-
-    # Optional search filter
-    if query:
-        all_files = [f for f in all_files if query.lower() in f.lower()]
+def files_page(request: Request, query: str = "", sort: str = None):
+    """Render the first page of results; files.html loads the rest from /api/search as it scrolls."""
+    try:
+        page = search_index.search(query, sort=sort)
+    except ValueError:
+        page = search_index.search(query)
 
     return templates.TemplateResponse("files.html", {
         "request": request,
-        "files": all_files,
+        "files": [result["filename"] for result in page["results"]],
+        "next_cursor": page["next_cursor"],
+        "sort": page["sort"],
         "query": query
     })
 
 
+@app.get("/api/search")
+def search_library(q: str = "", sort: str = None, order: str = None, cursor: str = None, limit: int = 50):
+    """Search filenames, titles, uploaders and tags.
+
+    sort is relevance (default with a query), added (default without),
+    duration, size or name. Pass next_cursor back as cursor for the next page.
+    """
+    try:
+        page = search_index.search(q, sort=sort, order=order, cursor=cursor, limit=limit)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    return JSONResponse({"success": True, **page})
+
+
+@app.get("/api/library/duplicates")
+def library_duplicates():
+    """Groups of duplicate files and the bytes that deleting the extra copies would free."""
+    report = fingerprints.duplicates()
+    return JSONResponse({"success": True, **report})
+
+
+@app.get("/api/library/version")
+def get_library_version():
+    """Return the library snapshot version so clients can skip unchanged re-fetches."""
+    return JSONResponse({"success": True, "version": library.version, "count": len(library)})
+
+
+def queue_prefetch(filename: str):
+    """URLs the player can start loading before filename comes up."""
+    thumbnails = thumbnail_cache.urls(filename)
+    return {
+        "filename": filename,
+        "media_url": f"{MEDIA_BASE_URL}{quote(filename)}",
+        "hls_url": hls_url(filename),
+        "audio_url": audio_library.audio_url(filename),
+        "poster_url": thumbnails["poster_url"] if thumbnails else None,
+    }
+
+
+def queue_response(queue_id: str, queue, limit: int = QUEUE_WINDOW, **extra):
+    """Current track, the next `limit` tracks and a prefetch hint for the next one."""
+    upcoming = queue.window(queue.position + 1, limit)
+    return JSONResponse({
+        "success": True,
+        "queue_id": queue_id,
+        "index": queue.position,
+        "length": len(queue),
+        "shuffle": queue.shuffle,
+        "seed": queue.seed,
+        "current": queue.item(queue.position),
+        "upcoming": upcoming,
+        "prefetch": queue_prefetch(upcoming[0]) if upcoming else None,
+        **extra
+    })
+
+
+def playlist_queue_items(name: str):
+    """A playlist's songs that are still in the library, or None if the playlist doesn't exist."""
+    songs = playlists_store.songs(name)
+    return None if songs is None else [song for song in songs if song in library]
+
+
+def create_queue(items, mode: str = "in_order", start: str = None, seed: int = None):
+    """Create a playback queue, or return an error response for a bad mode or empty list."""
+    if mode not in ("in_order", "shuffle"):
+        return None, JSONResponse({"success": False, "message": "Invalid mode"}, status_code=400)
+    if not items:
+        return None, JSONResponse({"success": False, "message": "Nothing to play"}, status_code=404)
+    queue_id, queue = play_queues.create(items, shuffle=mode == "shuffle", seed=seed, start=start)
+    return queue_id, queue
+
+
 @app.get("/api/media_queue")
-def get_media_queue(mode: str = "in_order"):
-    """Return media filenames in displayed or shuffled order."""
-    files = os.listdir(DOWNLOAD_FOLDER)
+def get_media_queue(request: Request, mode: str = "in_order"):
+    """Return media filenames in displayed or shuffled order.
 
-    if mode == "shuffle":
-        files = files.copy()
+    This only lists the library; playback queues are created with POST /api/queue.
+    """
+    if mode == "in_order":
+        etag = library_etag()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        files = library.files()
+        return JSONResponse(
+            {"success": True, "songs": files, "version": library.version},
+            headers={"ETag": etag}
+        )
+    elif mode == "shuffle":
+        files = library.files()
         random.shuffle(files)
-    elif mode != "in_order":
-        return JSONResponse({"success": False, "message": "Invalid mode"}, status_code=400)
+        return JSONResponse({"success": True, "songs": files, "version": library.version})
+    return JSONResponse({"success": False, "message": "Invalid mode"}, status_code=400)
+
+
+@app.post("/api/queue")
+async def create_play_queue(request: Request):
+    """Create a playback queue from the library or a playlist.
+
+    Body: {"source": "library" | "playlist", "playlist": name, "mode":
+    "in_order" | "shuffle", "start": filename, "seed": int}. A seed makes the
+    shuffle order reproducible.
+    """
+    data = await request.json()
+    source = data.get("source", "library")
+    if source == "playlist":
+        items = playlist_queue_items(data.get("playlist") or "")
+        if items is None:
+            return JSONResponse({"success": False, "message": "Playlist not found"}, status_code=404)
+    elif source == "library":
+        items = library.snapshot()
+    else:
+        return JSONResponse({"success": False, "message": "Source must be library or playlist"}, status_code=400)
+
+    seed = data.get("seed")
+    if seed is not None:
+        try:
+            seed = int(seed)
+        except (TypeError, ValueError):
+            return JSONResponse({"success": False, "message": "Seed must be an integer"}, status_code=400)
+    queue_id, queue = create_queue(items, data.get("mode", "in_order"), data.get("start"), seed)
+    if queue_id is None:
+        return queue
+    return queue_response(queue_id, queue)
+
+
+@app.get("/api/queue/{queue_id}")
+def get_play_queue(queue_id: str, offset: int = None, limit: int = QUEUE_WINDOW):
+    """Queue state; with offset, also the tracks at offset..offset+limit for list views."""
+    queue = play_queues.get(queue_id)
+    if queue is None:
+        return JSONResponse({"success": False, "message": "Queue not found or expired"}, status_code=404)
+    limit = max(1, min(limit, 200))
+    if offset is None:
+        return queue_response(queue_id, queue, limit)
+    return queue_response(queue_id, queue, limit, offset=offset, items=queue.window(offset, limit))
+
+
+@app.post("/api/queue/{queue_id}/{action}")
+async def move_play_queue(request: Request, queue_id: str, action: str):
+    """Move the queue: next, previous, or seek to {"index": n} / {"filename": name}."""
+    queue = play_queues.get(queue_id)
+    if queue is None:
+        return JSONResponse({"success": False, "message": "Queue not found or expired"}, status_code=404)
+
+    if action == "next":
+        position = queue.position + 1
+    elif action == "previous":
+        position = queue.position - 1
+    elif action == "seek":
+        data = await request.json()
+        position = data.get("index")
+        if position is None and data.get("filename"):
+            position = queue.position_of(data["filename"])
+        if position is None:
+            return JSONResponse({"success": False, "message": "Track not in queue"}, status_code=404)
+    else:
+        return JSONResponse({"success": False, "message": "Unknown queue action"}, status_code=404)
 
-    return JSONResponse({"success": True, "songs": files})
+    try:
+        queue.seek(int(position))
+    except IndexError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=409)
+    return queue_response(queue_id, queue)
 
 
 @app.get("/video/{filename}", response_class=HTMLResponse)
 def video_page(request: Request, filename: str):
 
     # All playlist names
-    playlists = [f[:-5] for f in os.listdir(PLAYLIST_FOLDER) if f.endswith(".json")]
+    playlists = playlists_store.names()
 
     # Playlists this file belongs to
     file_playlists = get_playlists_containing(filename)
 
+    media = probe_media(os.path.join(DOWNLOAD_FOLDER, filename))
+
     return templates.TemplateResponse("video_detail.html", {
         "request": request,
         "filename": filename,
+        "media_base_url": MEDIA_BASE_URL,
+        "hls_url": hls_url(filename),
+        "audio_url": audio_library.audio_url(filename),
+        "thumbnails": thumbnail_cache.urls(filename),
+        "duration": media["duration"] if media else None,
         "playlists": playlists,          # For dropdown
         "file_playlists": file_playlists # For Belongs-to list
     })
 
 
+@app.api_route("/media/{filename}", methods=["GET", "HEAD"])
+async def media_file(request: Request, filename: str):
+    """Serve a library file with byte ranges and conditional requests."""
+    if filename not in library:
+        return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
+    return await media_streamer.respond(request, filename)
+
+
+@app.api_route("/audio/{filename}", methods=["GET", "HEAD"])
+async def audio_file(request: Request, filename: str):
+    """Serve a derived audio rendition with byte ranges and conditional requests."""
+    return await media_streamer.respond(request, filename, folder=audio_library.root)
+
+
+@app.post("/api/audio/derive")
+def derive_audio():
+    """Queue audio extraction for every library video that has no current audio rendition."""
+    queued = audio_library.derive_all(library.files())
+    return JSONResponse({"success": True, "message": f"Queued {queued} files for audio extraction", "queued": queued})
+
+
+@app.get("/thumbnail/{filename}")
+def thumbnail(filename: str):
+    """Redirect to a file's cached poster frame, queueing extraction if it has none yet."""
+    if filename not in library or is_audio_file(filename):
+        return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
+
+    urls = thumbnail_cache.urls(filename)
+    if urls is None:
+        thumbnail_cache.enqueue(filename)
+        return JSONResponse({"success": False, "message": "Thumbnail not ready"}, status_code=404)
+    return RedirectResponse(urls["poster_url"], headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/thumbs/{key}/{name}")
+def thumbnail_file(key: str, name: str):
+    """Serve poster, sprite and WebVTT files; their URLs change whenever the source does."""
+    if name not in ("poster.jpg", "sprite.jpg", "sprite.vtt") or not re.fullmatch(r"[0-9a-f]+", key):
+        return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
+
+    file_path = os.path.join(thumbnail_cache.root, key, name)
+    if not os.path.isfile(file_path):
+        return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
+    media_type = "text/vtt" if name.endswith(".vtt") else "image/jpeg"
+    return FileResponse(file_path, media_type=media_type, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+@app.get("/hls/{package}/{path:path}")
+def hls_file(package: str, path: str):
+    """Serve HLS playlists, init segments and media segments from the package cache."""
+    hls_root = os.path.abspath(hls_packager.root)
+    file_path = os.path.abspath(os.path.join(hls_root, package, path))
+    if not file_path.startswith(hls_root + os.sep) or not os.path.isfile(file_path):
+        return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
+
+    if file_path.endswith(".m3u8"):
+        return FileResponse(file_path, media_type="application/vnd.apple.mpegurl", headers={"Cache-Control": "no-cache"})
+    # Segment names are reused if the source changes and the package is rebuilt, so cache for a while only
+    return FileResponse(file_path, media_type="video/mp4", headers={"Cache-Control": "public, max-age=3600"})
+
+
+@app.post("/api/hls/{filename}")
+def request_hls(filename: str):
+    """Queue HLS packaging for an existing library file."""
+    if filename not in library:
+        return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
+    hls_packager.enqueue(filename)
+    return JSONResponse({"success": True, "status": hls_packager.status(filename), "hls_url": hls_url(filename)})
+
+
 @app.get("/api/video_metadata/{filename}")
-def video_metadata(filename: str):
-    file_path = os.path.join(DOWNLOAD_FOLDER, filename)
-    if not os.path.exists(file_path):
+def video_metadata(filename: str, keyframes: bool = False):
+    """Library entry plus cached ffprobe facts; keyframes=true adds the keyframe timestamps."""
+    entry = library.get(filename)
+    if entry is None:
         return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
 
+    path = os.path.join(DOWNLOAD_FOLDER, filename)
+    media = probe_media(path)
+    keyframe_times = None
+    if keyframes and media and media["video"]:
+        try:
+            keyframe_times = [round(pts, 3) for pts, _ in downloader.media_info.keyframes(path)]
+        except (OSError, RuntimeError) as e:
+            print(f"Could not read keyframes of {filename}: {e}")
+
     return JSONResponse({
         "success": True,
         "filename": filename,
+        "size": entry["size"],
+        "mtime": entry["mtime"],
+        "duration": media["duration"] if media and media["duration"] else entry["duration"],
+        "media": media,
+        "keyframes": keyframe_times,
+        "hls_url": hls_url(filename),
+        "audio_url": audio_library.audio_url(filename),
+        "thumbnails": thumbnail_cache.urls(filename),
         "file_playlists": get_playlists_containing(filename),
     })
 
@@ -222,7 +871,8 @@ async def clip_video_api(
     filename: str = Form(...),
     clip_name: str = Form(...),
     start_time: float = Form(...),
-    end_time: float = Form(...)
+    end_time: float = Form(...),
+    mode: str = Form("smart")
 ):
     source_filename = os.path.basename(filename)
     source_path = os.path.abspath(os.path.join(DOWNLOAD_FOLDER, source_filename))
@@ -245,18 +895,26 @@ async def clip_video_api(
     if start_time < 0 or end_time <= start_time:
         return JSONResponse({"success": False, "message": "Choose a valid clip range."}, status_code=400)
 
+    # "keyframe" is accepted as another name for the stream-copy mode
+    mode = "fast" if mode == "keyframe" else mode
+    if mode not in downloader.CLIP_MODES:
+        return JSONResponse({"success": False, "message": "Clip mode must be fast, smart or exact."}, status_code=400)
+
     try:
         output_path = await asyncio.to_thread(
             downloader.clip_existing_video,
             source_path,
             safe_clip_name,
             start_time,
-            end_time
+            end_time,
+            mode
         )
 
         if not output_path or not os.path.exists(output_path):
             return JSONResponse({"success": False, "message": "Clip creation failed."}, status_code=500)
 
+        on_new_media(output_path)
+
         return JSONResponse({
             "success": True,
             "message": f"Clip created: {os.path.basename(output_path)}",
@@ -267,10 +925,228 @@ async def clip_video_api(
         return JSONResponse({"success": False, "message": str(e)}, status_code=500)
 
 
+def source_video_info(filename: str, link: str = None):
+    """yt-dlp info for the video a library file was downloaded from (or for link), or None."""
+    if link:
+        return downloader.extract_info(link)
+    source_id = fingerprints.source_of(filename)
+    if not source_id:
+        return None
+    info = downloader.metadata_cache.get(source_id)
+    if info is None and not source_id.startswith("url-"):
+        info = downloader.extract_info(f"https://www.youtube.com/watch?v={source_id}")
+    return info
+
+
+def clip_ranges_from_request(data: dict, filename: str, duration: float):
+    """The clip ranges a /api/clips request asks for. Raises ValueError with a message for the user."""
+    source = data.get("source", "ranges")
+    if source == "ranges":
+        ranges = data.get("ranges")
+        if not isinstance(ranges, list):
+            raise ValueError("ranges must be a list of {name, start, end}")
+        try:
+            return [
+                {
+                    "name": r.get("name") or f"Clip {i + 1}",
+                    "start": parse_timestamp(r["start"]),
+                    "end": parse_timestamp(r["end"]) if r.get("end") is not None else duration,
+                }
+                for i, r in enumerate(ranges)
+            ]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Each range needs a start time; a missing end means the end of the video.")
+    if source == "cue_sheet":
+        return clip_ranges.from_cue_sheet(data.get("cue_sheet", ""), duration)
+    if source == "description" and data.get("description"):
+        return clip_ranges.from_description(data["description"], duration)
+    if source in ("chapters", "description"):
+        info = source_video_info(filename, data.get("link"))
+        if info is None:
+            raise ValueError("The source video of this file is unknown; pass its link.")
+        if source == "chapters":
+            return clip_ranges.from_chapters(info)
+        return clip_ranges.from_description(info.get("description"), duration)
+    raise ValueError("source must be ranges, chapters, description or cue_sheet")
+
+
+@app.post("/api/clips")
+async def clip_many_api(request: Request):
+    """
+    Cuts many clips out of one library file in as few ffmpeg runs as possible.
+    Expects JSON: { "filename": "concert.mp4", "source": "chapters" | "description" | "cue_sheet" | "ranges",
+                    "ranges": [{"name", "start", "end"}], "cue_sheet": "...", "description": "...", "link": "...",
+                    "mode": "smart", "prefix": "Concert", "playlist": "Concert", "dry_run": false }
+    With dry_run the parsed ranges are returned without cutting anything.
+    """
+    data = await request.json()
+    source_filename = os.path.basename(data.get("filename") or "")
+    source_path = os.path.join(DOWNLOAD_FOLDER, source_filename)
+    if not source_filename or not os.path.isfile(source_path):
+        return JSONResponse({"success": False, "message": "Source video not found."}, status_code=404)
+
+    # "keyframe" is accepted as another name for the stream-copy mode
+    mode = data.get("mode", "smart")
+    mode = "fast" if mode == "keyframe" else mode
+    if mode not in downloader.CLIP_MODES:
+        return JSONResponse({"success": False, "message": "Clip mode must be fast, smart or exact."}, status_code=400)
+
+    try:
+        duration = (await asyncio.to_thread(probe_media, source_path) or {}).get("duration")
+        ranges = await asyncio.to_thread(clip_ranges_from_request, data, source_filename, duration)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=500)
+    if not ranges:
+        return JSONResponse({"success": False, "message": "No clip ranges found."}, status_code=400)
+
+    # Titles are only stripped of unsafe characters; "Mr. Brightside" keeps its dot and "AC/DC" its prefix
+    prefix = sanitize_filename(data.get("prefix") or os.path.splitext(source_filename)[0])
+    clips, taken = [], {source_filename.lower()}
+    for i, clip_range in enumerate(ranges):
+        title = sanitize_filename(str(clip_range["name"]))
+        base_name = name = f"{prefix} - {i + 1:02d} {title}".strip()
+        # clip_many overwrites its outputs, so never reuse a name the library already has
+        copy = 1
+        while f"{name}.mp4".lower() in taken or os.path.exists(os.path.join(DOWNLOAD_FOLDER, f"{name}.mp4")):
+            copy += 1
+            name = f"{base_name} ({copy})"
+        taken.add(f"{name}.mp4".lower())
+        clips.append({**clip_range, "name": name})
+
+    if data.get("dry_run"):
+        return JSONResponse({"success": True, "clips": clips})
+
+    try:
+        results = await asyncio.to_thread(downloader.clip_many, source_path, clips, mode)
+    except Exception as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=500)
+
+    created = [result["filename"] for result in results if result["success"]]
+    for filename in created:
+        on_new_media(os.path.join(DOWNLOAD_FOLDER, filename))
+
+    playlist_name = data.get("playlist")
+    added = playlists_store.add_many(playlist_name, created) if playlist_name and created else 0
+
+    message = f"Created {len(created)} of {len(results)} clips"
+    if playlist_name and created:
+        message += f" and added {added} to {playlist_name}"
+    return JSONResponse({
+        "success": bool(created),
+        "message": message,
+        "clips": results,
+        "playlist": playlist_name,
+        "added": added,
+    })
+
+
+@app.get("/api/ffmpeg/jobs")
+def ffmpeg_jobs():
+    """Recent ffmpeg jobs with their progress and resource use, newest first."""
+    return JSONResponse({"success": True, **downloader.ffmpeg.stats(), "jobs": downloader.ffmpeg.jobs()})
+
+
+@app.get("/api/ffmpeg/jobs/{job_id}")
+def ffmpeg_job(job_id: str):
+    job = downloader.ffmpeg.get(job_id)
+    if job is None:
+        return JSONResponse({"success": False, "message": "Job not found"}, status_code=404)
+    return JSONResponse({"success": True, "job": job})
+
+
+@app.post("/api/ffmpeg/jobs/{job_id}/cancel")
+def cancel_ffmpeg_job(job_id: str):
+    if not downloader.ffmpeg.cancel(job_id):
+        return JSONResponse({"success": False, "message": "Job not found or already finished"}, status_code=404)
+    return JSONResponse({"success": True, "message": "Job cancelled"})
+
+
+@app.post("/api/gif")
+def create_gif(
+    filename: str = Form(...),
+    gif_name: str = Form(""),
+    start_time: float = Form(0.0),
+    end_time: float = Form(None)
+):
+    """Start a GIF conversion of a library video (optionally only start_time-end_time) and return its job."""
+    source_filename = os.path.basename(filename)
+    if source_filename not in library:
+        return JSONResponse({"success": False, "message": "Source video not found."}, status_code=404)
+
+    safe_gif_name = sanitize_clip_name(gif_name or source_filename)
+    if not safe_gif_name:
+        return JSONResponse({"success": False, "message": "GIF name required."}, status_code=400)
+
+    if start_time < 0 or (end_time is not None and end_time <= start_time):
+        return JSONResponse({"success": False, "message": "Choose a valid GIF range."}, status_code=400)
+
+    job = gif_jobs.submit(os.path.join(DOWNLOAD_FOLDER, source_filename), safe_gif_name, start_time, end_time)
+    return JSONResponse({"success": True, "job_id": job["id"], "job": job})
+
+
+@app.get("/api/gif/{job_id}")
+def get_gif_job(job_id: str):
+    job = gif_jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"success": False, "message": "Job not found"}, status_code=404)
+    if job["status"] == "finished":
+        job["url"] = f"/gifs/{job['filename']}"
+    return JSONResponse({"success": True, "job_id": job["id"], "job": job})
+
+
+@app.get("/gifs/{filename}")
+def gif_file(filename: str):
+    file_path = os.path.join(gif_jobs.output_folder, os.path.basename(filename))
+    if not os.path.isfile(file_path):
+        return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
+    return FileResponse(file_path, media_type="image/gif", filename=os.path.basename(filename))
+
+
+def stem_urls(filename: str):
+    stems = separation.stems(filename)
+    if stems is None:
+        return None
+    name = os.path.basename(separation.stem_dir(filename))
+    return {stem: f"/stems/{quote(name)}/{stem}.mp3" for stem in stems}
+
+
+@app.post("/api/separate/{filename}")
+def separate_stems(filename: str):
+    """Split a library file into stems, returning cached stems straight away when they exist."""
+    if filename not in library:
+        return JSONResponse({"success": False, "message": "File not found"}, status_code=404)
+
+    stems = stem_urls(filename)
+    if stems is not None:
+        return JSONResponse({"success": True, "status": "finished", "stems": stems})
+
+    if not separation.available():
+        return JSONResponse({"success": False, "message": "demucs is not installed"}, status_code=503)
+
+    job = separation.submit(filename)
+    return JSONResponse({"success": True, "status": job["status"], "job_id": job["id"], "job": job})
+
+
+@app.get("/api/separate/jobs/{job_id}")
+def get_separation_job(job_id: str):
+    job = separation.get(job_id)
+    if job is None:
+        return JSONResponse({"success": False, "message": "Job not found"}, status_code=404)
+    return JSONResponse({"success": True, "job": job, "stems": stem_urls(job["filename"])})
+
+
+@app.api_route("/stems/{name}/{stem}", methods=["GET", "HEAD"])
+async def stem_file(request: Request, name: str, stem: str):
+    """Serve a separated stem from the stem cache."""
+    return await media_streamer.respond(request, stem, folder=os.path.join(separation.root, os.path.basename(name)))
+
+
 @app.get("/playlists", response_class=HTMLResponse)
 def playlist_viewer(request: Request):
     """Render playlist viewer page with list of playlists."""
-    playlists = [f[:-5] for f in os.listdir(PLAYLIST_FOLDER) if f.endswith(".json")]
+    playlists = playlists_store.names()
     return templates.TemplateResponse("playlist_viewer.html", {
         "request": request,
         "playlists": playlists
@@ -279,21 +1155,14 @@ def playlist_viewer(request: Request):
 
 @app.get("/playlist/files")
 def get_playlist_files(name: str):
-    playlist_path = os.path.join(PLAYLIST_FOLDER, f"{name}.json")
-    if not os.path.exists(playlist_path):
+    songs = playlists_store.songs(name)
+    if songs is None:
         return JSONResponse({"songs": []})
 
-    # Load playlist JSON
-    with open(playlist_path, "r", encoding="utf-8") as f:
-        playlist_data = json.load(f)
-
-    # Get all files in download folder
-    all_files = os.listdir(DOWNLOAD_FOLDER)
-
     # Filter: only include files that exist in download folder
-    filtered_files = [f for f in all_files if f in playlist_data.get("songs", [])]
+    filtered_files = [f for f in songs if f in library]
 
-    return JSONResponse({"songs": filtered_files})
+    return JSONResponse({"songs": filtered_files, "version": library.version})
 
 
 @app.post("/playlist/add")
@@ -305,25 +1174,28 @@ async def add_to_playlist(request: Request):
     if not playlist_name or not file_name:
         return JSONResponse({"success": False, "message": "Missing playlist or file"}, status_code=400)
 
-    playlist_path = os.path.join(PLAYLIST_FOLDER, f"{playlist_name}.json")
+    # Creates the playlist if needed; False means the file was already in it
+    if not playlists_store.add(playlist_name, file_name):
+        return JSONResponse({"success": False, "message": "File already in playlist"})
 
-    # Load or create playlist
-    if os.path.exists(playlist_path):
-        with open(playlist_path, "r", encoding="utf-8") as f:
-            playlist_data = json.load(f)
-    else:
-        playlist_data = {"name": playlist_name, "songs": []}
+    return JSONResponse({"success": True, "message": f"Added {file_name} to {playlist_name}"})
 
-    # Check if file is already in playlist
-    if file_name in playlist_data["songs"]:
-        return JSONResponse({"success": False, "message": "File already in playlist"})
 
-    # Add file and save
-    playlist_data["songs"].append(file_name)
-    with open(playlist_path, "w", encoding="utf-8") as f:
-        json.dump(playlist_data, f, indent=4)
+@app.post("/playlist/add_many")
+async def add_many_to_playlist(request: Request):
+    """
+    Adds several files to a playlist in one transaction.
+    Expects JSON: { "playlist": "playlist_name", "files": ["a.mp4", ...] }
+    """
+    data = await request.json()
+    playlist_name = data.get("playlist")
+    file_names = data.get("files")
 
-    return JSONResponse({"success": True, "message": f"Added {file_name} to {playlist_name}"})
+    if not playlist_name or not isinstance(file_names, list):
+        return JSONResponse({"success": False, "message": "Missing playlist or files"}, status_code=400)
+
+    added = playlists_store.add_many(playlist_name, file_names)
+    return JSONResponse({"success": True, "added": added, "message": f"Added {added} files to {playlist_name}"})
 
 
 @app.post("/playlist/remove")
@@ -335,23 +1207,33 @@ async def remove_from_playlist(request: Request):
     if not playlist_name or not file_name:
         return JSONResponse({"success": False, "message": "Missing playlist or file"}, status_code=400)
 
-    playlist_path = os.path.join(PLAYLIST_FOLDER, f"{playlist_name}.json")
-
-    if not os.path.exists(playlist_path):
+    if not playlists_store.exists(playlist_name):
         return JSONResponse({"success": False, "message": "Playlist not found"}, status_code=404)
 
-    with open(playlist_path, "r", encoding="utf-8") as f:
-        playlist_data = json.load(f)
-
-    if file_name not in playlist_data.get("songs", []):
+    if not playlists_store.remove(playlist_name, file_name):
         return JSONResponse({"success": False, "message": "File not in playlist"}, status_code=404)
 
-    playlist_data["songs"].remove(file_name)
+    return JSONResponse({"success": True, "message": f"Removed {file_name} from {playlist_name}"})
 
-    with open(playlist_path, "w", encoding="utf-8") as f:
-        json.dump(playlist_data, f, indent=4)
 
-    return JSONResponse({"success": True, "message": f"Removed {file_name} from {playlist_name}"})
+@app.post("/playlist/remove_many")
+async def remove_many_from_playlist(request: Request):
+    """
+    Removes several files from a playlist in one transaction.
+    Expects JSON: { "playlist": "playlist_name", "files": ["a.mp4", ...] }
+    """
+    data = await request.json()
+    playlist_name = data.get("playlist")
+    file_names = data.get("files")
+
+    if not playlist_name or not isinstance(file_names, list):
+        return JSONResponse({"success": False, "message": "Missing playlist or files"}, status_code=400)
+
+    if not playlists_store.exists(playlist_name):
+        return JSONResponse({"success": False, "message": "Playlist not found"}, status_code=404)
+
+    removed = playlists_store.remove_many(playlist_name, file_names)
+    return JSONResponse({"success": True, "removed": removed, "message": f"Removed {removed} files from {playlist_name}"})
 
 
 @app.post("/playlist/create")
@@ -362,22 +1244,16 @@ async def create_playlist(request: Request):
     if not playlist_name:
         return JSONResponse({"success": False, "message": "Playlist name required"}, status_code=400)
 
-    playlist_path = os.path.join(PLAYLIST_FOLDER, f"{playlist_name}.json")
-    if os.path.exists(playlist_path):
+    if not playlists_store.create(playlist_name):
         return JSONResponse({"success": False, "message": "Playlist already exists"}, status_code=400)
 
-    # Create empty playlist
-    playlist_data = {"name": playlist_name, "songs": []}
-    with open(playlist_path, "w", encoding="utf-8") as f:
-        json.dump(playlist_data, f, indent=4)
-
     return JSONResponse({"success": True, "message": f"Playlist {playlist_name} created"})
 
 
 @app.post("/playlist/delete")
 async def delete_playlist(request: Request):
     """
-    Deletes a playlist JSON file.
+    Deletes a playlist.
     Expects JSON: { "name": "playlist_name" }
     """
     data = await request.json()
@@ -386,12 +1262,9 @@ async def delete_playlist(request: Request):
     if not playlist_name:
         return JSONResponse({"success": False, "message": "No playlist name provided"}, status_code=400)
 
-    playlist_path = os.path.join(PLAYLIST_FOLDER, f"{playlist_name}.json")
-    if not os.path.exists(playlist_path):
-        return JSONResponse({"success": False, "message": f"Playlist '{playlist_name}' does not exist"}, status_code=404)
-
     try:
-        os.remove(playlist_path)
+        if not playlists_store.delete(playlist_name):
+            return JSONResponse({"success": False, "message": f"Playlist '{playlist_name}' does not exist"}, status_code=404)
         return JSONResponse({"success": True, "message": f"Playlist '{playlist_name}' deleted"})
     except Exception as e:
         return JSONResponse({"success": False, "message": f"Error deleting playlist: {e}"}, status_code=500)
@@ -406,45 +1279,29 @@ def playlist_details(request: Request, name: str):
     })
 
 
-@app.post("/playlist/play_all")
-async def play_all(request: Request):
+async def start_playlist_queue(request: Request, mode: str):
     data = await request.json()
     playlist_name = data.get("playlist")
     if not playlist_name:
         return JSONResponse({"success": False, "message": "Playlist name required"}, status_code=400)
-    
-    playlist_path = os.path.join(PLAYLIST_FOLDER, f"{playlist_name}.json")
-    if not os.path.exists(playlist_path):
+
+    songs = playlist_queue_items(playlist_name)
+    if songs is None:
         return JSONResponse({"success": False, "message": "Playlist not found"}, status_code=404)
-    
-    with open(playlist_path, "r", encoding="utf-8") as f:
-        songs = json.load(f).get("songs", [])
-    
 
-    for song in songs:
-        print("Play:", song)
-    
-    return {"success": True}
+    queue_id, queue = create_queue(songs, mode, data.get("start"))
+    if queue_id is None:
+        return queue
+    return queue_response(queue_id, queue)
+
+
+@app.post("/playlist/play_all")
+async def play_all(request: Request):
+    """Start an in-order queue over a playlist."""
+    return await start_playlist_queue(request, "in_order")
 
 
 @app.post("/playlist/shuffle")
 async def shuffle_playlist(request: Request):
-    data = await request.json()
-    playlist_name = data.get("playlist")
-    if not playlist_name:
-        return JSONResponse({"success": False, "message": "Playlist name required"}, status_code=400)
-    
-    playlist_path = os.path.join(PLAYLIST_FOLDER, f"{playlist_name}.json")
-    if not os.path.exists(playlist_path):
-        return JSONResponse({"success": False, "message": "Playlist not found"}, status_code=404)
-    
-    with open(playlist_path, "r", encoding="utf-8") as f:
-        songs = json.load(f).get("songs", [])
-    
-    random.shuffle(songs)
-    
-
-    for song in songs:
-        print("Play (shuffled):", song)
-    
-    return {"success": True}
+    """Start a shuffled queue over a playlist."""
+    return await start_playlist_queue(request, "shuffle")
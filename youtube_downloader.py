@@ -1,17 +1,139 @@
 import yt_dlp
 import os
-import subprocess
+import re
+import sys
 import json
+import shutil
+import argparse
+import tempfile
+import threading
+import time
+import csv
+import bisect
+import hashlib
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from metadata_cache import MetadataCache, video_cache_key
+from media_info import MediaInfo
+from ffmpeg_runner import FFmpegRunner
+import metrics
+
+
+def sanitize_filename(name):
+    """Return a filesystem-safe file name (without extension) for a video title."""
+    return re.sub(r'[<>:"/\\|?*\x00-\x1f]', "", name).strip().rstrip(".")
+
+
+def parse_timestamp(value):
+    """Convert seconds (number or string) or "[HH:]MM:SS[.fff]" to float seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    seconds = 0.0
+    for part in str(value).strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_links(text):
+    """Parse a links list: one URL per line, optionally followed by " | file name".
+
+    Blank lines and lines starting with # are ignored. Returns (url, name) pairs.
+    """
+    links = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        url, _, name = line.partition("|")
+        links.append((url.strip(), name.strip()))
+    return links
+
+
+def _near(sorted_values, value, tolerance):
+    """Whether a sorted list has an entry within tolerance of value."""
+    i = bisect.bisect_left(sorted_values, value - tolerance)
+    return i < len(sorted_values) and sorted_values[i] <= value + tolerance
+
+
+class _DownloadPhases:
+    """Splits one yt-dlp call into extract, download and postprocess time using its hooks.
+
+    The call starts out extracting; the first download progress moves it to
+    download, a finished file or a starting postprocessor moves it to
+    postprocess, and a further file starting to download moves it back.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.phase = "extract"
+        self.mark = time.perf_counter()
+        self.spent = {}
+
+    def _switch(self, phase):
+        now = time.perf_counter()
+        self.spent[self.phase] = self.spent.get(self.phase, 0.0) + now - self.mark
+        self.phase = phase
+        self.mark = now
+
+    def progress_hook(self, status):
+        state = status.get("status")
+        if state == "downloading" and self.phase != "download":
+            self._switch("download")
+        elif state == "finished":
+            metrics.DOWNLOAD_BYTES.inc(status.get("total_bytes") or status.get("downloaded_bytes") or 0, kind=self.kind)
+            self._switch("postprocess")
+
+    def postprocessor_hook(self, status):
+        if status.get("status") == "started" and self.phase != "postprocess":
+            self._switch("postprocess")
+
+    def finish(self, ok, span=None):
+        """Record the time of every phase; on failure the phase that was running is marked as the error."""
+        failed_phase = None if ok else self.phase
+        self._switch(None)
+        for phase, seconds in self.spent.items():
+            metrics.DOWNLOAD_PHASE_SECONDS.observe(seconds, kind=self.kind, phase=phase)
+            metrics.DOWNLOAD_PHASES.inc(kind=self.kind, phase=phase, outcome="error" if phase == failed_phase else "ok")
+            if span is not None:
+                span.set_attribute(f"{phase}_seconds", round(seconds, 3))
+
 
 class YoutubeSegmentDownloader:
     SEGMENT_DURATION = 30 * 60  # 30 minutes in seconds
+    VIDEO_FORMAT = '18'  # format 18 = 360p H.264 + AAC MP4 (guaranteed iOS-friendly)
+    AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio[acodec=opus]/bestaudio'  # AAC or Opus, so it can be remuxed without re-encoding
+    CONCURRENT_FRAGMENTS = 4  # fragments yt-dlp fetches in parallel for DASH/HLS formats
+    BATCH_WORKERS = 4  # videos downloaded at once by download_batch
+    PER_HOST_LIMIT = 2  # concurrent batch downloads allowed against one host
+    INFO_REUSE_TTL = 60 * 60  # cached info dicts younger than this are reused for downloads (format URLs expire)
+    CLIP_MODES = ("exact", "smart", "fast")
+    SMART_CLIP_MIN_COPY = 2.0  # seconds of stream-copyable video needed before smart clipping is worth it
+    CLIP_BATCH_SIZE = 4  # outputs written by one ffmpeg process in clip_many (each re-encoded one has its own encoder)
+    CLIP_BATCH_GAP = 30.0  # seconds between re-encoded clips past which seeking beats decoding through the gap
+    KEYFRAME_SNAP = 0.05  # seconds a clip start may be from a keyframe and still be stream-copied
+    PART_DIR = ".part"  # staging folder inside the download folder; files only leave it once verified
+    PART_MAX_AGE = 24 * 60 * 60  # staged downloads no job is resuming are kept this long for a retry
+    DURATION_TOLERANCE = 2.0  # seconds a download may differ from the reported duration (or 2%, if more)
+    STREAM_PROTOCOLS = ("http", "https", "m3u8", "m3u8_native")  # sources ffmpeg can read directly
+    STREAM_CODECS = ("avc1", "h264", "mp4a", "aac")  # codecs that go into a fragmented MP4 as they are
 
     def __init__(self, config_path="config.json"):
         """Initialize the downloader."""
         if os.path.exists(config_path):
             with open(config_path, "r") as f:
                 config = json.load(f)
+            self.config = config
             self.download_path = config.get("download_path", "./downloads")
+            self.segment_duration = config.get("segment_duration", self.SEGMENT_DURATION)
+            self.metadata_cache = MetadataCache(
+                config.get("metadata_cache_path", "metadata_cache"),
+                ttl=config.get("metadata_cache_ttl", 7 * 24 * 60 * 60),
+                max_entries=config.get("metadata_cache_size", 500)
+            )
+            self.media_info = MediaInfo(config.get("media_info_path", "media_info.db"))
+            self.ffmpeg = FFmpegRunner(slots=config.get("ffmpeg_slots"), timeout=config.get("ffmpeg_timeout"))
             print(f"Download path selected: {self.download_path}")
         else:
             raise RuntimeError("Error: config.json not found. Re-run the setup.py script and ensure you enter a valid path which has read/write/execute permissions.")
@@ -19,47 +141,421 @@ class YoutubeSegmentDownloader:
     def get_download_path(self):
         return self.download_path
 
+    def extract_info(self, video_url, max_age=None):
+        """Return the yt-dlp info dict for a video, from the metadata cache when possible.
+
+        max_age limits how old a cached entry may be (default: the cache TTL);
+        pass 0 to always extract again.
+        """
+        key = video_cache_key(video_url)
+        if max_age != 0:
+            info = self.metadata_cache.get(key, max_age=max_age)
+            if info is not None:
+                return info
+
+        phases = _DownloadPhases("info")
+        with metrics.span("ytdlp.extract", url=video_url) as span:
+            try:
+                with yt_dlp.YoutubeDL({'quiet': True, 'noplaylist': True}) as ydl:
+                    info = ydl.sanitize_info(ydl.extract_info(video_url, download=False), remove_private_keys=True)
+            except Exception:
+                phases.finish(False, span)
+                raise
+            phases.finish(True, span)
+        self.metadata_cache.put(key, info)
+        return info
+
     def get_video_duration(self, video_url):
         """Retrieve the video duration in seconds."""
-        with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-            result = ydl.extract_info(video_url, download=False)
-            return result['duration']  # Returns duration in seconds
+        return self.extract_info(video_url)['duration']  # Returns duration in seconds
+
+    def download_video_to_path(self, video_url, output_path, progress_hook=None, format=None, info=None):
+        """Download a mobile-friendly MP4 to an explicit output path.
 
-    def download_video_to_path(self, video_url, output_path):
-        """Download a mobile-friendly MP4 to an explicit output path."""
+        progress_hook is passed to yt-dlp and called with its progress dicts.
+        info is an info dict from extract_info; without one, a recently cached
+        entry is reused, otherwise the extraction done by the download is
+        cached for later requests.
+
+        The file is downloaded into a staging folder (see staging_dir) and
+        only moved to output_path once it has been verified, so output_path
+        never holds a partial file. A failed download leaves its staged parts
+        behind and the next attempt resumes from them.
+        """
         output_dir = os.path.dirname(output_path)
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
+        format = format or self.VIDEO_FORMAT
+        name = os.path.splitext(os.path.basename(output_path))[0]
+        stage_dir = self.staging_dir(video_url, name, format, folder=output_dir or ".")
+        staged_path = os.path.join(stage_dir, os.path.basename(output_path))
+        os.makedirs(stage_dir, exist_ok=True)
+
+        phases = _DownloadPhases("video")
         ydl_opts = {
-            'format': '18',  # format 18 = 360p H.264 + AAC MP4 (guaranteed iOS-friendly)
-            'outtmpl': output_path,
+            'format': format,
+            'outtmpl': staged_path,
             'noplaylist': True,
             'quiet': False,
-            'merge_output_format': 'mp4'
+            'merge_output_format': 'mp4',
+            'continuedl': True,
+            'concurrent_fragment_downloads': self.CONCURRENT_FRAGMENTS,
+            'progress_hooks': [phases.progress_hook],
+            'postprocessor_hooks': [phases.postprocessor_hook],
         }
+        if progress_hook is not None:
+            ydl_opts['progress_hooks'].append(progress_hook)
 
-        try:
-            print(f"Downloading test video to: {output_path}")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
-            print("Download complete!")
-            return output_path
-        except Exception as e:
-            print(f"Download failed: {e}")
-            return None
+        key = video_cache_key(video_url)
+        if info is None:
+            info = self.metadata_cache.get(key, max_age=self.INFO_REUSE_TTL)
 
-    def download_video(self, video_url, segment_filename):
+        with metrics.span("ytdlp.download", kind="video", url=video_url) as span:
+            try:
+                print(f"Downloading test video to: {output_path}")
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    if info is not None:
+                        try:
+                            # Skip extraction and go straight to format selection + download
+                            ydl.process_ie_result(dict(info), download=True)
+                        except yt_dlp.utils.DownloadError as e:
+                            print(f"Cached metadata could not be reused, extracting again: {e}")
+                            info = None
+
+                    if info is None:
+                        info = ydl.sanitize_info(ydl.extract_info(video_url, download=True), remove_private_keys=True)
+                        self.metadata_cache.put(key, info)
+
+                self.verify_download(staged_path, info.get("duration"), require_video=True)
+                self._publish(staged_path, output_path)
+                shutil.rmtree(stage_dir, ignore_errors=True)
+                phases.finish(True, span)
+                print("Download complete!")
+                return output_path
+            except yt_dlp.utils.DownloadCancelled as e:
+                phases.finish(False, span)
+                shutil.rmtree(stage_dir, ignore_errors=True)
+                print(f"Download cancelled: {e}")
+                return None
+            except Exception as e:
+                phases.finish(False, span)
+                print(f"Download failed: {e}")
+                return None
+
+    def download_video(self, video_url, segment_filename, progress_hook=None, format=None, info=None):
         """Download a mobile-friendly test video: H.264 + AAC in MP4."""
         # Ensure download path exists
         if not os.path.exists(self.download_path):
             os.makedirs(self.download_path)
 
         video_filepath = os.path.join(self.download_path, f"{segment_filename}.mp4")
-        return self.download_video_to_path(video_url, video_filepath)
+        return self.download_video_to_path(video_url, video_filepath, progress_hook=progress_hook, format=format, info=info)
+
+    def stream_command(self, video_url, format=None):
+        """ffmpeg command that remuxes a video to fragmented MP4 on stdout, or None if it can't be streamed.
+
+        The format is selected as for download_video_to_path and ffmpeg reads
+        the media URLs yt-dlp resolved directly, copying the streams into an
+        MP4 whose index comes first, so output can be sent while it is being
+        fetched. Formats that aren't plain HTTP or HLS, or whose codecs don't
+        fit in MP4 without re-encoding, return None and need a normal download.
+        """
+        format = format or self.VIDEO_FORMAT
+        key = video_cache_key(video_url)
+        info = self.metadata_cache.get(key, max_age=self.INFO_REUSE_TTL)
+        with yt_dlp.YoutubeDL({'format': format, 'quiet': True, 'noplaylist': True}) as ydl:
+            if info is not None:
+                info = ydl.process_ie_result(dict(info), download=False)
+            else:
+                info = ydl.extract_info(video_url, download=False)
+                self.metadata_cache.put(key, ydl.sanitize_info(info, remove_private_keys=True))
+
+        formats = info.get("requested_formats") or [info]
+        command = ["ffmpeg", "-v", "error"]
+        maps = []
+        for i, fmt in enumerate(formats):
+            if not fmt.get("url") or fmt.get("protocol") not in self.STREAM_PROTOCOLS:
+                return None
+            codecs = [c for c in (fmt.get("vcodec"), fmt.get("acodec")) if c and c != "none"]
+            if not all(c.startswith(self.STREAM_CODECS) for c in codecs):
+                return None
+            headers = "".join(f"{name}: {value}\r\n" for name, value in (fmt.get("http_headers") or {}).items())
+            if headers:
+                command += ["-headers", headers]
+            command += ["-i", fmt["url"]]
+            if len(formats) > 1:
+                maps += ["-map", f"{i}:v:0" if fmt.get("vcodec") not in (None, "none") else f"{i}:a:0"]
+
+        return command + maps + [
+            "-c", "copy",
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+            "-f", "mp4",
+            "pipe:1"
+        ]
+
+    def download_audio(self, video_url, filename, progress_hook=None, format=None):
+        """Download only the audio track into download_path as {filename}.m4a (or .opus).
+
+        yt-dlp's audio extraction with preferredcodec "best" remuxes the
+        downloaded stream into a matching container instead of re-encoding it.
+        Like videos, the file is staged and verified before it is moved into
+        download_path.
+
+        Returns:
+            str: Path of the audio file, or None on failure
+        """
+        os.makedirs(self.download_path, exist_ok=True)
+
+        format = format or self.AUDIO_FORMAT
+        stage_dir = self.staging_dir(video_url, filename, format)
+        os.makedirs(stage_dir, exist_ok=True)
+
+        phases = _DownloadPhases("audio")
+        ydl_opts = {
+            'format': format,
+            'outtmpl': os.path.join(stage_dir, f"{filename}.%(ext)s"),
+            'noplaylist': True,
+            'quiet': False,
+            'continuedl': True,
+            'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'best'}],
+            'progress_hooks': [phases.progress_hook],
+            'postprocessor_hooks': [phases.postprocessor_hook],
+        }
+        if progress_hook is not None:
+            ydl_opts['progress_hooks'].append(progress_hook)
+
+        with metrics.span("ytdlp.download", kind="audio", url=video_url) as span:
+            try:
+                print(f"Downloading audio for: {filename}")
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    result = ydl.extract_info(video_url, download=True)
+                    self.metadata_cache.put(video_cache_key(video_url), ydl.sanitize_info(result, remove_private_keys=True))
+                staged_path = result['requested_downloads'][0]['filepath']
+                self.verify_download(staged_path, result.get("duration"), require_audio=True)
+                output_path = os.path.join(self.download_path, os.path.basename(staged_path))
+                self._publish(staged_path, output_path)
+                shutil.rmtree(stage_dir, ignore_errors=True)
+                phases.finish(True, span)
+                print(f"Audio download complete: {output_path}")
+                return output_path
+            except yt_dlp.utils.DownloadCancelled as e:
+                phases.finish(False, span)
+                shutil.rmtree(stage_dir, ignore_errors=True)
+                print(f"Audio download cancelled: {e}")
+                return None
+            except Exception as e:
+                phases.finish(False, span)
+                print(f"Audio download failed: {e}")
+                return None
+
+    def staging_dir(self, video_url, name, format, folder=None):
+        """Folder a download of video_url as name stages into, under folder (default download_path).
+
+        The path only depends on the video, output name and format, so a
+        retried or restarted download lands in the same place and yt-dlp
+        continues its .part file instead of starting over.
+        """
+        digest = hashlib.sha1(f"{format}|{name}".encode("utf-8")).hexdigest()[:12]
+        return os.path.join(folder or self.download_path, self.PART_DIR, f"{video_cache_key(video_url)}-{digest}")
+
+    def verify_download(self, path, expected_duration=None, require_video=False, require_audio=False):
+        """Check a finished download with ffprobe before it is published. Raises RuntimeError if it is unusable.
+
+        A file that can't be probed, lacks a required stream or is clearly
+        shorter or longer than the duration yt-dlp reported is deleted, so
+        the next attempt downloads it again instead of resuming a bad file.
+        """
+        try:
+            if os.path.getsize(path) == 0:
+                raise RuntimeError("downloaded file is empty")
+            media = self.media_info.get(path)
+            if require_video and media["video"] is None:
+                raise RuntimeError("downloaded file has no video stream")
+            if require_audio and media["audio"] is None:
+                raise RuntimeError("downloaded file has no audio stream")
+            if expected_duration and media["duration"] is not None:
+                tolerance = max(self.DURATION_TOLERANCE, expected_duration * 0.02)
+                if abs(media["duration"] - expected_duration) > tolerance:
+                    raise RuntimeError(
+                        f"downloaded file is {media['duration']:.1f}s long, expected {expected_duration:.1f}s"
+                    )
+        except (OSError, RuntimeError) as e:
+            self.media_info.discard(path)
+            if os.path.exists(path):
+                os.remove(path)
+            raise RuntimeError(f"Verification of {os.path.basename(path)} failed: {e}")
+
+    def _publish(self, staged_path, output_path):
+        """Move a verified download into place in one rename (the staging folder is on the same filesystem)."""
+        os.replace(staged_path, output_path)
+        self.media_info.rename(staged_path, output_path)
+
+    def recover_downloads(self, resuming=()):
+        """Clean up after downloads interrupted by a crash or restart. Returns how many entries were removed.
+
+        Only the .part staging area is touched. Staging folders in resuming
+        (queued jobs that will run again) and recent ones are kept so their
+        downloads continue where they stopped; older ones are deleted.
+        """
+        keep = {os.path.abspath(path) for path in resuming}
+        part_root = os.path.join(self.download_path, self.PART_DIR)
+        removed = 0
+        now = time.time()
+
+        if os.path.isdir(part_root):
+            for entry in os.scandir(part_root):
+                if os.path.abspath(entry.path) in keep:
+                    continue
+                try:
+                    if now - entry.stat().st_mtime < self.PART_MAX_AGE:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.remove(entry.path)
+                    removed += 1
+                except OSError as e:
+                    print(f"Could not remove staged download {entry.path}: {e}")
+
+        return removed
+
+    def resolve_batch(self, source):
+        """Resolve a playlist/channel URL or a text file of links (see parse_links) into batch entries.
+
+        Reading a links file is meant for the command line; web requests pass
+        their links to resolve_links instead.
+
+        Returns:
+            list[dict]: {"url", "filename"} for each video
+        """
+        if os.path.isfile(source):
+            with open(source, "r", encoding="utf-8") as f:
+                return self.resolve_links(parse_links(f.read()))
+        return self.resolve_links([(source, "")])
+
+    def resolve_links(self, links):
+        """Resolve (url, name) pairs into batch entries.
+
+        Playlists and channels are listed with one flat extraction, so the
+        individual videos aren't fetched until they are downloaded. A link
+        with a name is taken as a single video saved under that name.
+        """
+        entries = []
+        with yt_dlp.YoutubeDL({'quiet': True, 'extract_flat': 'in_playlist'}) as ydl:
+            for url, name in links:
+                if name:
+                    entries.append({"url": url, "filename": sanitize_filename(name)})
+                    continue
+
+                try:
+                    info = ydl.extract_info(url, download=False)
+                except Exception as e:
+                    print(f"Could not resolve {url}: {e}")
+                    continue
+
+                for item in info.get("entries") or [info]:
+                    if not item:
+                        continue
+                    if item.get("_type") == "playlist":
+                        # Channel tabs come back as nested playlists
+                        entries.extend(self.resolve_links([(item.get("webpage_url") or item["url"], "")]))
+                        continue
+                    item_url = item.get("webpage_url") or item.get("url") or f"https://www.youtube.com/watch?v={item['id']}"
+                    entries.append({"url": item_url, "filename": sanitize_filename(item.get("title") or item["id"])})
+
+        return entries
+
+    def download_batch(self, source, max_workers=None, per_host_limit=None):
+        """Download every video of a playlist/channel URL or links file in parallel.
+
+        Videos whose file already exists in download_path are skipped, so an
+        interrupted batch can simply be run again.
+
+        Returns:
+            list[dict]: {"url", "filename", "status"} per video, status being
+            "downloaded", "skipped" or "failed"
+        """
+        max_workers = max_workers or self.BATCH_WORKERS
+        per_host_limit = per_host_limit or self.PER_HOST_LIMIT
+        entries = self.resolve_batch(source)
+        print(f"Batch resolved to {len(entries)} videos")
+
+        host_slots = {}
+        host_slots_lock = threading.Lock()
+
+        def host_slot(url):
+            host = urlparse(url).netloc.lower()
+            with host_slots_lock:
+                if host not in host_slots:
+                    host_slots[host] = threading.Semaphore(per_host_limit)
+                return host_slots[host]
+
+        def download_entry(entry):
+            result = dict(entry)
+            if not entry["filename"]:
+                result["status"] = "failed"
+                return result
+            if os.path.exists(os.path.join(self.download_path, f"{entry['filename']}.mp4")):
+                result["status"] = "skipped"
+                return result
+
+            with host_slot(entry["url"]):
+                downloaded = self.download_video(entry["url"], entry["filename"])
+            result["status"] = "downloaded" if downloaded else "failed"
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(download_entry, entries))
+
+        counts = {status: sum(1 for r in results if r["status"] == status) for status in ("downloaded", "skipped", "failed")}
+        print(f"Batch complete: {counts['downloaded']} downloaded, {counts['skipped']} skipped, {counts['failed']} failed")
+        return results
 
     
-    def clip_existing_video(self, input_path, clip_name, start_time, end_time):
+    def _run_ffmpeg(self, command, priority="bulk", duration=None, slots=1):
+        """Run an ffmpeg command through the shared runner, raising RuntimeError with its stderr on failure.
+
+        priority is "interactive", "bulk" or "background"; duration (the
+        expected output length) lets the job report a percentage. slots is
+        how many runner slots the command takes (one per encoder it runs).
+        """
+        return self.ffmpeg.run(command, priority=priority, duration=duration, slots=slots)
+
+    def probe_video_stream(self, path):
+        """Return codec_name, profile, pix_fmt, width, height and time_base of the first video stream."""
+        return self.media_info.get(path)["video"] or {}
+
+    def probe_streams(self, path):
+        """Return the parameters of the first video and audio streams that decide concat compatibility.
+
+        Returns:
+            dict: {"video": {...} or None, "audio": {...} or None}
+        """
+        info = self.media_info.get(path)
+        return {"video": info["video"], "audio": info["audio"]}
+
+    def _write_concat_list(self, list_path, parts):
+        """Write a concat demuxer list for (path, duration or None) parts."""
+        with open(list_path, "w", encoding="utf-8") as f:
+            for part, part_duration in parts:
+                escaped = os.path.abspath(part).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if part_duration is not None:
+                    f.write(f"duration {part_duration:.6f}\n")
+
+    def probe_duration(self, path):
+        """Return the container duration of a media file in seconds."""
+        duration = self.media_info.get(path)["duration"]
+        if duration is None:
+            raise RuntimeError(f"Could not read the duration of {path}")
+        return duration
+
+    def probe_keyframes(self, path, start_time, end_time):
+        """Return the sorted keyframe timestamps of the first video stream between start_time and end_time."""
+        return [pts for pts, _ in self.media_info.keyframes(path) if start_time <= pts <= end_time]
+
+    def clip_existing_video(self, input_path, clip_name, start_time, end_time, mode="exact"):
         """Create a new video clip from an existing MP4 file.
         
         Parameters:
@@ -67,6 +563,9 @@ class YoutubeSegmentDownloader:
             clip_name (str): Name for the output clip (without .mp4)
             start_time (float or str): Start time in seconds or "HH:MM:SS"
             end_time (float or str): End time in seconds or "HH:MM:SS"
+            mode (str): "exact" re-encodes the whole clip, "smart" re-encodes
+                only the partial GOPs at the cut points and stream-copies the
+                rest, "fast" stream-copies from the keyframe before start_time
         
         Returns:
             str: Path to the created clip
@@ -74,14 +573,34 @@ class YoutubeSegmentDownloader:
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"Input video not found: {input_path}")
 
+        if mode not in self.CLIP_MODES:
+            raise ValueError(f"Unknown clip mode: {mode}")
+
         os.makedirs(self.download_path, exist_ok=True)
         output_path = os.path.join(self.download_path, f"{clip_name}.mp4")
-        duration = float(end_time) - float(start_time)
+        start_time = parse_timestamp(start_time)
+        end_time = parse_timestamp(end_time)
+        duration = end_time - start_time
 
         if duration <= 0:
             raise ValueError("Clip end time must be after start time.")
 
-        command = [
+        try:
+            print(f"Creating {mode} clip: {output_path} ({start_time}s to {end_time}s, duration {duration}s)")
+            if mode == "fast":
+                self._clip_stream_copy(input_path, output_path, start_time, duration)
+            elif mode == "smart":
+                self._clip_smart(input_path, output_path, start_time, end_time)
+            else:
+                self._clip_reencode(input_path, output_path, start_time, duration)
+            print(f"Clip created successfully: {output_path}")
+            return output_path
+        except RuntimeError as e:
+            print(f"Error creating clip: {e}")
+            raise
+
+    def _clip_reencode(self, input_path, output_path, start_time, duration):
+        self._run_ffmpeg([
             "ffmpeg",
             "-ss", str(start_time),
             "-i", input_path,
@@ -94,20 +613,281 @@ class YoutubeSegmentDownloader:
             "-movflags", "+faststart",
             "-y",          # overwrite if exists
             output_path
-        ]
+        ], priority="interactive", duration=duration)
+
+    def _clip_stream_copy(self, input_path, output_path, start_time, duration):
+        self._run_ffmpeg([
+            "ffmpeg",
+            "-ss", str(start_time),
+            "-i", input_path,
+            "-t", str(duration),
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            "-movflags", "+faststart",
+            "-y",
+            output_path
+        ], priority="interactive", duration=duration)
+
+    def _clip_smart(self, input_path, output_path, start_time, end_time):
+        """Re-encode only the partial GOPs at each end and stream-copy the keyframe-aligned middle.
+
+        The three video pieces are joined with the concat demuxer and the
+        audio is stream-copied for the whole range. The joined file carries
+        a single SPS/PPS, so the edges are encoded with settings derived from
+        the source's parameter sets and are only used if theirs come out
+        identical; otherwise, and when the source isn't H.264 or the range
+        has too few keyframes for copying to pay off, the clip is re-encoded.
+        """
+        duration = end_time - start_time
+        stream = self.probe_video_stream(input_path)
+        keyframes = []
+        parameter_sets = None
+        if stream.get("codec_name") == "h264":
+            keyframes = [(pts, frame) for pts, frame in self.media_info.keyframes(input_path) if start_time <= pts <= end_time]
+            parameter_sets = self.media_info.h264_parameter_sets(input_path)
+
+        if len(keyframes) < 2 or keyframes[-1][0] - keyframes[0][0] < self.SMART_CLIP_MIN_COPY:
+            print("Not enough keyframes in range for a smart clip, re-encoding instead")
+            self._clip_reencode(input_path, output_path, start_time, duration)
+            return
+        if parameter_sets is None:
+            print("Could not read the source's parameter sets, re-encoding instead")
+            self._clip_reencode(input_path, output_path, start_time, duration)
+            return
 
+        (copy_start, first_frame), (copy_end, last_frame) = keyframes[0], keyframes[-1]
+        copy_frames = last_frame - first_frame
+        encode_args = self._matching_encode_args(stream, parameter_sets)
+
+        temp_dir = tempfile.mkdtemp(prefix="youtube_burgundy_clip_")
         try:
-            print(f"Creating clip: {output_path} ({start_time}s to {end_time}s, duration {duration}s)")
-            subprocess.run(command, check=True, capture_output=True, text=True)
-            print(f"Clip created successfully: {output_path}")
-            return output_path
-        except subprocess.CalledProcessError as e:
-            error_message = e.stderr.strip() if e.stderr else str(e)
-            print(f"Error creating clip: {error_message}")
-            raise RuntimeError(error_message)
-        
+            parts = []
+            if copy_start - start_time > 0.001:
+                head_path = os.path.join(temp_dir, "head.mp4")
+                self._run_ffmpeg([
+                    "ffmpeg", "-ss", str(start_time), "-i", input_path,
+                    "-t", str(copy_start - start_time), "-an", *encode_args,
+                    "-y", head_path
+                ], priority="interactive")
+                parts.append((head_path, copy_start - start_time))
+
+            middle_path = os.path.join(temp_dir, "middle.mp4")
+            self._run_ffmpeg([
+                # Nudge past the keyframe so the copy seek lands on it rather than the one before,
+                # and stop by frame count so the next GOP's keyframe isn't pulled in
+                "ffmpeg", "-ss", str(copy_start + 0.001), "-i", input_path,
+                "-frames:v", str(copy_frames), "-an", "-c:v", "copy",
+                "-avoid_negative_ts", "make_zero", "-y", middle_path
+            ], priority="interactive")
+            parts.append((middle_path, copy_end - copy_start))
+
+            if end_time - copy_end > 0.001:
+                tail_path = os.path.join(temp_dir, "tail.mp4")
+                self._run_ffmpeg([
+                    "ffmpeg", "-ss", str(copy_end), "-i", input_path,
+                    "-t", str(end_time - copy_end), "-an", *encode_args,
+                    "-y", tail_path
+                ], priority="interactive")
+                parts.append((tail_path, end_time - copy_end))
+
+            for path, _ in parts:
+                if path != middle_path and self.media_info.h264_parameter_sets(path) != parameter_sets:
+                    print("Re-encoded edges don't match the source's SPS/PPS, re-encoding the whole clip instead")
+                    self._clip_reencode(input_path, output_path, start_time, duration)
+                    return
+
+            list_path = os.path.join(temp_dir, "parts.txt")
+            self._write_concat_list(list_path, parts)
+
+            self._run_ffmpeg([
+                "ffmpeg",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-ss", str(start_time), "-t", str(duration), "-i", input_path,
+                "-map", "0:v:0", "-map", "1:a:0?",
+                "-c", "copy",
+                "-movflags", "+faststart",
+                "-y",
+                output_path
+            ], priority="interactive", duration=duration)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def clip_many(self, input_path, clips, mode="smart"):
+        """Cut several clips from one source into download_path, decoding it as few times as possible.
+
+        clips is a list of {"name", "start", "end"} (name without .mp4).
+        "fast" stream-copies every clip from the keyframe before its start.
+        "exact" re-encodes: clips close together (see _encode_batches) share
+        one decode of the source, split into a trimmed encode per clip, and
+        such a run takes a runner slot per encoder. "smart" stream-copies clips
+        that start on a keyframe and re-encodes the rest that way. Clips are
+        processed in order of start time, so each ffmpeg run only reads the
+        stretch of the source its clips cover.
+
+        Returns one result per clip, in the given order:
+        {"name", "filename", "start", "end", "method", "success", "message"}.
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input video not found: {input_path}")
+        if mode not in self.CLIP_MODES:
+            raise ValueError(f"Unknown clip mode: {mode}")
+
+        os.makedirs(self.download_path, exist_ok=True)
+        media = self.media_info.get(input_path)
+        keyframes = []
+        if mode == "smart" and media["video"] is not None:
+            keyframes = [pts for pts, _ in self.media_info.keyframes(input_path)]
+
+        results = []
+        for clip in clips:
+            start, end = parse_timestamp(clip["start"]), parse_timestamp(clip["end"])
+            result = {
+                "name": clip["name"],
+                "filename": f"{clip['name']}.mp4",
+                "start": start,
+                "end": end,
+                "method": None,
+                "success": False,
+                "message": "",
+            }
+            if end <= start:
+                result["message"] = "Clip end time must be after start time."
+            elif mode == "fast" or (mode == "smart" and _near(keyframes, start, self.KEYFRAME_SNAP)):
+                result["method"] = "copy"
+            else:
+                result["method"] = "encode"
+            results.append(result)
+
+        copies = sorted((r for r in results if r["method"] == "copy"), key=lambda r: r["start"])
+        batches = [("copy", copies[i:i + self.CLIP_BATCH_SIZE]) for i in range(0, len(copies), self.CLIP_BATCH_SIZE)]
+        batches += [("encode", batch) for batch in self._encode_batches([r for r in results if r["method"] == "encode"])]
+        for method, batch in batches:
+            print(f"Cutting {len(batch)} clips from {os.path.basename(input_path)} ({method})")
+            try:
+                if method == "copy":
+                    self._clip_batch_copy(input_path, batch)
+                else:
+                    self._clip_batch_encode(input_path, batch, has_audio=media["audio"] is not None)
+            except RuntimeError as e:
+                print(f"Error creating clips: {e}")
+                for result in batch:
+                    result["message"] = str(e).splitlines()[-1] if str(e) else "ffmpeg failed"
+
+            for result in batch:
+                path = os.path.join(self.download_path, result["filename"])
+                if os.path.exists(path) and os.path.getsize(path) > 0 and not result["message"]:
+                    result["success"] = True
+                elif not result["message"]:
+                    result["message"] = "Clip was not written."
+        return results
+
+    def _encode_batches(self, results):
+        """Group clips to re-encode into runs sharing one decode.
+
+        A run holds at most CLIP_BATCH_SIZE clips, and a clip starting more
+        than CLIP_BATCH_GAP seconds after the run's furthest end starts a new
+        one, so sparse clips are reached by seeking instead of decoding the
+        whole stretch between them.
+        """
+        batches = []
+        for result in sorted(results, key=lambda r: r["start"]):
+            batch = batches[-1] if batches else None
+            if (batch is None or len(batch) >= self.CLIP_BATCH_SIZE
+                    or result["start"] - max(r["end"] for r in batch) > self.CLIP_BATCH_GAP):
+                batches.append([result])
+            else:
+                batch.append(result)
+        return batches
+
+    def _clip_batch_copy(self, input_path, batch):
+        """Stream-copy every clip in one ffmpeg run: the source is opened once per clip, seeking straight to it."""
+        command = ["ffmpeg"]
+        for result in batch:
+            command += ["-ss", str(result["start"]), "-t", str(result["end"] - result["start"]), "-i", input_path]
+        for i, result in enumerate(batch):
+            command += [
+                "-map", f"{i}:v:0?", "-map", f"{i}:a:0?",
+                "-c", "copy",
+                "-avoid_negative_ts", "make_zero",
+                "-movflags", "+faststart",
+                "-y", os.path.join(self.download_path, result["filename"])
+            ]
+        self._run_ffmpeg(command, duration=max(r["end"] - r["start"] for r in batch))
+
+    def _clip_batch_encode(self, input_path, batch, has_audio=True):
+        """Decode the stretch of the source the batch covers once and encode each clip from a split of it."""
+        base = min(r["start"] for r in batch)
+        span = max(r["end"] for r in batch) - base
+        count = len(batch)
+
+        filters = [f"[0:v]split={count}" + "".join(f"[v{i}]" for i in range(count))]
+        if has_audio:
+            filters.append(f"[0:a]asplit={count}" + "".join(f"[a{i}]" for i in range(count)))
+        for i, result in enumerate(batch):
+            start, end = result["start"] - base, result["end"] - base
+            filters.append(f"[v{i}]trim=start={start}:end={end},setpts=PTS-STARTPTS[vout{i}]")
+            if has_audio:
+                filters.append(f"[a{i}]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[aout{i}]")
+
+        # Input seeking skips everything before the first clip without decoding it
+        command = ["ffmpeg", "-ss", str(base), "-t", str(span), "-i", input_path, "-filter_complex", ";".join(filters)]
+        for i, result in enumerate(batch):
+            command += ["-map", f"[vout{i}]"]
+            if has_audio:
+                command += ["-map", f"[aout{i}]", "-c:a", "aac", "-b:a", "192k"]
+            command += [
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+                "-movflags", "+faststart",
+                "-y", os.path.join(self.download_path, result["filename"])
+            ]
+        self._run_ffmpeg(command, duration=span, slots=count)
+
+    def _matching_encode_args(self, stream, parameter_sets):
+        """x264 settings that reproduce the source's SPS/PPS: profile, level, reference frames,
+        B-frame reordering depth, entropy coder, 8x8 transform, weighted prediction and the
+        PPS QP fields (the edges are encoded at the source's initial QP)."""
+        sps, pps = parameter_sets["sps"], parameter_sets["pps"]
+        reorder = sps.get("max_num_reorder_frames", 0 if sps.get("profile_idc") == 66 else 2)
+        x264_params = {
+            "ref": pps.get("num_ref_idx_l0_default_active_minus1", 0) + 1,
+            "bframes": 3 if reorder else 0,
+            "b-pyramid": "normal" if reorder >= 2 else "none",
+            "cabac": pps.get("entropy_coding_mode_flag", 0),
+            "8x8dct": pps.get("transform_8x8_mode_flag", 0),
+            "weightp": 2 if pps.get("weighted_pred_flag") else 0,
+            "weightb": 1 if pps.get("weighted_bipred_idc") else 0,
+            # psy adjusts the chroma QP offset on its own, so turn it off and set the source's
+            "psy": 0,
+            "chroma-qp-offset": pps.get("chroma_qp_index_offset", 0),
+            # In constant-QP mode the PPS initial QP is the QP itself
+            "qp": 26 + pps.get("pic_init_qp_minus26", 0),
+        }
+        args = [
+            "-c:v", "libx264", "-preset", "veryfast",
+            "-x264-params", ":".join(f"{key}={value}" for key, value in x264_params.items()),
+        ]
+        profile = {66: "baseline", 77: "main", 100: "high"}.get(sps.get("profile_idc"))
+        if profile:
+            args += ["-profile:v", profile]
+        if sps.get("level_idc"):
+            args += ["-level", f"{sps['level_idc'] / 10:g}"]
+        if stream.get("pix_fmt"):
+            args += ["-pix_fmt", stream["pix_fmt"]]
+        timescale = (stream.get("time_base") or "").partition("/")[2]
+        if timescale.isdigit():
+            args += ["-video_track_timescale", timescale]
+        return args
 
     def combine_videos(self, video_filepaths, output_filename, delete_sources=False):
+        """Join videos end to end into download_path/{output_filename}.mp4.
+
+        The inputs are probed first (through the media info cache). When they
+        already share codecs, resolution, frame rate and audio layout they are
+        joined with the concat demuxer without decoding. Otherwise each input
+        is normalized to H.264/AAC at the first input's resolution and frame
+        rate in its own ffmpeg process, in parallel, and the normalized files
+        are joined the same way.
+        """
         if not video_filepaths:
             print("No video files provided.")
             return None
@@ -120,35 +900,27 @@ class YoutubeSegmentDownloader:
         output_filepath = os.path.join(self.download_path, f"{output_filename}.mp4")
         os.makedirs(os.path.dirname(output_filepath), exist_ok=True)
 
-        # Build input args
-        inputs = []
-        for path in video_filepaths:
-            inputs.extend(["-i", path])
-
-        # Build filter_complex dynamically
-        filter_parts = []
-        for i in range(len(video_filepaths)):
-            filter_parts.append(f"[{i}:v]fps=25,scale=640:360[v{i}];")
-        video_labels = "".join(f"[v{i}][{i}:a]" for i in range(len(video_filepaths)))
-        filter_complex = "".join(filter_parts) + f"{video_labels}concat=n={len(video_filepaths)}:v=1:a=1[v][a]"
-
-        command = [
-            "ffmpeg",
-            *inputs,
-            "-filter_complex", filter_complex,
-            "-map", "[v]",
-            "-map", "[a]",
-            "-c:v", "libx264",
-            "-crf", "18",
-            "-preset", "fast",
-            "-c:a", "aac",
-            "-b:a", "192k",
-            "-y",
-            output_filepath
-        ]
-
+        temp_dir = tempfile.mkdtemp(prefix="youtube_burgundy_combine_")
         try:
-            subprocess.run(command, check=True)
+            streams = [self.probe_streams(path) for path in video_filepaths]
+            if self._concat_compatible(streams):
+                print("Inputs share codec parameters, joining without re-encoding")
+                parts = video_filepaths
+            else:
+                print(f"Normalizing {len(video_filepaths)} inputs before joining")
+                parts = self._normalize_for_concat(video_filepaths, streams, temp_dir)
+
+            list_path = os.path.join(temp_dir, "inputs.txt")
+            self._write_concat_list(list_path, [(part, None) for part in parts])
+            self._run_ffmpeg([
+                "ffmpeg",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-map", "0:v:0", "-map", "0:a:0?",
+                "-c", "copy",
+                "-movflags", "+faststart",
+                "-y",
+                output_filepath
+            ])
             print(f"Combined video saved as: {output_filepath}")
 
             if delete_sources:
@@ -161,57 +933,201 @@ class YoutubeSegmentDownloader:
 
             return output_filepath
 
-        except subprocess.CalledProcessError as e:
+        except RuntimeError as e:
             print(f"Error combining videos: {e}")
             return None
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _concat_compatible(self, streams):
+        """True when every input can be stream-copied into one file by the concat demuxer."""
+        video_keys = ("codec_name", "profile", "width", "height", "pix_fmt", "r_frame_rate", "time_base")
+        audio_keys = ("codec_name", "sample_rate", "channels")
 
+        first = streams[0]
+        if first["video"] is None:
+            return False
 
-    def split_video_into_segments(self, video_filepath, segment_filename, duration):
-        """Split the video into 30-minute segments using ffmpeg."""
-        num_segments = (duration // self.SEGMENT_DURATION) + (1 if duration % self.SEGMENT_DURATION > 0 else 0)
+        for item in streams:
+            if item["video"] is None or (item["audio"] is None) != (first["audio"] is None):
+                return False
+            if any(item["video"].get(key) != first["video"].get(key) for key in video_keys):
+                return False
+            if item["audio"] is not None and any(item["audio"].get(key) != first["audio"].get(key) for key in audio_keys):
+                return False
+        return True
+
+    def _normalize_for_concat(self, video_filepaths, streams, temp_dir):
+        """Re-encode every input to identical parameters, one ffmpeg process per input in parallel.
+
+        The target is the first input's size and frame rate (640x360@25 if
+        it can't be read); other inputs are scaled to fit and padded.
+        """
+        first = streams[0]["video"] or {}
+        width = (first.get("width") or 640) // 2 * 2
+        height = (first.get("height") or 360) // 2 * 2
+        fps = first.get("r_frame_rate") if first.get("fps") else "25"
+        video_filter = (
+            f"fps={fps},scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+        )
+
+        def normalize(i):
+            path = video_filepaths[i]
+            output_path = os.path.join(temp_dir, f"part_{i}.mp4")
+            command = ["ffmpeg", "-i", path]
+            if streams[i]["audio"] is None:
+                # Give silent inputs an audio track so every part has the same streams
+                command += ["-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo", "-shortest"]
+            command += [
+                "-map", "0:v:0", "-map", "1:a:0" if streams[i]["audio"] is None else "0:a:0",
+                "-vf", video_filter,
+                "-c:v", "libx264",
+                "-crf", "18",
+                "-preset", "fast",
+                "-pix_fmt", "yuv420p",
+                "-video_track_timescale", "12800",
+                "-c:a", "aac",
+                "-b:a", "192k",
+                "-ar", "44100",
+                "-ac", "2",
+                "-y",
+                output_path
+            ]
+            self._run_ffmpeg(command)
+            return output_path
+
+        with ThreadPoolExecutor(max_workers=min(len(video_filepaths), os.cpu_count() or 1)) as executor:
+            return list(executor.map(normalize, range(len(video_filepaths))))
+
+    def split_video_into_segments(self, video_filepath, segment_filename, duration=None, segment_duration=None, parallel=False):
+        """Split the video into segments (30 minutes by default) using ffmpeg.
+
+        By default one ffmpeg pass with the segment muxer writes every segment
+        while reading the input once. With parallel=True, or if the segment
+        muxer fails, each segment is cut by its own input-seeked ffmpeg
+        process, spread across the CPU cores.
+
+        Returns:
+            list[dict]: {"index", "path", "start", "end", "success", "error"}
+            per segment, in order
+        """
+        segment_duration = segment_duration or self.segment_duration
+        if duration is None:
+            duration = self.probe_duration(video_filepath)
+
+        num_segments = int(duration // segment_duration) + (1 if duration % segment_duration > 0 else 0)
         print(f"Video Duration: {duration} seconds")
         print(f"Total Segments: {num_segments}")
         print(f"Segments will be saved in {self.download_path} with the base name '{segment_filename}'.")
 
-        # Split the video into segments
-        for i in range(num_segments):
-            start_time = i * self.SEGMENT_DURATION
-            end_time = min((i + 1) * self.SEGMENT_DURATION, duration)
-            segment_name = f"{segment_filename}_{i+1}.mp4"
-            segment_filepath = os.path.join(self.download_path, segment_name)
+        if not parallel:
+            try:
+                results = self._split_single_pass(video_filepath, segment_filename, segment_duration, duration)
+            except RuntimeError as e:
+                print(f"Segment muxer failed, falling back to parallel split: {e}")
+            else:
+                for result in results:
+                    print(f"Segment {result['index']} saved as {os.path.basename(result['path'])}")
+                return results
 
-            print(f"Splitting Segment {i+1}: {start_time}s to {end_time}s")
+        return self._split_parallel(video_filepath, segment_filename, segment_duration, duration, num_segments)
 
-            # Use ffmpeg to split the video into segments
-            command = [
-                "ffmpeg", "-i", video_filepath, "-ss", str(start_time), "-to", str(end_time),
-                "-c", "copy", "-copyts", segment_filepath
-            ]
+    def _split_single_pass(self, video_filepath, segment_filename, segment_duration, duration=None):
+        """Write all segments in one stream-copy pass with ffmpeg's segment muxer."""
+        # The segment muxer treats % in the output name as a format specifier
+        pattern = os.path.join(self.download_path, f"{segment_filename.replace('%', '%%')}_%d.mp4")
+        list_fd, list_path = tempfile.mkstemp(prefix="youtube_burgundy_segments_", suffix=".csv")
+        os.close(list_fd)
+
+        try:
+            self._run_ffmpeg([
+                "ffmpeg", "-i", video_filepath,
+                "-map", "0", "-c", "copy",
+                "-f", "segment",
+                "-segment_time", str(segment_duration),
+                "-segment_start_number", "1",
+                "-segment_list", list_path,
+                "-segment_list_type", "csv",
+                "-reset_timestamps", "1",
+                "-y",
+                pattern
+            ], duration=duration)
+
+            results = []
+            with open(list_path, "r", encoding="utf-8", newline="") as f:
+                for i, row in enumerate(csv.reader(f)):
+                    if len(row) < 3:
+                        continue
+                    results.append({
+                        "index": i + 1,
+                        "path": os.path.join(self.download_path, row[0]),
+                        "start": float(row[1]),
+                        "end": float(row[2]),
+                        "success": True,
+                        "error": None,
+                    })
+            return results
+        finally:
+            os.remove(list_path)
 
-            
+    def _split_parallel(self, video_filepath, segment_filename, segment_duration, duration, num_segments):
+        """Cut each segment with its own input-seeked ffmpeg process, several at a time."""
+        def split_segment(i):
+            start_time = i * segment_duration
+            end_time = min((i + 1) * segment_duration, duration)
+            segment_filepath = os.path.join(self.download_path, f"{segment_filename}_{i+1}.mp4")
+            result = {"index": i + 1, "path": segment_filepath, "start": start_time, "end": end_time, "success": True, "error": None}
+
+            print(f"Splitting Segment {i+1}: {start_time}s to {end_time}s")
             try:
-                subprocess.run(command, check=True)
-                print(f"Segment {i+1} saved as {segment_name}")
-            except subprocess.CalledProcessError as e:
+                # -ss before -i seeks the input instead of decoding from the start of the file
+                self._run_ffmpeg([
+                    "ffmpeg", "-ss", str(start_time), "-i", video_filepath,
+                    "-t", str(end_time - start_time),
+                    "-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero",
+                    "-y", segment_filepath
+                ], duration=end_time - start_time)
+                print(f"Segment {i+1} saved as {os.path.basename(segment_filepath)}")
+            except RuntimeError as e:
                 print(f"Error splitting segment {i+1}: {e}")
+                result["success"] = False
+                result["error"] = str(e)
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(num_segments, os.cpu_count() or 1) or 1) as executor:
+            return list(executor.map(split_segment, range(num_segments)))
 
     def download_and_split(self, video_url, segment_filename):
         """Download the video and then split it into segments."""
-        # Step 1: Download the entire video
-        video_filepath = self.download_video(video_url, segment_filename)
+        # Step 1: Extract metadata once for the download
+        info = self.extract_info(video_url, max_age=self.INFO_REUSE_TTL)
+
+        # Step 2: Download the entire video
+        video_filepath = self.download_video(video_url, segment_filename, info=info)
         if video_filepath is None:
             return
 
-        # Step 2: Get video duration
-        duration = self.get_video_duration(video_url)
+        # Step 3: Get the duration of the file that was actually written
+        duration = self.probe_duration(video_filepath)
 
-        # Step 3: Split the video into segments
-        self.split_video_into_segments(video_filepath, segment_filename, duration)
+        # Step 4: Split the video into segments
+        return self.split_video_into_segments(video_filepath, segment_filename, duration)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download YouTube videos into the configured download folder.")
+    parser.add_argument("--batch", metavar="URL_OR_FILE", help="Playlist/channel URL or a text file of links to download in parallel")
+    parser.add_argument("--workers", type=int, default=YoutubeSegmentDownloader.BATCH_WORKERS, help="Videos to download at once in batch mode")
+    parser.add_argument("--per-host", type=int, default=YoutubeSegmentDownloader.PER_HOST_LIMIT, help="Concurrent batch downloads per host")
+    args = parser.parse_args()
+
     # Initialize the downloader class
     downloader = YoutubeSegmentDownloader()
 
+    if args.batch:
+        results = downloader.download_batch(args.batch, max_workers=args.workers, per_host_limit=args.per_host)
+        sys.exit(1 if any(r["status"] == "failed" for r in results) else 0)
+
     # downloader.combine_videos(["D:\\Music\\Departure - Moody Blues.mp4", "D:\\Music\\Ride my seesaw - Moody Blues.mp4"], "Departure and Ride my seesaw - Moody Blues", delete_sources=True)
     # downloader.clip_existing_video(input_path="D:\\Music\\House of four doors - Moody Blues.mp4", clip_name="Intro - House of four doors - Moody Blues", start_time="00:00:00", end_time="00:01:12")
 